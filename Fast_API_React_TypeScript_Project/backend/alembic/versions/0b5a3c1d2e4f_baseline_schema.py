@@ -0,0 +1,92 @@
+"""Baseline schema
+
+Revision ID: 0b5a3c1d2e4f
+Revises:
+Create Date: 2026-10-17 16:12:40.517203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b5a3c1d2e4f'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблицы users, items, posts, posts_members в том виде, в каком их создавал
+# Base.metadata.create_all до появления миграций; все следующие ревизии меняют уже их.
+# Пустая база: alembic upgrade head проходит всю цепочку с этой ревизии.
+# Существующие базы уже отмечены 75fdac604dfa или позже - для них ревизия ничего не
+# делает. База, созданная create_all без alembic_version: сначала
+# alembic stamp 0b5a3c1d2e4f, затем alembic upgrade head.
+
+USER_ROLE = sa.Enum('USER', 'ADMIN', name='userrole')
+COUNTRIES_CAPITALS = sa.Enum('LONDON', 'BERLIN', 'PARIS', 'KYIV', name='countriescapitals')
+POST_STATUS = sa.Enum('ACTIVE', 'ARCHIVED', name='poststatus')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=True),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('role', USER_ROLE, nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('user')
+    )
+    op.create_table('items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_items_description'), 'items', ['description'], unique=False)
+    op.create_index(op.f('ix_items_id'), 'items', ['id'], unique=False)
+    op.create_index(op.f('ix_items_name'), 'items', ['name'], unique=False)
+    op.create_table('posts',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('post_owner_user', sa.String(), nullable=False),
+    sa.Column('trip_from', COUNTRIES_CAPITALS, nullable=False),
+    sa.Column('trip_to', COUNTRIES_CAPITALS, nullable=False),
+    sa.Column('count_of_places', sa.Integer(), nullable=False),
+    sa.Column('already_engaged', sa.Integer(), nullable=False),
+    sa.Column('departure_datetime', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('status', POST_STATUS, nullable=False),
+    sa.ForeignKeyConstraint(['post_owner_user'], ['users.user'], ),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index(op.f('ix_posts_status'), 'posts', ['status'], unique=False)
+    op.create_table('posts_members',
+    sa.Column('member_user', sa.String(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['member_user'], ['users.user'], ),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.post_id'], ),
+    sa.PrimaryKeyConstraint('member_user', 'post_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('posts_members')
+    op.drop_index(op.f('ix_posts_status'), table_name='posts')
+    op.drop_table('posts')
+    op.drop_index(op.f('ix_items_name'), table_name='items')
+    op.drop_index(op.f('ix_items_id'), table_name='items')
+    op.drop_index(op.f('ix_items_description'), table_name='items')
+    op.drop_table('items')
+    op.drop_table('users')
+    bind = op.get_bind()
+    for enum in (POST_STATUS, COUNTRIES_CAPITALS, USER_ROLE):
+        enum.drop(bind, checkfirst=True)
@@ -0,0 +1,193 @@
+"""Integer user foreign keys: expand and backfill
+
+Revision ID: 4c1e2b7d9a30
+Revises: 78ebddb1263f
+Create Date: 2026-10-17 14:05:22.318406
+
+"""
+import logging
+import time
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1e2b7d9a30'
+down_revision: Union[str, None] = '78ebddb1263f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Первый шаг перехода со строковых ссылок на users.user на целочисленные на users.id:
+#   posts.post_owner_user   -> posts.owner_id
+#   posts_members.member_user -> posts_members.user_id
+# Все делается при работающем приложении, без долгих блокировок:
+#   1. колонки nullable (меняется только каталог) и FK NOT VALID - новые строки уже проверяются;
+#   2. триггер проставляет id по имени строкам, которые пишет еще старый код (dual-write
+#      на время выкатки; новый код пишет и id, и имя сам);
+#   3. backfill пачками по первичному ключу, каждая пачка - отдельная короткая транзакция;
+#   4. индексы CONCURRENTLY и VALIDATE CONSTRAINT (не блокирует запись).
+# Порядок выкатки: alembic upgrade до ревизии перед contract (сейчас 8c1d2e3f4a56:
+# эта ревизия и следующие, нужные коду) -> новый код на всех воркерах -> alembic upgrade
+# head (5d2f3c8e0b41, последняя: NOT NULL, новый первичный ключ posts_members).
+# Старые FK на users.user до contract становятся ON UPDATE CASCADE: переименование
+# пользователя (crud.update_user) меняет users."user" раньше копий имени в posts и
+# posts_members, и без каскада любой порядок UPDATE нарушал бы один из FK.
+# Между шагами до head не хватает только 5d2f3c8e0b41 (post_deploy), и schema_check
+# считает такую схему совместимой с кодом (и в SCHEMA_CHECK_MODE=strict).
+
+BACKFILL_BATCH_SIZE = 5000
+# Пауза между пачками: даем репликам и autovacuum успевать за backfill
+BACKFILL_PAUSE_SECONDS = 0.05
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# По одному оператору на execute: asyncpg не выполняет несколько команд в одном запросе
+FILL_TRIGGERS = (
+    """
+    CREATE OR REPLACE FUNCTION posts_fill_owner_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.owner_id IS NULL THEN
+            SELECT id INTO NEW.owner_id FROM users WHERE "user" = NEW.post_owner_user;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION posts_members_fill_user_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.user_id IS NULL THEN
+            SELECT id INTO NEW.user_id FROM users WHERE "user" = NEW.member_user;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """,
+    "CREATE TRIGGER posts_fill_owner_id BEFORE INSERT OR UPDATE ON posts "
+    "FOR EACH ROW EXECUTE FUNCTION posts_fill_owner_id()",
+    "CREATE TRIGGER posts_members_fill_user_id BEFORE INSERT OR UPDATE ON posts_members "
+    "FOR EACH ROW EXECUTE FUNCTION posts_members_fill_user_id()",
+)
+
+# (таблица, колонка, FK) - ссылки на users."user", которые удалит 5d2f3c8e0b41
+NAME_FKS = (
+    ('posts', 'post_owner_user', 'posts_post_owner_user_fkey'),
+    ('posts_members', 'member_user', 'posts_members_member_user_fkey'),
+)
+
+
+def _recreate_name_fks(on_update: str) -> None:
+    """FK NAME_FKS заново с ON UPDATE on_update: NOT VALID сейчас, VALIDATE - в autocommit_block."""
+    for table, column, fk in NAME_FKS:
+        op.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {fk}, "
+                   f"ADD CONSTRAINT {fk} FOREIGN KEY ({column}) REFERENCES users (\"user\") "
+                   f"ON UPDATE {on_update} NOT VALID")
+
+
+DROP_FILL_TRIGGERS = (
+    "DROP TRIGGER IF EXISTS posts_members_fill_user_id ON posts_members",
+    "DROP TRIGGER IF EXISTS posts_fill_owner_id ON posts",
+    "DROP FUNCTION IF EXISTS posts_members_fill_user_id()",
+    "DROP FUNCTION IF EXISTS posts_fill_owner_id()",
+)
+
+
+def _backfill(table: str, key: tuple[str, ...], assignment: str, missing: str) -> None:
+    """
+    UPDATE table SET assignment пачками по BACKFILL_BATCH_SIZE строк в порядке
+    первичного ключа key. Граница пачки - ключ ее последней строки (keyset), поэтому
+    каждая пачка читает только свои строки, а не сканирует уже заполненные заново.
+    """
+    bind = op.get_bind()
+    columns = ", ".join(key)
+    lower = None
+    done = 0
+    while True:
+        params = {"offset": BACKFILL_BATCH_SIZE - 1}
+        after = ""
+        if lower is not None:
+            after = f"WHERE ({columns}) > ({', '.join(f':lo{i}' for i in range(len(key)))})"
+            params.update({f"lo{i}": value for i, value in enumerate(lower)})
+        upper = bind.execute(sa.text(
+            f"SELECT {columns} FROM {table} {after} ORDER BY {columns} LIMIT 1 OFFSET :offset"
+        ), params).first()
+
+        conditions = [missing]
+        if lower is not None:
+            conditions.append(after.removeprefix("WHERE "))
+        if upper is not None:
+            conditions.append(f"({columns}) <= ({', '.join(f':hi{i}' for i in range(len(key)))})")
+            params.update({f"hi{i}": value for i, value in enumerate(upper)})
+        result = bind.execute(sa.text(
+            f"UPDATE {table} SET {assignment} WHERE {' AND '.join(conditions)}"
+        ), params)
+        done += result.rowcount
+        if upper is None:
+            break
+        lower = tuple(upper)
+        time.sleep(BACKFILL_PAUSE_SECONDS)
+    logger.info("Backfilled %s rows of %s", done, table)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('owner_id', sa.Integer(), nullable=True))
+    op.add_column('posts_members', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.execute("ALTER TABLE posts ADD CONSTRAINT posts_owner_id_fkey "
+               "FOREIGN KEY (owner_id) REFERENCES users (id) NOT VALID")
+    op.execute("ALTER TABLE posts_members ADD CONSTRAINT posts_members_user_id_fkey "
+               "FOREIGN KEY (user_id) REFERENCES users (id) NOT VALID")
+    for statement in FILL_TRIGGERS:
+        op.execute(statement)
+    _recreate_name_fks('CASCADE')
+
+    with op.get_context().autocommit_block():
+        _backfill(
+            'posts', ('post_id',),
+            'owner_id = (SELECT id FROM users WHERE users."user" = posts.post_owner_user)',
+            'owner_id IS NULL',
+        )
+        _backfill(
+            'posts_members', ('member_user', 'post_id'),
+            'user_id = (SELECT id FROM users WHERE users."user" = posts_members.member_user)',
+            'user_id IS NULL',
+        )
+        # Будущий первичный ключ posts_members (см. 5d2f3c8e0b41) и индексы под выборки по id
+        op.create_index(
+            'ix_posts_members_post_id_user_id', 'posts_members', ['post_id', 'user_id'],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_posts_members_user_id', 'posts_members', ['user_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_posts_owner_id_departure_datetime_post_id', 'posts',
+            ['owner_id', 'departure_datetime', 'post_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.execute("ALTER TABLE posts VALIDATE CONSTRAINT posts_owner_id_fkey")
+        op.execute("ALTER TABLE posts_members VALIDATE CONSTRAINT posts_members_user_id_fkey")
+        for table, _, fk in NAME_FKS:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {fk}")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_posts_owner_id_departure_datetime_post_id', table_name='posts',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_members_user_id', table_name='posts_members',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_members_post_id_user_id', table_name='posts_members',
+                      postgresql_concurrently=True, if_exists=True)
+    for statement in DROP_FILL_TRIGGERS:
+        op.execute(statement)
+    _recreate_name_fks('NO ACTION')
+    op.drop_constraint('posts_members_user_id_fkey', 'posts_members', type_='foreignkey')
+    op.drop_constraint('posts_owner_id_fkey', 'posts', type_='foreignkey')
+    op.drop_column('posts_members', 'user_id')
+    op.drop_column('posts', 'owner_id')
+    with op.get_context().autocommit_block():
+        for table, _, fk in NAME_FKS:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {fk}")
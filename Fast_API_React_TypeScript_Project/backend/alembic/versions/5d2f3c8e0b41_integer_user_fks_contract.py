@@ -0,0 +1,114 @@
+"""Integer user foreign keys: contract
+
+Revision ID: 5d2f3c8e0b41
+Revises: 8c1d2e3f4a56
+Create Date: 2026-10-17 14:31:47.902115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f3c8e0b41'
+down_revision: Union[str, None] = '8c1d2e3f4a56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+# Применяется после выкатки кода (schema_check.py не считает ее отсутствие несовпадением схемы)
+post_deploy: bool = True
+
+# Второй шаг (после 4c1e2b7d9a30 и выкатки кода, который пишет owner_id/user_id сам).
+# Ревизия - последняя в цепочке: все ревизии до нее применяются до выкатки кода, и
+# база без одной этой ревизии совместима с кодом (schema_check.py). Новые ревизии,
+# нужные коду, вставлять перед ней, а не после.
+# Базы, где она уже применена в прежнем порядке (до 6a7b8c9d0e12): alembic stamp 5d2f3c8e0b41.
+#   - owner_id / user_id NOT NULL: сначала CHECK NOT VALID + VALIDATE (без блокировки
+#     записи), тогда SET NOT NULL не сканирует таблицу;
+#   - первичный ключ posts_members (member_user, post_id) -> (post_id, user_id) из
+#     готового уникального индекса - короткая блокировка без перестроения;
+#   - старые FK на users.user, старый индекс владельца и триггеры dual-write удаляются.
+# post_owner_user / member_user остаются копией имени для ответов API (см. models.py).
+
+CHECKS = (
+    ('posts', 'owner_id', 'posts_owner_id_not_null'),
+    ('posts_members', 'user_id', 'posts_members_user_id_not_null'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column, check in CHECKS:
+        op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {check} CHECK ({column} IS NOT NULL) NOT VALID")
+    with op.get_context().autocommit_block():
+        for table, _, check in CHECKS:
+            op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}")
+    for table, column, check in CHECKS:
+        op.alter_column(table, column, existing_type=sa.Integer(), nullable=False)
+        op.drop_constraint(check, table, type_='check')
+
+    op.execute("ALTER TABLE posts_members DROP CONSTRAINT posts_members_pkey, "
+               "ADD CONSTRAINT posts_members_pkey PRIMARY KEY USING INDEX ix_posts_members_post_id_user_id")
+    op.execute("ALTER TABLE posts_members DROP CONSTRAINT IF EXISTS posts_members_member_user_fkey")
+    op.execute("ALTER TABLE posts DROP CONSTRAINT IF EXISTS posts_post_owner_user_fkey")
+    op.execute("DROP TRIGGER IF EXISTS posts_members_fill_user_id ON posts_members")
+    op.execute("DROP TRIGGER IF EXISTS posts_fill_owner_id ON posts")
+    op.execute("DROP FUNCTION IF EXISTS posts_members_fill_user_id()")
+    op.execute("DROP FUNCTION IF EXISTS posts_fill_owner_id()")
+
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_posts_owner_departure_datetime_post_id', table_name='posts',
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_posts_owner_departure_datetime_post_id', 'posts',
+            ['post_owner_user', 'departure_datetime', 'post_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_posts_members_member_user_post_id', 'posts_members', ['member_user', 'post_id'],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+    # Как после 4c1e2b7d9a30: ON UPDATE CASCADE, иначе переименование пользователя нарушит FK
+    op.execute("ALTER TABLE posts ADD CONSTRAINT posts_post_owner_user_fkey "
+               "FOREIGN KEY (post_owner_user) REFERENCES users (\"user\") ON UPDATE CASCADE NOT VALID")
+    op.execute("ALTER TABLE posts_members ADD CONSTRAINT posts_members_member_user_fkey "
+               "FOREIGN KEY (member_user) REFERENCES users (\"user\") ON UPDATE CASCADE NOT VALID")
+    # Старый первичный ключ; индекс (post_id, user_id) возвращается уникальным индексом,
+    # как после 4c1e2b7d9a30
+    op.execute("ALTER TABLE posts_members DROP CONSTRAINT posts_members_pkey, "
+               "ADD CONSTRAINT posts_members_pkey PRIMARY KEY USING INDEX ix_posts_members_member_user_post_id")
+    op.create_index('ix_posts_members_post_id_user_id', 'posts_members', ['post_id', 'user_id'], unique=True)
+    op.alter_column('posts_members', 'user_id', existing_type=sa.Integer(), nullable=True)
+    op.alter_column('posts', 'owner_id', existing_type=sa.Integer(), nullable=True)
+    # Триггеры dual-write нужны снова: откат обычно означает и откат кода
+    op.execute("""
+    CREATE OR REPLACE FUNCTION posts_fill_owner_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.owner_id IS NULL THEN
+            SELECT id INTO NEW.owner_id FROM users WHERE "user" = NEW.post_owner_user;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+    CREATE OR REPLACE FUNCTION posts_members_fill_user_id() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.user_id IS NULL THEN
+            SELECT id INTO NEW.user_id FROM users WHERE "user" = NEW.member_user;
+        END IF;
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql
+    """)
+    op.execute("CREATE TRIGGER posts_fill_owner_id BEFORE INSERT OR UPDATE ON posts "
+               "FOR EACH ROW EXECUTE FUNCTION posts_fill_owner_id()")
+    op.execute("CREATE TRIGGER posts_members_fill_user_id BEFORE INSERT OR UPDATE ON posts_members "
+               "FOR EACH ROW EXECUTE FUNCTION posts_members_fill_user_id()")
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TABLE posts VALIDATE CONSTRAINT posts_post_owner_user_fkey")
+        op.execute("ALTER TABLE posts_members VALIDATE CONSTRAINT posts_members_member_user_fkey")
@@ -0,0 +1,36 @@
+"""Rate limit state table
+
+Revision ID: 6a7b8c9d0e12
+Revises: 4c1e2b7d9a30
+Create Date: 2026-10-17 15:12:09.774530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a7b8c9d0e12'
+down_revision: Union[str, None] = '4c1e2b7d9a30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Общее состояние GCRA (rate_limit.py, RATE_LIMIT_BACKEND=postgres).
+    # UNLOGGED: запись на каждый лимитируемый запрос без WAL; после сбоя таблица
+    # пустая - это лишь сброс лимитов, а не потеря данных.
+    op.create_table('rate_limits',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('tat', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rate_limits')
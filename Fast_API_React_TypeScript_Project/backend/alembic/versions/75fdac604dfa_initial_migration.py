@@ -1,7 +1,7 @@
 """Initial migration
 
 Revision ID: 75fdac604dfa
-Revises: 
+Revises: 0b5a3c1d2e4f
 Create Date: 2025-04-23 14:27:30.906993
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '75fdac604dfa'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '0b5a3c1d2e4f'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -21,7 +21,8 @@ depends_on: Union[str, Sequence[str], None] = None
 def upgrade() -> None:
     """Upgrade schema."""
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('cars')
+    # cars есть только в базах, созданных до миграций; в новой базе ее нет
+    op.drop_table('cars', if_exists=True)
     # ### end Alembic commands ###
 
 
@@ -0,0 +1,37 @@
+"""Denylisted tokens table
+
+Revision ID: 78ebddb1263f
+Revises: a9c7714ee7c6
+Create Date: 2026-10-17 12:20:05.671093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '78ebddb1263f'
+down_revision: Union[str, None] = 'a9c7714ee7c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('denylisted_tokens',
+    sa.Column('jti', sa.String(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index(op.f('ix_denylisted_tokens_expires_at'), 'denylisted_tokens', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_denylisted_tokens_created_at'), 'denylisted_tokens', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_denylisted_tokens_created_at'), table_name='denylisted_tokens')
+    op.drop_index(op.f('ix_denylisted_tokens_expires_at'), table_name='denylisted_tokens')
+    op.drop_table('denylisted_tokens')
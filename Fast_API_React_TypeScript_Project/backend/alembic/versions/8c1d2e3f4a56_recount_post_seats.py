@@ -0,0 +1,41 @@
+"""Recount posts.already_engaged from posts_members
+
+Revision ID: 8c1d2e3f4a56
+Revises: 7b9d0e1f2a34
+Create Date: 2026-10-17 18:40:12.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c1d2e3f4a56'
+down_revision: Union[str, None] = '7b9d0e1f2a34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # До исправления crud.delete_user удаление пользователя снимало его записи
+    # posts_members, но не возвращало места: счетчик only-increment. Пересчитываем
+    # один раз по фактическим участникам; дальше места освобождаются в delete_user.
+    # Ревизия идет до contract (5d2f3c8e0b41): posts_members.user_id еще может быть NULL.
+    op.execute(sa.text("""
+        UPDATE posts SET already_engaged = counted.members
+        FROM (
+            SELECT posts.post_id, count(posts_members.post_id) AS members
+            FROM posts LEFT JOIN posts_members ON posts_members.post_id = posts.post_id
+            GROUP BY posts.post_id
+        ) AS counted
+        WHERE counted.post_id = posts.post_id AND posts.already_engaged <> counted.members
+    """))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Пересчет данных, схема не менялась - откатывать нечего
+    pass
@@ -0,0 +1,44 @@
+"""Keyset pagination indexes
+
+Revision ID: 9e56e6f363e8
+Revises: 75fdac604dfa
+Create Date: 2026-10-17 10:12:41.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e56e6f363e8'
+down_revision: Union[str, None] = '75fdac604dfa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в posts, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_posts_departure_datetime_post_id', 'posts',
+            ['departure_datetime', 'post_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+        op.create_index(
+            'ix_posts_owner_departure_datetime_post_id', 'posts',
+            ['post_owner_user', 'departure_datetime', 'post_id'],
+            unique=False, postgresql_concurrently=True, if_not_exists=True,
+        )
+    # users пагинируется по первичному ключу id - отдельный индекс не нужен
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_posts_owner_departure_datetime_post_id', table_name='posts',
+                      postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_posts_departure_datetime_post_id', table_name='posts',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,41 @@
+"""Composite index for trip search
+
+Revision ID: a9c7714ee7c6
+Revises: 9e56e6f363e8
+Create Date: 2026-10-17 11:03:17.482210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c7714ee7c6'
+down_revision: Union[str, None] = '9e56e6f363e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # GET /posts/search: равенство по (status, trip_from, trip_to), диапазон по
+    # departure_datetime, post_id - для keyset-курсора. Места в INCLUDE, чтобы
+    # фильтр "есть свободные места" проверялся без чтения строк таблицы.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_posts_search', 'posts',
+            ['status', 'trip_from', 'trip_to', 'departure_datetime', 'post_id'],
+            unique=False,
+            postgresql_include=['count_of_places', 'already_engaged'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_posts_search', table_name='posts',
+                      postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,44 @@
+# compare.py
+# Сравнение двух JSON из run.py (например, main и ветка):
+#     python benchmarks/compare.py base.json head.json
+# Изменение p50/p99 и rps по каждому эндпоинту каждого сценария.
+import json
+import sys
+
+
+def _delta(base: float, head: float) -> str:
+    if not base:
+        return "   n/a"
+    return f"{(head - base) / base * 100:+6.1f}%"
+
+
+def compare(base: dict, head: dict) -> list[str]:
+    lines = [f"base: {base['meta'].get('label') or base['meta'].get('git_revision')}  "
+             f"head: {head['meta'].get('label') or head['meta'].get('git_revision')}"]
+    for name, head_scenario in head["scenarios"].items():
+        base_scenario = base["scenarios"].get(name)
+        if base_scenario is None:
+            lines.append(f"\n{name}: only in head")
+            continue
+        lines.append(f"\n{name}: ops/s {base_scenario['ops_per_second']:.1f} -> {head_scenario['ops_per_second']:.1f} "
+                     f"({_delta(base_scenario['ops_per_second'], head_scenario['ops_per_second'])})")
+        for label, stats in head_scenario["endpoints"].items():
+            base_stats = base_scenario["endpoints"].get(label)
+            if base_stats is None:
+                lines.append(f"  {label:28} only in head")
+                continue
+            lines.append(
+                f"  {label:28} p50 {base_stats['p50_ms']:7.1f} -> {stats['p50_ms']:7.1f} ({_delta(base_stats['p50_ms'], stats['p50_ms'])})"
+                f"  p99 {base_stats['p99_ms']:7.1f} -> {stats['p99_ms']:7.1f} ({_delta(base_stats['p99_ms'], stats['p99_ms'])})"
+            )
+    return lines
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: compare.py BASE.json HEAD.json")
+    with open(sys.argv[1]) as f:
+        base_report = json.load(f)
+    with open(sys.argv[2]) as f:
+        head_report = json.load(f)
+    print("\n".join(compare(base_report, head_report)))
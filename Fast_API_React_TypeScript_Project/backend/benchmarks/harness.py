@@ -0,0 +1,108 @@
+# harness.py
+# Общая часть бенчмарков: клиенты (ASGI в процессе или запущенный uvicorn),
+# замер латентности по эндпоинтам и запуск N параллельных "пользователей".
+import asyncio
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+IN_PROCESS_BASE_URL = "http://bench"
+
+
+@dataclass
+class Target:
+    """Куда идут запросы: base_url запущенного сервера или приложение в этом же процессе."""
+    base_url: Optional[str] = None
+    app: object = None
+
+    @property
+    def name(self) -> str:
+        return self.base_url or "in-process"
+
+    def client(self) -> httpx.AsyncClient:
+        """Отдельный клиент = отдельные cookie (свой залогиненный пользователь)."""
+        if self.base_url:
+            return httpx.AsyncClient(base_url=self.base_url, timeout=60)
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=self.app), base_url=IN_PROCESS_BASE_URL, timeout=60
+        )
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Перцентиль p (0..100) по отсортированному списку, ближайший ранг."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Латентности и статусы по метке эндпоинта ("GET /posts"), исключения операций."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.failures: Counter = Counter()
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[label][response.status_code] += 1
+        return response
+
+    def summary(self, wall_seconds: float) -> dict:
+        endpoints = {}
+        for label, values in self.samples.items():
+            values = sorted(values)
+            endpoints[label] = {
+                "count": len(values),
+                "rps": len(values) / wall_seconds if wall_seconds else 0.0,
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+                "max_ms": values[-1] * 1000,
+                "statuses": {str(code): n for code, n in sorted(self.statuses[label].items())},
+            }
+        return {"endpoints": endpoints, "failures": dict(self.failures)}
+
+
+async def run_workers(
+    concurrency: int,
+    operation: Callable[[int, int], Awaitable[None]],
+    recorder: Recorder,
+    operations: Optional[int] = None,
+    duration: Optional[float] = None,
+) -> tuple[float, int]:
+    """
+    Запускает concurrency воркеров; каждый вызывает operation(worker_id, op_index),
+    пока не выполнено operations операций всего или не прошло duration секунд.
+    Возвращает (время, число выполненных операций).
+    """
+    if operations is None and duration is None:
+        raise ValueError("operations or duration is required")
+    next_index = 0
+    done = 0
+    started = time.perf_counter()
+
+    async def worker(worker_id: int) -> None:
+        nonlocal next_index, done
+        while True:
+            if operations is not None and next_index >= operations:
+                return
+            if duration is not None and time.perf_counter() - started >= duration:
+                return
+            op_index = next_index
+            next_index += 1
+            try:
+                await operation(worker_id, op_index)
+            except Exception as e:
+                recorder.failures[type(e).__name__] += 1
+            done += 1
+
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return time.perf_counter() - started, done
@@ -0,0 +1,192 @@
+# joins.py
+# До/после перехода posts/posts_members со строковых ссылок на users.user на
+# целочисленные users.id (миграции 4c1e2b7d9a30, 5d2f3c8e0b41): одни и те же данные
+# в двух раскладках, одни и те же запросы с JOIN.
+#     cd backend && DATABASE_URL=postgresql+asyncpg://... python benchmarks/joins.py --posts 200000
+# Таблицы bench_* создаются в той же базе и удаляются после прогона (--keep - оставить).
+# Для сравнения с рабочей схемой в целом - run.py/compare.py до и после миграции.
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, func, select, text,
+)
+from sqlalchemy.ext.asyncio import create_async_engine
+
+metadata = MetaData()
+
+users = Table(
+    "bench_users", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user", String, unique=True, nullable=False),
+)
+# Раскладка до миграции: владелец и участник - по имени, PK участников (member_user, post_id)
+str_posts = Table(
+    "bench_str_posts", metadata,
+    Column("post_id", Integer, primary_key=True),
+    Column("post_owner_user", String, ForeignKey("bench_users.user"), nullable=False),
+    Column("departure_datetime", DateTime(timezone=True), nullable=False),
+    Index("ix_bench_str_posts_owner", "post_owner_user", "departure_datetime", "post_id"),
+)
+str_members = Table(
+    "bench_str_members", metadata,
+    Column("member_user", String, ForeignKey("bench_users.user"), primary_key=True),
+    Column("post_id", Integer, ForeignKey("bench_str_posts.post_id"), primary_key=True),
+)
+# Раскладка после: целочисленные FK, PK участников (post_id, user_id), имя - копия
+int_posts = Table(
+    "bench_int_posts", metadata,
+    Column("post_id", Integer, primary_key=True),
+    Column("owner_id", Integer, ForeignKey("bench_users.id"), nullable=False),
+    Column("post_owner_user", String, nullable=False),
+    Column("departure_datetime", DateTime(timezone=True), nullable=False),
+    Index("ix_bench_int_posts_owner", "owner_id", "departure_datetime", "post_id"),
+)
+int_members = Table(
+    "bench_int_members", metadata,
+    Column("post_id", Integer, ForeignKey("bench_int_posts.post_id"), primary_key=True),
+    Column("user_id", Integer, ForeignKey("bench_users.id"), primary_key=True, index=True),
+    Column("member_user", String, nullable=False),
+)
+
+
+def queries(page_post_ids: list[int], user_id: int, username: str) -> dict:
+    """Пары (до, после) запросов, которые делает приложение."""
+    return {
+        # selectinload участников страницы GET /posts (loaders.POST_LIST)
+        "members_of_page": (
+            select(str_members.c.post_id, str_members.c.member_user).where(str_members.c.post_id.in_(page_post_ids)),
+            select(int_members.c.post_id, int_members.c.member_user).where(int_members.c.post_id.in_(page_post_ids)),
+        ),
+        # GET /{post_id}/posts - страница постов владельца
+        "owner_page": (
+            select(str_posts).where(str_posts.c.post_owner_user == username)
+            .order_by(str_posts.c.departure_datetime, str_posts.c.post_id).limit(20),
+            select(int_posts).where(int_posts.c.owner_id == user_id)
+            .order_by(int_posts.c.departure_datetime, int_posts.c.post_id).limit(20),
+        ),
+        # Поездки, в которых пользователь участник (User.posts_members -> posts)
+        "memberships_join_posts": (
+            select(str_posts.c.post_id, str_posts.c.departure_datetime)
+            .join(str_members, str_members.c.post_id == str_posts.c.post_id)
+            .where(str_members.c.member_user == username),
+            select(int_posts.c.post_id, int_posts.c.departure_datetime)
+            .join(int_members, int_members.c.post_id == int_posts.c.post_id)
+            .where(int_members.c.user_id == user_id),
+        ),
+        # Отчет: участники на пользователя через всю цепочку posts -> members -> users
+        "members_per_user_report": (
+            select(users.c.id, func.count()).select_from(
+                str_posts.join(str_members, str_members.c.post_id == str_posts.c.post_id)
+                .join(users, users.c.user == str_members.c.member_user)
+            ).group_by(users.c.id),
+            select(users.c.id, func.count()).select_from(
+                int_posts.join(int_members, int_members.c.post_id == int_posts.c.post_id)
+                .join(users, users.c.id == int_members.c.user_id)
+            ).group_by(users.c.id),
+        ),
+    }
+
+
+async def seed(conn, n_users: int, n_posts: int, members_per_post: int, rng: random.Random) -> None:
+    # Имена длиной как у реальных пользователей (email-подобные), а не "u1"
+    names = [f"traveller_{i:06d}_{rng.randrange(16 ** 6):06x}" for i in range(1, n_users + 1)]
+    await conn.execute(users.insert(), [{"id": i, "user": name} for i, name in enumerate(names, 1)])
+    start = datetime.now(timezone.utc)
+    for lo in range(1, n_posts + 1, 5000):
+        posts, members = [], []
+        for post_id in range(lo, min(lo + 5000, n_posts + 1)):
+            owner = rng.randrange(n_users)
+            departure = start + timedelta(minutes=post_id)
+            posts.append({"post_id": post_id, "owner": owner, "departure_datetime": departure})
+            for member in rng.sample(range(n_users), members_per_post):
+                if member != owner:
+                    members.append({"post_id": post_id, "member": member})
+        await conn.execute(str_posts.insert(), [
+            {"post_id": p["post_id"], "post_owner_user": names[p["owner"]], "departure_datetime": p["departure_datetime"]}
+            for p in posts
+        ])
+        await conn.execute(int_posts.insert(), [
+            {"post_id": p["post_id"], "owner_id": p["owner"] + 1, "post_owner_user": names[p["owner"]],
+             "departure_datetime": p["departure_datetime"]}
+            for p in posts
+        ])
+        await conn.execute(str_members.insert(), [{"post_id": m["post_id"], "member_user": names[m["member"]]} for m in members])
+        await conn.execute(int_members.insert(), [
+            {"post_id": m["post_id"], "user_id": m["member"] + 1, "member_user": names[m["member"]]} for m in members
+        ])
+
+
+async def time_query(conn, stmt, repeat: int) -> float:
+    (await conn.execute(stmt)).fetchall() # прогрев
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        (await conn.execute(stmt)).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def run(args) -> dict:
+    engine = create_async_engine(args.url)
+    rng = random.Random(args.seed)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.drop_all)
+            await conn.run_sync(metadata.create_all)
+            started = time.perf_counter()
+            await seed(conn, args.users, args.posts, args.members, rng)
+            print(f"seeded {args.users} users, {args.posts} posts in {time.perf_counter() - started:.1f}s")
+        async with engine.connect() as conn:
+            if engine.dialect.name == "postgresql":
+                await conn.execute(text("ANALYZE"))
+            results = {}
+            print(f"{'query':26} {'string FK ms':>13} {'integer FK ms':>14} {'change':>8}")
+            for name in ("members_of_page", "owner_page", "memberships_join_posts", "members_per_user_report"):
+                before_ms, after_ms = [], []
+                for _ in range(args.samples): # разные пользователи/страницы, медиана медиан
+                    user_id = rng.randrange(1, args.users + 1)
+                    username = (await conn.execute(select(users.c.user).where(users.c.id == user_id))).scalar_one()
+                    first = rng.randrange(1, max(2, args.posts - 20))
+                    before, after = queries(list(range(first, first + 20)), user_id, username)[name]
+                    before_ms.append(await time_query(conn, before, args.repeat))
+                    after_ms.append(await time_query(conn, after, args.repeat))
+                results[name] = {"string_fk_ms": statistics.median(before_ms), "integer_fk_ms": statistics.median(after_ms)}
+                change = (results[name]["integer_fk_ms"] - results[name]["string_fk_ms"]) / results[name]["string_fk_ms"] * 100
+                print(f"{name:26} {results[name]['string_fk_ms']:13.3f} {results[name]['integer_fk_ms']:14.3f} {change:+7.1f}%")
+    finally:
+        if not args.keep:
+            async with engine.begin() as conn:
+                await conn.run_sync(metadata.drop_all)
+        await engine.dispose()
+    return {"dialect": engine.dialect.name, "params": vars(args) | {"url": None}, "queries": results}
+
+
+def main_cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="String vs integer foreign key join benchmark")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL"), help="По умолчанию DATABASE_URL")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--members", type=int, default=3, help="Участников на пост")
+    parser.add_argument("--samples", type=int, default=5, help="Разных пользователей/страниц на запрос")
+    parser.add_argument("--repeat", type=int, default=20, help="Повторов каждого запроса")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Не удалять таблицы bench_* после прогона")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    if not args.url:
+        parser.error("--url or DATABASE_URL is required")
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,147 @@
+# matching.py
+# GET /match: индекс маршрутов в памяти (route_index.py) против того же запроса в SQL
+# (posts.match_posts, два запроса по ix_posts_search). Одни и те же случайные запросы
+# "N поездок из A в B около T с >= k мест", ответы сверяются.
+#     cd backend && DATABASE_URL=postgresql+asyncpg://... python benchmarks/matching.py --posts 100000
+# Лучше отдельная база: недостающие таблицы создаются через metadata.create_all, посты
+# пишутся от пользователя bench_match_owner и удаляются после прогона (--keep - оставить).
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from sqlalchemy import delete, insert, select, text # noqa: E402
+
+import models # noqa: E402
+import route_index # noqa: E402
+from database import AsyncSessionFactory, engine # noqa: E402 (DATABASE_URL читается при импорте)
+from enums import CountriesCapitals, PostStatus # noqa: E402
+from posts import posts # noqa: E402
+
+CITIES = tuple(city.value for city in CountriesCapitals)
+OWNER = "bench_match_owner"
+
+
+def random_query(rng: random.Random, days: int) -> dict:
+    trip_from, trip_to = rng.sample(CITIES, 2)
+    return {
+        "trip_from": trip_from,
+        "trip_to": trip_to,
+        "at": datetime.now(timezone.utc) + timedelta(hours=rng.uniform(0, days * 24)),
+        "seats": rng.randint(1, 3),
+        "limit": rng.choice((5, 10, 20)),
+        "window": timedelta(hours=rng.choice((6, 24, 72))),
+    }
+
+
+async def seed(rng: random.Random, n_posts: int, days: int) -> int:
+    async with engine.begin() as conn:
+        owner_id = (await conn.execute(
+            insert(models.User).values(user=OWNER, email=f"{OWNER}@bench.example.com", password="-")
+            .returning(models.User.id)
+        )).scalar_one()
+        start = datetime.now(timezone.utc) + timedelta(minutes=10)
+        for lo in range(0, n_posts, 5000):
+            rows = []
+            for _ in range(lo, min(lo + 5000, n_posts)):
+                trip_from, trip_to = rng.sample(CITIES, 2)
+                places = rng.randint(1, 4)
+                rows.append({
+                    "owner_id": owner_id, "post_owner_user": OWNER,
+                    "trip_from": CountriesCapitals(trip_from), "trip_to": CountriesCapitals(trip_to),
+                    "departure_datetime": start + timedelta(seconds=rng.uniform(0, days * 86400)),
+                    "count_of_places": places, "already_engaged": rng.randint(0, places),
+                    "status": PostStatus.ACTIVE,
+                })
+            await conn.execute(insert(models.Post), rows)
+        if engine.dialect.name == "postgresql":
+            await conn.execute(text("ANALYZE posts"))
+    return owner_id
+
+
+async def cleanup() -> None:
+    async with engine.begin() as conn:
+        owner_ids = select(models.User.id).where(models.User.user == OWNER).scalar_subquery()
+        await conn.execute(delete(models.Post).where(models.Post.owner_id.in_(owner_ids)))
+        await conn.execute(delete(models.User).where(models.User.user == OWNER))
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await cleanup() # остатки прошлого прогона с --keep
+        started = time.perf_counter()
+        await seed(rng, args.posts, args.days)
+        print(f"seeded {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        indexed = await route_index.route_index.rebuild()
+        build_ms = (time.perf_counter() - started) * 1000
+        print(f"route index: {indexed} posts built in {build_ms:.0f} ms")
+
+        queries = [random_query(rng, args.days) for _ in range(args.queries)]
+        index_us, sql_us, mismatches = [], [], 0
+        async with AsyncSessionFactory() as db:
+            for q in queries:
+                now = time.time()
+                t0 = time.perf_counter()
+                from_index = route_index.route_index.match(
+                    q["trip_from"], q["trip_to"], q["at"].timestamp(), q["seats"], q["limit"], q["window"].total_seconds(), now,
+                )
+                t1 = time.perf_counter()
+                from_sql = await posts.match_posts(
+                    db, CountriesCapitals(q["trip_from"]), CountriesCapitals(q["trip_to"]),
+                    q["at"], q["seats"], q["limit"], q["window"],
+                )
+                t2 = time.perf_counter()
+                index_us.append((t1 - t0) * 1e6)
+                sql_us.append((t2 - t1) * 1e6)
+                if [r["post_id"] for r in from_index] != [r["post_id"] for r in from_sql]:
+                    mismatches += 1
+    finally:
+        if not args.keep:
+            await cleanup()
+        await engine.dispose()
+
+    def summary(samples: list[float]) -> dict:
+        ordered = sorted(samples)
+        return {"p50_us": statistics.median(ordered), "p99_us": ordered[int(len(ordered) * 0.99) - 1], "mean_us": statistics.fmean(ordered)}
+
+    results = {"index": summary(index_us), "sql": summary(sql_us)}
+    print(f"{'':8} {'p50 us':>10} {'p99 us':>10} {'mean us':>10}")
+    for name, r in results.items():
+        print(f"{name:8} {r['p50_us']:10.1f} {r['p99_us']:10.1f} {r['mean_us']:10.1f}")
+    print(f"speedup p50: x{results['sql']['p50_us'] / results['index']['p50_us']:.0f}, mismatches: {mismatches}")
+    return {
+        "dialect": engine.dialect.name, "params": vars(args),
+        "build_ms": build_ms, "results": results, "mismatches": mismatches,
+    }
+
+
+def main_cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="In-memory route index vs SQL ride matching benchmark")
+    parser.add_argument("--posts", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=90, help="Отправления равномерно на столько дней вперед")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Не удалять посты bench_match_owner после прогона")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
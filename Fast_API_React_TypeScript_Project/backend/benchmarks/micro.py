@@ -0,0 +1,113 @@
+# micro.py
+# Микробенчмарки горячих путей без БД и HTTP:
+#     cd backend && SECRET_KEY=x python benchmarks/micro.py [--output micro.json]
+# Проверка токена (декодирование JWT с кэшем проверенных токенов и без, denylist),
+# сериализация списка постов: TypeAdapter (serializers.fast_json_response) против
+# обычного пути FastAPI (serialize_response по response_model маршрута GET /posts +
+# JSONResponse.render) на тех же 100 постах - байты JSON сверяются; форма курсора пагинации.
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://") # модули читают его при импорте
+
+from fastapi.responses import JSONResponse # noqa: E402
+from fastapi.routing import APIRoute, serialize_response # noqa: E402
+from pydantic import TypeAdapter # noqa: E402
+
+import pagination # noqa: E402
+import schemas # noqa: E402
+from enums import PostStatus # noqa: E402
+from auth import auth, denylist # noqa: E402
+from auth.token_cache import token_cache # noqa: E402
+
+
+def _posts(n: int) -> list:
+    now = datetime.now(timezone.utc)
+    return [
+        SimpleNamespace(
+            post_id=i, owner_id=i % 50, post_owner_user=f"user_{i % 50}", trip_from="london", trip_to="berlin",
+            count_of_places=4, already_engaged=1, departure_datetime=now + timedelta(days=1),
+            created_at=now, updated_at=now, status=PostStatus.ACTIVE,
+            posts_members_posts=[SimpleNamespace(user_id=i % 7, member_user=f"user_{i % 7}")],
+        )
+        for i in range(n)
+    ]
+
+
+def _run_sync(coroutine):
+    """Результат корутины без event loop: serialize_response(is_coroutine=True) не ждет ничего."""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def _posts_response_field():
+    """response_field маршрута GET /posts (response_model=List[schemas.PostGetAll])."""
+    import main # только здесь: приложение нужно ради поля ответа маршрута
+    for route in main.app.routes:
+        if isinstance(route, APIRoute) and route.path == "/posts" and "GET" in route.methods:
+            return route.response_field
+    raise LookupError("GET /posts route not found")
+
+
+def benchmarks() -> dict:
+    token = auth.create_access_token(data={"sub": "bench_user"})
+    adapter = TypeAdapter(list[schemas.PostGetAll])
+    posts_100 = _posts(100)
+    response_field = _posts_response_field()
+    json_response = JSONResponse(content=None)
+
+    def serialize_fast() -> bytes:
+        return adapter.dump_json(adapter.validate_python(posts_100, from_attributes=True))
+
+    def serialize_fastapi() -> bytes:
+        content = _run_sync(serialize_response(field=response_field, response_content=posts_100, is_coroutine=True))
+        return json_response.render(content)
+
+    if serialize_fast() != serialize_fastapi():
+        raise AssertionError("TypeAdapter and FastAPI serialization produce different JSON")
+    cursor = pagination.encode_cursor((datetime.now(timezone.utc), 12345))
+    return {
+        "jwt_decode": lambda: auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM]),
+        # decode_token_payload как на каждом запросе: первый раз для токена и повторный
+        "token_payload_uncached": lambda: (token_cache.clear(), auth.decode_token_payload(token)),
+        "token_payload_cached": lambda: auth.decode_token_payload(token),
+        "denylist_is_revoked": lambda: denylist.is_revoked("0" * 32),
+        "serialize_100_posts": serialize_fast,
+        "serialize_100_posts_fastapi": serialize_fastapi,
+        "cursor_decode": lambda: pagination.decode_cursor(cursor, (datetime, int)),
+    }
+
+
+def main_cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Hot-path micro benchmarks")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    results = {}
+    for name, fn in benchmarks().items():
+        timer = timeit.Timer(fn)
+        number, _ = timer.autorange()
+        best = min(timer.repeat(repeat=args.repeat, number=number)) / number
+        results[name] = {"best_us": best * 1e6, "per_second": 1 / best}
+        print(f"{name:28} {best * 1e6:10.2f} us  {1 / best:12.0f} /s")
+    fast, fastapi_path = results["serialize_100_posts"], results["serialize_100_posts_fastapi"]
+    print(f"serialize 100 posts: {fast['per_second'] * 100:.0f} rows/s (TypeAdapter) vs "
+          f"{fastapi_path['per_second'] * 100:.0f} rows/s (FastAPI), "
+          f"x{fastapi_path['best_us'] / fast['best_us']:.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,115 @@
+# planner.py
+# GET /plan без БД и HTTP: planner.plan по индексу маршрутов на --posts активных постах
+# против Connection Scan (CSA) по всем постам окна в порядке отправления - тот же
+# ответ "самое раннее прибытие", сверяется на каждом запросе.
+#     cd backend && python benchmarks/planner.py --posts 100000 [--output planner.json]
+# Длинных маршрутов (london/paris - kyiv) в 10 раз меньше, чтобы пересадки были выгоднее прямых.
+import argparse
+import bisect
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://") # модули читают его при импорте
+
+import planner # noqa: E402
+from enums import CountriesCapitals # noqa: E402
+from route_index import RouteIndex # noqa: E402
+
+CITIES = tuple(city.value for city in CountriesCapitals)
+ROUTES = [(a, b) for a in CITIES for b in CITIES if a != b]
+
+
+def build(rng: random.Random, n_posts: int, days: int, start: float) -> tuple[RouteIndex, list[tuple]]:
+    """Индекс (через upsert, как по событиям) и те же посты списком для CSA."""
+    weights = [0.1 if planner.leg_seconds(a, b) >= 25 * 3600 else 1 for a, b in ROUTES]
+    index = RouteIndex()
+    connections = []
+    for post_id, (trip_from, trip_to) in enumerate(rng.choices(ROUTES, weights, k=n_posts), 1):
+        departure = start + rng.uniform(0, days * 86400)
+        places = rng.randint(1, 4)
+        engaged = rng.randint(0, places)
+        index.upsert(post_id, trip_from, trip_to, departure, places, engaged)
+        connections.append((departure, post_id, trip_from, trip_to, places - engaged))
+    connections.sort()
+    index.built_at = time.time()
+    return index, connections
+
+
+def csa_earliest_arrival(connections, origin, destination, depart_after, depart_before, seats, min_connection) -> float:
+    """Эталон: один проход по отправлениям начиная с depart_after, самое раннее прибытие в каждый город."""
+    arrival = dict.fromkeys(CITIES, float("inf"))
+    arrival[origin] = depart_after
+    for i in range(bisect.bisect_left(connections, (depart_after,)), len(connections)):
+        departure, _, trip_from, trip_to, free = connections[i]
+        if departure > depart_before:
+            break
+        if free < seats:
+            continue
+        ready = arrival[trip_from] + (0 if trip_from == origin else min_connection)
+        if departure >= ready:
+            arrival[trip_to] = min(arrival[trip_to], departure + planner.leg_seconds(trip_from, trip_to))
+    return arrival[destination]
+
+
+def main_cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Multi-leg trip planner benchmark")
+    parser.add_argument("--posts", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--within-hours", type=float, default=72)
+    parser.add_argument("--min-connection-minutes", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    rng = random.Random(args.seed)
+    start = time.time()
+
+    started = time.perf_counter()
+    index, connections = build(rng, args.posts, args.days, start)
+    print(f"{args.posts} posts indexed in {time.perf_counter() - started:.2f}s")
+
+    plan_us, csa_us, mismatches, legs = [], [], 0, []
+    for _ in range(args.queries):
+        origin, destination = rng.sample(CITIES, 2)
+        depart_after = start + rng.uniform(0, (args.days - 3) * 86400)
+        depart_before = depart_after + args.within_hours * 3600
+        seats = rng.randint(1, 3)
+        min_connection = args.min_connection_minutes * 60
+
+        t0 = time.perf_counter()
+        itineraries = planner.plan(
+            index, origin, destination, depart_after, depart_before, seats, min_connection, len(CITIES) - 1,
+        )
+        t1 = time.perf_counter()
+        expected = csa_earliest_arrival(connections, origin, destination, depart_after, depart_before, seats, min_connection)
+        t2 = time.perf_counter()
+        plan_us.append((t1 - t0) * 1e6)
+        csa_us.append((t2 - t1) * 1e6)
+        got = itineraries[-1][-1]["arrival"] if itineraries else float("inf")
+        mismatches += got != expected
+        if itineraries:
+            legs.append(len(itineraries[-1]))
+
+    def summary(samples: list[float]) -> dict:
+        ordered = sorted(samples)
+        return {"p50_us": statistics.median(ordered), "p99_us": ordered[int(len(ordered) * 0.99) - 1], "mean_us": statistics.fmean(ordered)}
+
+    results = {"planner": summary(plan_us), "csa_scan": summary(csa_us)}
+    print(f"{'':14} {'p50 us':>10} {'p99 us':>10} {'mean us':>10}")
+    for name, r in results.items():
+        print(f"{name:14} {r['p50_us']:10.1f} {r['p99_us']:10.1f} {r['mean_us']:10.1f}")
+    print(f"earliest-arrival mismatches: {mismatches}, answered: {len(legs)}/{args.queries}, "
+          f"legs in fastest: {dict(sorted((n, legs.count(n)) for n in set(legs)))}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "results": results, "mismatches": mismatches}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
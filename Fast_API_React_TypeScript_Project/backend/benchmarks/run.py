@@ -0,0 +1,139 @@
+# run.py
+# Нагрузочный бенчмарк API. Зависимости (httpx): pip install -r src/requirements-dev.txt
+#
+# В процессе (ASGI, без сети; нужны DATABASE_URL и SECRET_KEY как для приложения;
+# для пустой локальной базы - DB_AUTO_CREATE=true или alembic upgrade head):
+#     cd backend && python benchmarks/run.py --output base.json
+# Против запущенного сервера (uvicorn main:app --workers 4):
+#     python benchmarks/run.py --base-url http://127.0.0.1:8000 --output base.json
+# Сравнение веток:
+#     python benchmarks/compare.py base.json head.json
+# Микробенчмарки горячих путей (JWT, сериализация) - benchmarks/micro.py,
+# время старта воркера - benchmarks/startup.py, JOIN по строковым и целочисленным
+# FK пользователей - benchmarks/joins.py, /posts/search на 1M постов - benchmarks/search.py.
+#
+# Сценарии: login_burst, register_burst, browse_posts, browse_during_login_burst,
+# join_posts, post_crud (--scenarios через запятую). Для каждого эндпоинта: rps,
+# p50/p95/p99, статусы. p99 ленты во время логинов:
+#     python benchmarks/run.py --scenarios browse_during_login_burst --concurrency 50
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+
+from harness import Target, Recorder
+from scenarios import SCENARIOS
+from seed import seed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for the Take passanger API")
+    parser.add_argument("--base-url", help="URL запущенного сервера; без него приложение запускается в процессе")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Сценарии через запятую")
+    parser.add_argument("--concurrency", type=int, default=20, help="Параллельных пользователей")
+    parser.add_argument("--operations", type=int, default=200, help="Операций на сценарий")
+    parser.add_argument("--duration", type=float, help="Секунд на сценарий (вместо --operations)")
+    parser.add_argument("--users", type=int, default=50, help="Пользователей в seed")
+    parser.add_argument("--posts", type=int, default=500, help="Постов в seed")
+    parser.add_argument("--places", type=int, default=100, help="Мест в каждом посте из seed")
+    parser.add_argument("--hot-posts", type=int, default=5, help="Сколько постов делят join_posts")
+    parser.add_argument("--pages", type=int, default=3, help="Страниц /posts за операцию browse_posts")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--prefix", default="bench", help="Префикс имен пользователей seed")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора случайных данных")
+    parser.add_argument("--label", help="Метка прогона в JSON (например, имя ветки)")
+    parser.add_argument("--output", help="Куда записать JSON с результатами")
+    args = parser.parse_args(argv)
+    if args.duration is not None:
+        args.operations = None
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_scenario(name: str, result: dict) -> None:
+    print(f"\n{name}: {result['operations']} ops in {result['wall_seconds']:.2f}s "
+          f"({result['ops_per_second']:.1f} ops/s)")
+    print(f"  {'endpoint':28} {'count':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for label, stats in result["endpoints"].items():
+        print(f"  {label:28} {stats['count']:>6} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} "
+              f"{stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}  {stats['statuses']}")
+    if result["failures"]:
+        print(f"  failures: {result['failures']}")
+
+
+async def run(args) -> dict:
+    async with AsyncExitStack() as stack:
+        if args.base_url:
+            target = Target(base_url=args.base_url)
+        else:
+            sys.path.insert(0, SRC_DIR)
+            import main # noqa: E402 - приложение и его конфигурация только для режима в процессе
+            await stack.enter_async_context(main.app_lifespan(main.app))
+            target = Target(app=main.app)
+
+        started = time.perf_counter()
+        data = await seed(target, users=args.users, posts=args.posts, prefix=args.prefix,
+                          places=args.places, rng_seed=args.seed)
+        print(f"seeded {len(data.usernames)} users, {len(data.post_ids)} posts "
+              f"in {time.perf_counter() - started:.1f}s ({target.name})")
+
+        results = {}
+        for name in args.scenarios.split(","):
+            recorder = Recorder()
+            wall, operations = await SCENARIOS[name](target, data, recorder, args)
+            results[name] = {
+                "wall_seconds": wall,
+                "operations": operations,
+                "ops_per_second": operations / wall if wall else 0.0,
+                **recorder.summary(wall),
+            }
+            print_scenario(name, results[name])
+
+    return {
+        "meta": {
+            "label": args.label,
+            "git_revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "target": args.base_url or "in-process",
+            "python": platform.python_version(),
+            "params": {
+                key: getattr(args, key)
+                for key in ("concurrency", "operations", "duration", "users", "posts", "places",
+                            "hot_posts", "pages", "page_size", "seed")
+            },
+        },
+        "scenarios": results,
+    }
+
+
+def main_cli(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main_cli()
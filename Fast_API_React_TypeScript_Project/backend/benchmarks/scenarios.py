@@ -0,0 +1,169 @@
+# scenarios.py
+# Сценарии нагрузки. Каждый сценарий: async def(target, seed_data, recorder, options)
+# -> (время, число операций). Подготовка (логин пользователей воркеров) не замеряется.
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from harness import Target, Recorder, run_workers
+from seed import SeedData, BENCH_PASSWORD, CAPITALS, login, random_post
+
+
+async def _logged_in_clients(target: Target, data: SeedData, count: int) -> list:
+    """По клиенту на воркер, каждый под своим пользователем из seed."""
+    clients = []
+    for i in range(count):
+        client = target.client()
+        await login(client, data.usernames[i % len(data.usernames)])
+        clients.append(client)
+    return clients
+
+
+async def _close(clients: list) -> None:
+    for client in clients:
+        await client.aclose()
+
+
+async def login_burst(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """Одновременные логины разных пользователей (bcrypt + выдача токена)."""
+    clients = [target.client() for _ in range(options.concurrency)]
+
+    async def operation(worker_id: int, i: int) -> None:
+        client = clients[worker_id]
+        client.cookies.clear()
+        await recorder.request(client, "POST /login", "POST", "/login", data={
+            "username": data.usernames[i % len(data.usernames)], "password": BENCH_PASSWORD,
+        })
+
+    try:
+        return await run_workers(options.concurrency, operation, recorder, options.operations, options.duration)
+    finally:
+        await _close(clients)
+
+
+async def browse_during_login_burst(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """
+    Первая страница /posts у залогиненных пользователей, пока другие --concurrency
+    клиентов одновременно логинятся: p99 "GET /posts" показывает, не ждет ли лента bcrypt
+    (event loop, пул auth.hashing, соединения БД). Логинов столько же, сколько чтений, -
+    чтения заканчиваются раньше и целиком попадают в burst.
+    """
+    readers = await _logged_in_clients(target, data, options.concurrency)
+    logins = [target.client() for _ in range(options.concurrency)]
+
+    async def read(worker_id: int, i: int) -> None:
+        await recorder.request(readers[worker_id], "GET /posts", "GET", "/posts", params={"limit": options.page_size})
+
+    async def login(worker_id: int, i: int) -> None:
+        client = logins[worker_id]
+        client.cookies.clear()
+        await recorder.request(client, "POST /login", "POST", "/login", data={
+            "username": data.usernames[i % len(data.usernames)], "password": BENCH_PASSWORD,
+        })
+
+    try:
+        (read_wall, reads), (login_wall, logins_done) = await asyncio.gather(
+            run_workers(options.concurrency, read, recorder, options.operations, options.duration),
+            run_workers(options.concurrency, login, recorder, options.operations, options.duration),
+        )
+        return max(read_wall, login_wall), reads + logins_done
+    finally:
+        await _close(readers + logins)
+
+
+async def register_burst(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """Регистрация новых пользователей (bcrypt + INSERT)."""
+    clients = [target.client() for _ in range(options.concurrency)]
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+
+    async def operation(worker_id: int, i: int) -> None:
+        name = f"{data.prefix}_reg_{run_id}_{i}"
+        await recorder.request(clients[worker_id], "POST /register", "POST", "/register", json={
+            "user": name, "email": f"{name}@bench.example.com", "role": "user", "password": BENCH_PASSWORD,
+        })
+
+    try:
+        return await run_workers(options.concurrency, operation, recorder, options.operations, options.duration)
+    finally:
+        await _close(clients)
+
+
+async def browse_posts(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """Просмотр: лента /posts с переходом по курсору, карточка поста, поиск."""
+    clients = await _logged_in_clients(target, data, options.concurrency)
+    rng = random.Random(options.seed)
+
+    async def operation(worker_id: int, i: int) -> None:
+        client = clients[worker_id]
+        cursor = None
+        for _ in range(options.pages):
+            params = {"limit": options.page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = await recorder.request(client, "GET /posts", "GET", "/posts", params=params)
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        if data.post_ids:
+            post_id = rng.choice(data.post_ids)
+            await recorder.request(client, "GET /{post_id}/post", "GET", f"/{post_id}/post")
+        trip_from, trip_to = rng.sample(CAPITALS, 2)
+        await recorder.request(client, "GET /posts/search", "GET", "/posts/search", params={
+            "trip_from": trip_from, "trip_to": trip_to, "limit": options.page_size,
+        })
+
+    try:
+        return await run_workers(options.concurrency, operation, recorder, options.operations, options.duration)
+    finally:
+        await _close(clients)
+
+
+async def join_posts(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """
+    Конкурентные записи в небольшой набор "горячих" постов: гонка за места.
+    400 (уже участник / мест нет) - ожидаемый исход, считается в statuses.
+    """
+    clients = await _logged_in_clients(target, data, options.concurrency)
+    hot_posts = data.post_ids[:options.hot_posts]
+    if not hot_posts:
+        raise RuntimeError("join_posts needs seeded posts")
+
+    async def operation(worker_id: int, i: int) -> None:
+        post_id = hot_posts[i % len(hot_posts)]
+        await recorder.request(clients[worker_id], "POST /{post_id}/members", "POST", f"/{post_id}/members")
+
+    try:
+        return await run_workers(options.concurrency, operation, recorder, options.operations, options.duration)
+    finally:
+        await _close(clients)
+
+
+async def post_crud(target: Target, data: SeedData, recorder: Recorder, options) -> tuple[float, int]:
+    """Полный цикл поста: создание, изменение, удаление."""
+    clients = await _logged_in_clients(target, data, options.concurrency)
+    rng = random.Random(options.seed)
+
+    async def operation(worker_id: int, i: int) -> None:
+        client = clients[worker_id]
+        response = await recorder.request(client, "POST /posts", "POST", "/posts", json=random_post(rng, 4))
+        response.raise_for_status()
+        post_id = response.json()["post_id"]
+        update = random_post(rng, 5)
+        update["departure_datetime"] = (datetime.now(timezone.utc) + timedelta(days=30)).isoformat()
+        await recorder.request(client, "PUT /{post_id}/post", "PUT", f"/{post_id}/post", json=update)
+        await recorder.request(client, "DELETE /{post_id}/post", "DELETE", f"/{post_id}/post")
+
+    try:
+        return await run_workers(options.concurrency, operation, recorder, options.operations, options.duration)
+    finally:
+        await _close(clients)
+
+
+SCENARIOS = {
+    "login_burst": login_burst,
+    "register_burst": register_burst,
+    "browse_posts": browse_posts,
+    "browse_during_login_burst": browse_during_login_burst,
+    "join_posts": join_posts,
+    "post_crud": post_crud,
+}
@@ -0,0 +1,119 @@
+# search.py
+# GET /posts/search на большом числе постов: posts.search_posts (индекс ix_posts_search)
+# на случайных запросах "маршрут + окно отправления [+ свободные места]", первая страница
+# и переход по курсору на вторую. Латентность - p50/p99 на страницу.
+#     cd backend && DATABASE_URL=postgresql+asyncpg://... python benchmarks/search.py --posts 1000000
+# Посты пишет и удаляет matching.seed/cleanup (пользователь bench_match_owner, --keep -
+# оставить). На Postgres в отчет попадает EXPLAIN (ANALYZE, BUFFERS) типичного запроса -
+# видно, что план идет по ix_posts_search, а не Seq Scan по posts.
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from sqlalchemy import select, text
+
+import matching # первым: добавляет src в sys.path
+import models
+from database import AsyncSessionFactory, engine
+from enums import CountriesCapitals, PostStatus
+from posts import posts
+
+
+def random_search(rng: random.Random, days: int) -> dict:
+    query = matching.random_query(rng, days)
+    return {
+        "trip_from": CountriesCapitals(query["trip_from"]),
+        "trip_to": CountriesCapitals(query["trip_to"]),
+        "departure_from": query["at"],
+        "departure_to": query["at"] + timedelta(days=rng.choice((1, 3, 7))),
+        "only_free_seats": rng.random() < 0.8, # как в API: по умолчанию только со свободными местами
+        "limit": query["limit"],
+    }
+
+
+async def explain(db, query: dict) -> list[str]:
+    stmt = select(models.Post).where(
+        models.Post.status == PostStatus.ACTIVE,
+        models.Post.trip_from == query["trip_from"],
+        models.Post.trip_to == query["trip_to"],
+        models.Post.departure_datetime >= query["departure_from"],
+        models.Post.departure_datetime <= query["departure_to"],
+        models.Post.already_engaged < models.Post.count_of_places,
+    ).order_by(models.Post.departure_datetime, models.Post.post_id).limit(query["limit"] + 1)
+    compiled = stmt.compile(engine.sync_engine, compile_kwargs={"literal_binds": True})
+    rows = await db.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}"))
+    return [row[0] for row in rows]
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    plan = None
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.create_all)
+        await matching.cleanup() # остатки прошлого прогона с --keep
+        started = time.perf_counter()
+        await matching.seed(rng, args.posts, args.days)
+        print(f"seeded {args.posts} posts in {time.perf_counter() - started:.1f}s")
+
+        queries = [random_search(rng, args.days) for _ in range(args.queries)]
+        first_ms, next_ms, found = [], [], 0
+        async with AsyncSessionFactory() as db:
+            for q in queries:
+                t0 = time.perf_counter()
+                page, cursor = await posts.search_posts(db, **q)
+                first_ms.append((time.perf_counter() - t0) * 1000)
+                found += len(page)
+                if cursor is not None:
+                    t0 = time.perf_counter()
+                    await posts.search_posts(db, **q, cursor=cursor)
+                    next_ms.append((time.perf_counter() - t0) * 1000)
+                db.expunge_all() # identity map не растет за прогон
+            if engine.dialect.name == "postgresql":
+                plan = await explain(db, queries[0])
+    finally:
+        if not args.keep:
+            await matching.cleanup()
+        await engine.dispose()
+
+    def summary(samples: list[float]) -> dict:
+        if not samples:
+            return {"count": 0}
+        ordered = sorted(samples)
+        return {
+            "count": len(ordered), "p50_ms": statistics.median(ordered),
+            "p99_ms": ordered[max(0, int(len(ordered) * 0.99) - 1)], "max_ms": ordered[-1],
+        }
+
+    results = {"first_page": summary(first_ms), "next_page": summary(next_ms)}
+    print(f"{'':12} {'count':>6} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, r in results.items():
+        if r["count"]:
+            print(f"{name:12} {r['count']:6} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['max_ms']:8.2f}")
+    print(f"avg posts on first page: {found / len(queries):.1f}")
+    if plan:
+        print("\n".join(plan))
+    return {"dialect": engine.dialect.name, "params": vars(args), "results": results, "plan": plan}
+
+
+def main_cli(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="GET /posts/search latency on a large posts table")
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=90, help="Отправления равномерно на столько дней вперед")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Не удалять посты bench_match_owner после прогона")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
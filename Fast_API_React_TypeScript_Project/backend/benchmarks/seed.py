@@ -0,0 +1,85 @@
+# seed.py
+# Наполнение базы для бенчмарков через сам API: админ, пользователи (/users/bulk)
+# и посты (/posts/bulk). Повторный запуск с тем же префиксом не создает дублей
+# пользователей (bulk пропускает занятые имена), посты добавляются.
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from harness import Target
+
+BENCH_PASSWORD = "bench-password"
+CAPITALS = ("london", "berlin", "paris", "kyiv")
+SEED_CHUNK = 500
+
+
+@dataclass
+class SeedData:
+    prefix: str
+    admin: str
+    usernames: list[str] = field(default_factory=list)
+    post_ids: list[int] = field(default_factory=list)
+
+
+def username(prefix: str, i: int) -> str:
+    return f"{prefix}_user_{i}"
+
+
+def random_post(rng: random.Random, places: int) -> dict:
+    trip_from, trip_to = rng.sample(CAPITALS, 2)
+    departure = datetime.now(timezone.utc) + timedelta(days=rng.randint(7, 90), minutes=rng.randint(0, 1440))
+    return {
+        "trip_from": trip_from,
+        "trip_to": trip_to,
+        "departure_datetime": departure.isoformat(),
+        "count_of_places": places,
+    }
+
+
+async def login(client, user: str, password: str = BENCH_PASSWORD) -> None:
+    response = await client.post("/login", data={"username": user, "password": password})
+    response.raise_for_status()
+
+
+def _raise_for_bulk_status(response) -> None:
+    if response.status_code == 403:
+        raise RuntimeError(f"{response.request.url.path}: seed admin is not an admin ({response.text})")
+    response.raise_for_status()
+
+
+async def ensure_admin(target: Target, prefix: str) -> str:
+    """Регистрирует <prefix>_admin и выдает ему роль admin (PUT /users/{id})."""
+    admin = f"{prefix}_admin"
+    async with target.client() as client:
+        await client.post("/register", json={
+            "user": admin, "email": f"{admin}@bench.example.com", "role": "user", "password": BENCH_PASSWORD,
+        }) # 400, если уже есть - дальше логин
+        await login(client, admin)
+        me = (await client.get("/users/me")).json()
+        if me["role"] != "admin":
+            response = await client.put(f"/users/{me['id']}", json={
+                "user": admin, "email": me["email"], "role": "admin",
+            })
+            response.raise_for_status()
+    return admin
+
+
+async def seed(target: Target, users: int, posts: int, prefix: str = "bench",
+               places: int = 100, rng_seed: int = 42) -> SeedData:
+    rng = random.Random(rng_seed)
+    data = SeedData(prefix=prefix, admin=await ensure_admin(target, prefix))
+    data.usernames = [username(prefix, i) for i in range(users)]
+    async with target.client() as client:
+        await login(client, data.admin)
+        for start in range(0, users, SEED_CHUNK):
+            rows = [
+                {"user": name, "email": f"{name}@bench.example.com", "role": "user", "password": BENCH_PASSWORD}
+                for name in data.usernames[start:start + SEED_CHUNK]
+            ]
+            _raise_for_bulk_status(await client.post("/users/bulk", json=rows))
+        for start in range(0, posts, SEED_CHUNK):
+            rows = [random_post(rng, places) for _ in range(min(SEED_CHUNK, posts - start))]
+            response = await client.post("/posts/bulk", json=rows)
+            _raise_for_bulk_status(response)
+            data.post_ids.extend(post["post_id"] for post in response.json()["created"])
+    return data
@@ -0,0 +1,73 @@
+# startup.py
+# Время старта воркера: импорт main + lifespan (проверка схемы, прогрев пула,
+# загрузка denylist) в отдельном процессе, как у свежего uvicorn-воркера.
+#     cd backend && python benchmarks/startup.py --runs 5 --budget-ms 1500
+# Код выхода 1, если медиана превышает бюджет. Что именно импортируется долго:
+#     cd backend/src && python -X importtime -c "import main" 2> importtime.txt
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Дочерний процесс: замер импорта снаружи и тайминги из app.state.startup_timings
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def boot():
+    async with main.app_lifespan(main.app):
+        ready = time.perf_counter()
+        timings = dict(main.app.state.startup_timings)
+    return ready, timings
+
+ready, timings = asyncio.run(boot())
+timings["import_wall_ms"] = (imported - started) * 1000
+timings["ready_wall_ms"] = (ready - started) * 1000
+sys.stdout.write("STARTUP_TIMINGS " + json.dumps(timings) + "\\n")
+"""
+
+
+def run_once() -> dict:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=SRC_DIR, capture_output=True, text=True, check=False,
+    )
+    total_ms = (time.perf_counter() - started) * 1000
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP_TIMINGS "):
+            timings = json.loads(line.split(" ", 1)[1])
+            timings["process_ms"] = total_ms
+            return timings
+    raise RuntimeError(f"worker failed to start:\n{result.stderr[-2000:]}")
+
+
+def main_cli(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Worker startup time benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Бюджет медианы ready_wall_ms")
+    parser.add_argument("--output")
+    args = parser.parse_args(argv)
+
+    runs = [run_once() for _ in range(args.runs)]
+    summary = {}
+    for key in ("import_wall_ms", "startup_ms", "ready_wall_ms", "process_ms"):
+        values = [run[key] for run in runs]
+        summary[key] = {"median": statistics.median(values), "max": max(values)}
+        print(f"{key:16} median {summary[key]['median']:8.1f} ms   max {summary[key]['max']:8.1f} ms")
+    over_budget = summary["ready_wall_ms"]["median"] > args.budget_ms
+    print(f"budget {args.budget_ms:.0f} ms: {'EXCEEDED' if over_budget else 'ok'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"budget_ms": args.budget_ms, "summary": summary, "runs": runs}, f, indent=2)
+    return 1 if over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,4 +1,5 @@
 import os
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import  Depends, HTTPException, status, Cookie
@@ -9,6 +10,10 @@ import models
 from enums import UserRole
 import crud
 import exceptrions
+from auth.principal_cache import principal_cache
+from auth.token_cache import token_cache
+from auth import denylist
+from auth.hashing import pwd_context, password_hasher, hash_password_sync, verify_password_sync
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from dotenv import load_dotenv
@@ -26,14 +31,21 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 4 # 1 часов
 if not SECRET_KEY:
     raise ValueError("SECRET_KEY не установлена в .env")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 def hash_password(password: str)-> str:
-    return pwd_context.hash(password)
+    """Синхронное хеширование. В async-коде используйте hash_password_async."""
+    return hash_password_sync(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Проверяет пароль по хешу."""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Проверяет пароль по хешу. В async-коде используйте verify_password_async."""
+    return verify_password_sync(plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Хеширует пароль в пуле auth.hashing, не блокируя event loop."""
+    return await password_hasher.hash(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Проверяет пароль в пуле auth.hashing, не блокируя event loop."""
+    return await password_hasher.verify(plain_password, hashed_password)
 
 # --- Работа с JWT ---
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -43,7 +55,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc)}) # Добавляем время выдачи
+    # Добавляем время выдачи и уникальный id токена (jti) - по нему токен можно отозвать
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -51,12 +64,17 @@ def decode_token_payload(token: str) -> Optional[dict]:
     """
     Декодирует токен и возвращает его payload (содержимое).
     Возвращает None, если токен невалиден или истек.
+    Уже проверенный токен берется из token_cache до своего exp - без повторного jwt.decode.
     """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         # Проверяем наличие обязательного поля 'sub' (subject)
         if "sub" not in payload:
              return None
+        token_cache.put(token, payload)
         return payload
     except JWTError: # Ловит ExpiredSignatureError, JWTClaimsError, и др.
         return None
@@ -90,10 +108,22 @@ async def get_current_user(
         # print("Authentication failed: Token payload missing 'sub'") # Отладка
         raise exceptrions.credentials_exception
 
+    # Отозванный токен (logout) - проверка по in-memory множеству, без запроса к БД
+    if denylist.is_revoked(payload.get("jti")):
+        raise exceptrions.credentials_exception
+
+    # Сначала кэш: (sub, iat) -> пользователь. merge(load=False) привязывает
+    # копию к текущей сессии без SQL-запроса.
+    iat = payload.get("iat")
+    cached_user = principal_cache.get(username, iat)
+    if cached_user is not None:
+        return await db.merge(cached_user, load=False)
+
     user = await crud.get_user_by_username(db, username=username)
     if user is None:
         # print(f"Authentication failed: User '{username}' not found in DB") # Отладка
         raise exceptrions.credentials_exception
+    principal_cache.put(username, iat, user)
 
     # Можно добавить проверку активности пользователя: if not user.is_active: raise ...
     # print(f"Authentication successful for user: {user.username} (ID: {user.id})") # Отладка
@@ -0,0 +1,158 @@
+# denylist.py
+# Отзыв JWT (logout). Источник правды - таблица denylisted_tokens (jti, expires_at).
+# Перед ней в каждом воркере стоит словарь jti -> exp: проверка на горячем пути
+# (auth.get_current_user) - один поиск в dict без запроса к БД.
+# Фоновая задача каждого воркера раз в DENYLIST_SYNC_INTERVAL_SECONDS подтягивает
+# jti, отозванные другими воркерами, и выбрасывает истекшие.
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import models
+from database import AsyncSessionFactory
+
+logger = logging.getLogger("app.auth.denylist")
+
+
+class RevokedTokenSet:
+    """In-process множество отозванных jti с временем истечения токена."""
+
+    def __init__(self):
+        self._expires_at: dict[str, float] = {}
+        self.synced_until: Optional[datetime] = None
+        self.last_sync_monotonic: Optional[float] = None
+
+    def add(self, jti: str, expires_at: datetime) -> None:
+        self._expires_at[jti] = expires_at.timestamp()
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._expires_at
+
+    def __len__(self) -> int:
+        return len(self._expires_at)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """Удаляет jti уже истекших токенов - они и так не пройдут проверку exp."""
+        now = time.time() if now is None else now
+        expired = [jti for jti, exp in self._expires_at.items() if exp < now]
+        for jti in expired:
+            del self._expires_at[jti]
+        return len(expired)
+
+
+revoked_tokens = RevokedTokenSet()
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite в разработке возвращает naive datetime - считаем его UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+_sync_task: Optional[asyncio.Task] = None
+
+
+def is_revoked(jti: Optional[str]) -> bool:
+    """Горячий путь: O(1), без обращения к БД."""
+    return jti is not None and jti in revoked_tokens
+
+
+async def add_jti_to_db_denylist(db: AsyncSession, jti: str, expires_at: datetime) -> None:
+    """Отзывает токен: запись в таблицу (для других воркеров) и в локальное множество."""
+    expires_at = _as_utc(expires_at)
+    existing = await db.get(models.DenylistedToken, jti)
+    if existing is None:
+        db.add(models.DenylistedToken(jti=jti, expires_at=expires_at))
+        await db.commit()
+    revoked_tokens.add(jti, expires_at)
+
+
+async def sync_from_db() -> int:
+    """
+    Подтягивает jti, отозванные с момента прошлой синхронизации (с перекрытием
+    окна), и чистит истекшие. При первом вызове грузит все действующие записи.
+    Возвращает число прочитанных строк.
+    """
+    now_utc = datetime.now(timezone.utc)
+    stmt = select(models.DenylistedToken.jti, models.DenylistedToken.expires_at, models.DenylistedToken.created_at)
+    if revoked_tokens.synced_until is None:
+        stmt = stmt.where(models.DenylistedToken.expires_at > now_utc)
+    else:
+        overlap = timedelta(seconds=config.DENYLIST_SYNC_OVERLAP_SECONDS)
+        stmt = stmt.where(models.DenylistedToken.created_at > revoked_tokens.synced_until - overlap)
+    async with AsyncSessionFactory() as session:
+        rows = (await session.execute(stmt)).all()
+    newest = revoked_tokens.synced_until
+    for row in rows:
+        revoked_tokens.add(row.jti, _as_utc(row.expires_at))
+        created_at = _as_utc(row.created_at) if row.created_at is not None else None
+        if created_at is not None and (newest is None or created_at > newest):
+            newest = created_at
+    revoked_tokens.synced_until = newest or now_utc
+    revoked_tokens.last_sync_monotonic = time.monotonic()
+    revoked_tokens.sweep()
+    return len(rows)
+
+
+async def _sync_loop() -> None:
+    while True:
+        try:
+            await sync_from_db()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Denylist sync failed: %s", e)
+        await asyncio.sleep(config.DENYLIST_SYNC_INTERVAL_SECONDS)
+
+
+async def start_sync() -> None:
+    """Начальная загрузка и фоновая синхронизация (вызывается из lifespan)."""
+    global _sync_task
+    if _sync_task is not None:
+        return
+    try:
+        await sync_from_db()
+    except Exception as e:
+        logger.warning("Denylist initial load failed: %s", e)
+    _sync_task = asyncio.create_task(_sync_loop(), name="denylist-sync")
+
+
+async def stop_sync() -> None:
+    global _sync_task
+    if _sync_task is None:
+        return
+    _sync_task.cancel()
+    try:
+        await _sync_task
+    except asyncio.CancelledError:
+        pass
+    _sync_task = None
+
+
+async def cleanup_expired_denylist_tokens() -> int:
+    """
+    Удаляет из таблицы записи об уже истекших токенах.
+    Запускается планировщиком (scheduler/scheduler.py).
+    """
+    async with AsyncSessionFactory() as session:
+        result = await session.execute(
+            delete(models.DenylistedToken).where(models.DenylistedToken.expires_at < datetime.now(timezone.utc))
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info("Denylist cleanup: deleted %s expired tokens.", result.rowcount)
+    return result.rowcount
+
+
+def stats() -> dict:
+    return {
+        "size": len(revoked_tokens),
+        "synced_until": revoked_tokens.synced_until,
+        "seconds_since_sync": (
+            time.monotonic() - revoked_tokens.last_sync_monotonic
+            if revoked_tokens.last_sync_monotonic is not None else None
+        ),
+    }
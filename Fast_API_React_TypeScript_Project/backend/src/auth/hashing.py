@@ -0,0 +1,117 @@
+# hashing.py
+# bcrypt вне event loop: хеширование и проверка пароля выполняются в пуле
+# потоков или процессов с ограничением одновременных задач.
+# Один вызов bcrypt занимает ~200-300 мс - в async-обработчике он блокировал бы
+# все остальные запросы воркера.
+import asyncio
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+import config
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+# Функции верхнего уровня - их можно передать в ProcessPoolExecutor (pickle).
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password_sync(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+class PasswordHasherPool:
+    """
+    Ограниченный пул для bcrypt.
+    Семафор ограничивает число задач в пуле; ожидающие задачи считаются
+    очередью (queue_depth) - это видно в stats(). Семафор свой у каждого event
+    loop: asyncio.Semaphore привязывается к loop первого ожидания, а пул - объект
+    модуля и переживает loop (тесты, повторный запуск lifespan).
+    """
+
+    def __init__(self, executor_kind: str, workers: int, max_concurrency: int):
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"Unknown PASSWORD_HASH_EXECUTOR: {executor_kind!r}")
+        self.executor_kind = executor_kind
+        self.workers = max(1, workers)
+        self.max_concurrency = max(1, max_concurrency)
+        self._executor: Optional[Executor] = None
+        self._semaphores = weakref.WeakKeyDictionary() # event loop -> asyncio.Semaphore
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def _run(self, func, *args):
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queue_depth -= 1
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - queued_at
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password_sync, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password_sync, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "avg_wait_ms": (self.total_wait_seconds / self.completed * 1000) if self.completed else 0.0,
+            "avg_run_ms": (self.total_run_seconds / self.completed * 1000) if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasherPool(
+    executor_kind=config.PASSWORD_HASH_EXECUTOR,
+    workers=config.PASSWORD_HASH_WORKERS,
+    max_concurrency=config.PASSWORD_HASH_MAX_CONCURRENCY,
+)
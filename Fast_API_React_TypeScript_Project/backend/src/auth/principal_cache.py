@@ -0,0 +1,109 @@
+# principal_cache.py
+# Кэш аутентифицированных пользователей для auth.get_current_user.
+# Ключ - (sub, iat) токена: новый логин дает новый ключ, старые записи
+# вытесняются по TTL/LRU. crud.update_user и crud.delete_user сбрасывают
+# все записи пользователя.
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+
+import config
+import models
+
+
+def _detached_snapshot(user: models.User) -> models.User:
+    """
+    Копия колонок пользователя, не связанная ни с одной сессией.
+    Сам объект из запроса кэшировать нельзя: rollback/expire его сессии
+    сделает его "протухшим", и следующий запрос полезет за ним в БД.
+    """
+    snapshot = models.User(
+        id=user.id,
+        user=user.user,
+        password=user.password,
+        email=user.email,
+        role=user.role,
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+class PrincipalCache:
+    """
+    LRU-кэш с TTL: (username, iat) -> отсоединенная копия models.User.
+    Работает в одном event loop, поэтому блокировки не нужны (в методах нет await).
+    """
+
+    def __init__(self, ttl_seconds: float, max_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, tuple[float, models.User]] = OrderedDict()
+        self._keys_by_user: dict[str, set[tuple]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, username: str, iat: Optional[int]) -> Optional[models.User]:
+        key = (username, iat)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._discard(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user
+
+    def put(self, username: str, iat: Optional[int], user: models.User) -> None:
+        if self.max_size <= 0 or self.ttl_seconds <= 0:
+            return
+        key = (username, iat)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, _detached_snapshot(user))
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(username, set()).add(key)
+        while len(self._entries) > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._discard(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, username: str) -> None:
+        """Удаляет все записи пользователя (после изменения или удаления)."""
+        for key in self._keys_by_user.pop(username, set()):
+            self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _discard(self, key: tuple) -> None:
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+principal_cache = PrincipalCache(
+    ttl_seconds=config.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_size=config.PRINCIPAL_CACHE_MAX_SIZE,
+)
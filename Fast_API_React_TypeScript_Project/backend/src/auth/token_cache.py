@@ -0,0 +1,86 @@
+# token_cache.py
+# Кэш уже проверенных JWT для auth.decode_token_payload.
+# Один и тот же cookie приходит тысячи раз за 4 часа жизни токена; полный
+# jwt.decode (HMAC-SHA256, base64, JSON, проверка claims) нужен только в первый раз.
+# Ключ - SHA-256 токена (сами токены в памяти не храним), значение - payload.
+# Запись живет до exp токена, поэтому истекший токен из кэша не вернется.
+# Отзыв (logout) кэш не обходит: denylist проверяется уже по payload, после кэша.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import config
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+class VerifiedTokenCache:
+    """
+    LRU: sha256(token) -> (exp, payload). Неудачные проверки не кэшируются.
+    В отличие от principal_cache, под threading.Lock: decode_token_payload - обычная
+    синхронная функция, и ее можно вызвать из потока (run_in_threadpool, sync-эндпоинт).
+    Возвращаемый payload общий для всех запросов с этим токеном - только для чтения.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        key = _digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            exp, payload = entry
+            if exp <= time.time(): # exp - wall clock, как у jose
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return # токены без exp не кэшируем: у записи не было бы срока
+        key = _digest(token)
+        with self._lock:
+            self._entries[key] = (exp, payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(_digest(token), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+
+token_cache = VerifiedTokenCache(max_size=config.TOKEN_CACHE_MAX_SIZE)
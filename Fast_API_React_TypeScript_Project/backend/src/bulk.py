@@ -0,0 +1,55 @@
+# bulk.py
+# Общие помощники для bulk-эндпоинтов (POST /users/bulk, /posts/bulk,
+# /users/{user_id}/items/bulk): построчная валидация, нарезка на пачки,
+# INSERT ... ON CONFLICT DO NOTHING для текущего диалекта.
+from typing import Any, Iterator, Sequence, Type, TypeVar
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def check_batch_size(rows: Sequence[Any]) -> None:
+    if len(rows) > config.BULK_MAX_ROWS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many rows in one request: {len(rows)} > {config.BULK_MAX_ROWS}.",
+        )
+
+
+def row_error(index: int, detail: Any) -> dict:
+    return {"index": index, "detail": detail}
+
+
+def validate_rows(rows: Sequence[Any], schema: Type[ModelT]) -> tuple[list[tuple[int, ModelT]], list[dict]]:
+    """
+    Валидирует каждую строку отдельно: ошибка в одной строке не отменяет пачку.
+    Возвращает ([(индекс, модель)], [ошибки строк]).
+    """
+    valid: list[tuple[int, ModelT]] = []
+    errors: list[dict] = []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as e:
+            errors.append(row_error(index, [
+                {"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors(include_url=False)
+            ]))
+    return valid, errors
+
+
+def chunked(items: Sequence[Any], size: int = 0) -> Iterator[Sequence[Any]]:
+    size = size or config.BULK_INSERT_CHUNK_SIZE
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_ignore_conflicts(db: AsyncSession, table):
+    """INSERT ... ON CONFLICT DO NOTHING для диалекта сессии (Postgres, SQLite в разработке)."""
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table).on_conflict_do_nothing()
@@ -0,0 +1,98 @@
+# conditional.py
+# Условные HTTP-запросы: ETag / Last-Modified и ответ 304 Not Modified.
+# Валидатор считается ДО сериализации ответа: если клиент прислал
+# If-None-Match с тем же ETag (или If-Modified-Since не раньше Last-Modified),
+# эндпоинт возвращает пустой 304 и не строит тело.
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+# Клиент обязан перепроверять ответ, но может использовать его при 304
+CACHE_CONTROL = "no-cache"
+
+
+def weak_etag(*parts: Any) -> str:
+    """Слабый ETag из частей (post_id, updated_at, ...): W/"<16 hex>"."""
+    digest = hashlib.blake2b(digest_size=8)
+    for part in parts:
+        digest.update(repr(part).encode())
+        digest.update(b"\x1f")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match со слабым сравнением (RFC 9110, 13.1.2)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    expected = _strip_weak(etag)
+    return any(_strip_weak(candidate) == expected for candidate in header.split(","))
+
+
+def not_modified_since(request: Request, last_modified: Optional[datetime]) -> bool:
+    """If-Modified-Since учитывается, только если клиент не прислал If-None-Match."""
+    if last_modified is None or "if-none-match" in request.headers:
+        return False
+    header = request.headers.get("if-modified-since")
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP-дата с точностью до секунды
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    return etag_matches(request, etag) or not_modified_since(request, last_modified)
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+
+def latest(values: Iterable[Optional[datetime]]) -> Optional[datetime]:
+    present = [_as_utc(v) for v in values if v is not None]
+    return max(present) if present else None
+
+
+class PrecomputedJSON:
+    """
+    Неизменяемый JSON-ответ, сериализованный один раз при старте:
+    готовые байты тела и ETag от их хеша (для справочников-enum).
+    """
+
+    def __init__(self, content: Any):
+        self.body = json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+        self.etag = f'W/"{hashlib.blake2b(self.body, digest_size=8).hexdigest()}"'
+
+    def response(self, request: Request) -> Response:
+        if etag_matches(request, self.etag):
+            return not_modified(self.etag)
+        return Response(content=self.body, media_type="application/json", headers=validator_headers(self.etag))
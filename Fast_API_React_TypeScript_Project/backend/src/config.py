@@ -0,0 +1,146 @@
+# config.py
+# Настройки приложения из переменных окружения (.env).
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Кэш аутентифицированных пользователей (auth/principal_cache.py) ---
+# Сколько секунд пользователь из токена живет в кэше без обращения к БД.
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+# Максимальное число записей; самые старые вытесняются (LRU).
+PRINCIPAL_CACHE_MAX_SIZE = int(os.getenv("PRINCIPAL_CACHE_MAX_SIZE", "1024"))
+
+# --- Кэш проверенных JWT (auth/token_cache.py) ---
+# Максимальное число токенов; запись живет до exp токена, самые старые вытесняются (LRU).
+# 0 - выключить кэш (каждый запрос - полный jwt.decode).
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "4096"))
+
+# --- Ограничение частоты запросов (rate_limit.py) ---
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# "memory" - лимиты в каждом воркере свои, "postgres" - общая таблица rate_limits
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+# Переопределение политик: "login_user=10/60/5,write_user=120/60" (запросов/секунд[/burst])
+RATE_LIMITS = os.getenv("RATE_LIMITS", "")
+# Максимум ключей в памяти воркера; при переполнении выбрасываются истекшие, затем самые старые
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+# Сколько прокси перед приложением дописывают X-Forwarded-For (0 - адрес TCP-соединения)
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+# Как часто удалять истекшие ключи из rate_limits (только для postgres)
+RATE_LIMIT_CLEANUP_INTERVAL_SECONDS = int(os.getenv("RATE_LIMIT_CLEANUP_INTERVAL_SECONDS", "300"))
+
+# --- Idempotency-Key для POST /posts и POST /{post_id}/members (idempotency.py) ---
+# Сколько хранится сохраненный ответ
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# Через сколько незавершенный запрос (воркер упал) считается брошенным и ключ можно занять снова
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+# Сколько повтор ждет выполняющийся запрос с тем же ключом, прежде чем ответить 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+# Интервал опроса таблицы, если запрос выполняет другой воркер
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.1"))
+# Сохраненных ответов в памяти воркера
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Как часто удалять истекшие ключи из idempotency_keys
+IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS = int(os.getenv("IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS", "900"))
+
+# --- Пул для bcrypt (auth/hashing.py) ---
+# "thread" - ThreadPoolExecutor (bcrypt отпускает GIL), "process" - ProcessPoolExecutor.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+# Число воркеров пула.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Сколько хеширований одновременно отдается в пул; остальные ждут в очереди.
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", str(PASSWORD_HASH_WORKERS)))
+
+# --- Планировщик фоновых задач (scheduler/scheduler.py) ---
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Архивация постов с прошедшей датой отправления
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "60"))
+# Сколько постов переводится в ARCHIVED одним UPDATE
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+# Пауза между пачками, чтобы не держать блокировки и не забивать WAL
+ARCHIVE_BATCH_SLEEP_SECONDS = float(os.getenv("ARCHIVE_BATCH_SLEEP_SECONDS", "0.1"))
+
+# --- Массовые операции (bulk.py) ---
+# Строк в одном многострочном INSERT ... RETURNING (и в одной транзакции)
+BULK_INSERT_CHUNK_SIZE = int(os.getenv("BULK_INSERT_CHUNK_SIZE", "500"))
+# Максимум строк в одном bulk-запросе
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "5000"))
+
+# --- Отзыв токенов (auth/denylist.py) ---
+# Как часто воркер подтягивает из БД jti, отозванные другими воркерами
+DENYLIST_SYNC_INTERVAL_SECONDS = float(os.getenv("DENYLIST_SYNC_INTERVAL_SECONDS", "2"))
+# Перекрытие окна синхронизации (транзакции могут закоммититься не по порядку created_at)
+DENYLIST_SYNC_OVERLAP_SECONDS = float(os.getenv("DENYLIST_SYNC_OVERLAP_SECONDS", "10"))
+# Как часто удаляются истекшие записи из таблицы denylisted_tokens
+DENYLIST_CLEANUP_INTERVAL_SECONDS = int(os.getenv("DENYLIST_CLEANUP_INTERVAL_SECONDS", "900"))
+
+# --- Логирование (logging_config.py) ---
+# Уровень по умолчанию для всех логгеров
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Уровни подсистем: "app.sql=DEBUG,app.posts=WARNING,sqlalchemy.engine=WARNING"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# Логирование SQL: "off" - выключено, "slow" - только медленные запросы,
+# "sample" - медленные + доля SQL_LOG_SAMPLE_RATE остальных, "all" - все запросы
+SQL_LOG_MODE = os.getenv("SQL_LOG_MODE", "slow").lower()
+# Порог медленного запроса, мс
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Доля запросов, попадающих в лог в режиме "sample" (0..1)
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+
+# --- Реплика для чтения (database.py, replica.py) ---
+# Адрес реплики задается DATABASE_REPLICA_URL рядом с DATABASE_URL.
+# Реплика с лагом больше этого значения не используется - чтения идут в основную БД
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# Как часто проверяется лаг реплики
+REPLICA_LAG_CHECK_INTERVAL_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL_SECONDS", "2"))
+
+# --- Старт приложения (main.app_lifespan, schema_check.py) ---
+# Проверка, что база на head-ревизии Alembic: "warn" - предупреждение в лог,
+# "strict" - воркер не стартует, "off" - без проверки
+SCHEMA_CHECK_MODE = os.getenv("SCHEMA_CHECK_MODE", "warn").lower()
+# Создавать таблицы через metadata.create_all при старте (только для локальной разработки;
+# в остальных случаях схема создается "alembic upgrade head")
+DB_AUTO_CREATE = os.getenv("DB_AUTO_CREATE", "false").lower() in ("1", "true", "yes")
+# Сколько соединений пула открыть параллельно при старте (0 - не прогревать)
+DB_POOL_WARMUP_CONNECTIONS = int(os.getenv("DB_POOL_WARMUP_CONNECTIONS", "2"))
+
+# --- Push изменений постов по WebSocket (realtime/realtime.py) ---
+REALTIME_ENABLED = os.getenv("REALTIME_ENABLED", "true").lower() in ("1", "true", "yes")
+# Канал Postgres LISTEN/NOTIFY для событий постов
+REALTIME_CHANNEL = os.getenv("REALTIME_CHANNEL", "post_events")
+# Очередь событий одного WebSocket-клиента; переполнена - клиент отключается (медленный потребитель)
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", "100"))
+# Максимум подписок (постов + маршрутов) на одно соединение
+REALTIME_MAX_SUBSCRIPTIONS = int(os.getenv("REALTIME_MAX_SUBSCRIPTIONS", "50"))
+# Пауза перед переподключением LISTEN-соединения после обрыва
+REALTIME_RECONNECT_SECONDS = float(os.getenv("REALTIME_RECONNECT_SECONDS", "2"))
+
+# --- Индекс маршрутов в памяти (route_index.py, GET /match) ---
+ROUTE_INDEX_ENABLED = os.getenv("ROUTE_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+# Полная пересборка из БД: страховка от изменений без событий (архивация, удаление пользователя)
+ROUTE_INDEX_REFRESH_SECONDS = float(os.getenv("ROUTE_INDEX_REFRESH_SECONDS", "300"))
+# Окно вокруг запрошенного времени по умолчанию и максимум, часов
+MATCH_DEFAULT_WINDOW_HOURS = float(os.getenv("MATCH_DEFAULT_WINDOW_HOURS", "24"))
+MATCH_MAX_WINDOW_HOURS = float(os.getenv("MATCH_MAX_WINDOW_HOURS", "720"))
+# Максимум поездок в ответе GET /match
+MATCH_MAX_RESULTS = int(os.getenv("MATCH_MAX_RESULTS", "50"))
+
+# --- Поездки с пересадками (planner.py, GET /plan) ---
+# Время в пути по маршрутам, часов: "london-berlin=12,paris-kyiv=26" поверх значений
+# по умолчанию в planner.py (в посте есть только время отправления)
+PLAN_LEG_HOURS = os.getenv("PLAN_LEG_HOURS", "")
+# Минимальное время на пересадку по умолчанию, минут
+PLAN_MIN_CONNECTION_MINUTES = int(os.getenv("PLAN_MIN_CONNECTION_MINUTES", "60"))
+# Отрезки отправляются не позже depart_after + within_hours: по умолчанию и максимум, часов
+PLAN_DEFAULT_WITHIN_HOURS = float(os.getenv("PLAN_DEFAULT_WITHIN_HOURS", "72"))
+PLAN_MAX_WITHIN_HOURS = float(os.getenv("PLAN_MAX_WITHIN_HOURS", "336"))
+# Максимум отрезков в маршруте
+PLAN_MAX_LEGS = int(os.getenv("PLAN_MAX_LEGS", "3"))
+
+# --- Выгрузка постов в NDJSON (export.py, GET /posts/export) ---
+# Строк за одну выборку серверного курсора (yield_per)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Размер куска тела ответа до сжатия, байт
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", "65536"))
+# Уровень gzip (1 - быстрее, 9 - плотнее)
+EXPORT_GZIP_LEVEL = int(os.getenv("EXPORT_GZIP_LEVEL", "6"))
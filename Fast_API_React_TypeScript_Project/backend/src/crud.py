@@ -1,85 +1,168 @@
 # crud.py
+import asyncio
+import logging
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import update as sqlalchemy_update
 from sqlalchemy import delete as sqlalchemy_delete
+from sqlalchemy import insert, case, or_
 
 from sqlalchemy.exc import IntegrityError # Для обработки ошибок уникальности
 
 import models
 import schemas
+import bulk
+import loaders
+import pagination
 from auth import auth
+from auth.principal_cache import principal_cache
+from realtime import realtime
+
+logger = logging.getLogger("app.crud")
 # --- CRUD Operations for Items ---
 async def create_user(db: AsyncSession, user: schemas.UserCreate) -> models.User:
     """Создает нового пользователя в базе данных."""
     # Хешируем пароль перед сохранением
-    hashed_pass = auth.hash_password(user.password)
+    hashed_pass = await auth.hash_password_async(user.password)
 
     # Создаем объект модели SQLAlchemy
     db_user = models.User(
         user=user.user,
         email=user.email,
-        password=hashed_pass # Сохраняем хеш!
+        password=hashed_pass, # Сохраняем хеш!
+        # У нового пользователя связей нет: инициализируем их пустыми,
+        # чтобы схема User сериализовалась без дополнительных запросов.
+        items=[],
+        owned_posts=[],
+        posts_members=[],
     )
     db.add(db_user)
     
     try:
-        # Сохраняем изменения в БД
+        # Сохраняем изменения в БД. ID приходит из INSERT ... RETURNING,
+        # expire_on_commit=False - поэтому refresh не нужен.
         await db.commit()
-        # Обновляем объект, чтобы получить ID из БД
-        await db.refresh(db_user)
-        print(f"Пользователь {db_user.user} успешно создан с ID {db_user.id}.")
+        logger.info("Пользователь %s успешно создан с ID %s.", db_user.user, db_user.id)
         return db_user
     except IntegrityError as e:
         # Если нарушение уникальности (user или email уже существуют)
         await db.rollback() # Откатываем транзакцию
-        print(f"Ошибка IntegrityError при создании пользователя: {e}")
+        logger.warning("Ошибка IntegrityError при создании пользователя: %s", e)
         # Можно выбросить HTTPException или вернуть None/специальный объект ошибки
         raise ValueError(f"Пользователь с таким именем '{user.user}' или email '{user.email}' уже существует.")
     except Exception as e:
         # Другие возможные ошибки
         await db.rollback()
-        print(f"Непредвиденная ошибка при создании пользователя: {e}")
+        logger.exception("Непредвиденная ошибка при создании пользователя")
         raise e # Перевыбрасываем ошибку для обработки выше
 
+async def create_users_bulk(db: AsyncSession, users: list[tuple[int, schemas.UserCreate]]) -> tuple[list[dict], list[dict]]:
+    """
+    Массовое создание пользователей: пачки по BULK_INSERT_CHUNK_SIZE, один
+    INSERT ... ON CONFLICT DO NOTHING RETURNING на пачку. Пароли пачки хешируются
+    параллельно в пуле auth.hashing.
+    users - [(индекс строки в запросе, схема)]. Возвращает (созданные, ошибки строк).
+    """
+    created: list[dict] = []
+    errors: list[dict] = []
+    for chunk in bulk.chunked(users):
+        hashes = await asyncio.gather(*(auth.hash_password_async(user.password) for _, user in chunk))
+        values = [
+            {"user": user.user, "email": user.email, "role": user.role, "password": hashed}
+            for (_, user), hashed in zip(chunk, hashes)
+        ]
+        stmt = bulk.insert_ignore_conflicts(db, models.User).values(values).returning(
+            models.User.id, models.User.user, models.User.email, models.User.role
+        )
+        try:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Непредвиденная ошибка при массовом создании пользователей")
+            errors.extend(bulk.row_error(index, "Database error while inserting this chunk.") for index, _ in chunk)
+            continue
+        inserted_by_name = {row.user: row for row in rows}
+        for index, user in chunk:
+            row = inserted_by_name.pop(user.user, None)
+            if row is None or row.email != user.email:
+                errors.append(bulk.row_error(
+                    index, f"Пользователь с таким именем '{user.user}' или email '{user.email}' уже существует."
+                ))
+            else:
+                created.append(dict(row._mapping))
+    return created, errors
+
 async def get_user_by_email(db: AsyncSession, email: str) -> models.User | None:
-     stmt = select(models.User).where(models.User.email == email)
+     stmt = select(models.User).where(models.User.email == email).options(*loaders.AUTH_PRINCIPAL)
      result = await db.execute(stmt)
      return result.scalar_one_or_none()
 
-async def get_user_by_username(db: AsyncSession, username: str) -> models.User | None:
-     stmt = select(models.User).where(models.User.user == username)
+async def get_user_by_username(db: AsyncSession, username: str, options=loaders.AUTH_PRINCIPAL) -> models.User | None:
+     stmt = select(models.User).where(models.User.user == username).options(*options)
      result = await db.execute(stmt)
      return result.scalar_one_or_none()
      
-async def get_user_by_id(db: AsyncSession, user_id: int) -> models.User | None:
-    """Fetches a single item by its ID."""
-    stmt = select(models.User).filter(models.User.id == user_id)
+async def get_user_by_id(db: AsyncSession, user_id: int, options=loaders.AUTH_PRINCIPAL) -> models.User | None:
+    """Fetches a single item by its ID. `options` - loader profile from loaders.py."""
+    stmt = select(models.User).filter(models.User.id == user_id).options(*options)
     result = await db.execute(stmt)
     return result.scalar_one_or_none() # .first() returns one or None
 
-async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100)-> models.User | None:
-    """Fetches multiple items with pagination."""
-    result = await db.execute(select(models.User).offset(skip).limit(limit))
-    return result.scalars().all()
+async def get_users(db: AsyncSession, cursor: Optional[str] = None, limit: int = pagination.DEFAULT_PAGE_SIZE) -> tuple[list[models.User], Optional[str]]:
+    """Fetches a page of users ordered by id (keyset pagination). Returns (users, next cursor)."""
+    stmt = select(models.User).options(*loaders.USER_DETAIL)
+    if cursor is not None:
+        (after_id,) = pagination.decode_cursor(cursor, (int,))
+        stmt = stmt.where(models.User.id > after_id)
+    result = await db.execute(stmt.order_by(models.User.id).limit(limit + 1))
+    return pagination.split_page(result.scalars().all(), limit, lambda user: (user.id,))
 
 
 async def update_user(db: AsyncSession, user_id: int, user_update: schemas.UserBase):
     """Updates an existing item."""
-    db_item = await get_user_by_id(db, user_id)
+    db_item = await get_user_by_id(db, user_id, options=loaders.USER_DETAIL)
     if not db_item:
         return None # Item not found
 
     # Get the update data, excluding unset fields to avoid overwriting with None
     update_data = user_update.dict(exclude_unset=True)
+    # Cached principals of this user (role, email, name) become stale
+    principal_cache.invalidate(db_item.user)
+
+    renamed_to = update_data.get("user") if update_data.get("user") != db_item.user else None
 
     # Update the SQLAlchemy model instance
     for key, value in update_data.items():
         setattr(db_item, key, value)
 
     db.add(db_item) # Add the updated object to the session
+    if renamed_to is not None:
+        # The new name goes to users first: until the contract migration (5d2f3c8e0b41)
+        # the old string FKs to users.user are still there, ON UPDATE CASCADE (4c1e2b7d9a30)
+        # rewrites the copies with it, and the UPDATEs below find nothing left to change.
+        await db.flush()
+        # Posts and memberships reference users.id; only the display copies of the name change.
+        # updated_at (onupdate) moves on every post showing the name - owned or joined -
+        # so their ETags change as well.
+        joined = select(models.PostMember.post_id).where(models.PostMember.user_id == user_id)
+        await db.execute(
+            sqlalchemy_update(models.Post)
+            .where(or_(models.Post.owner_id == user_id, models.Post.post_id.in_(joined)))
+            .values(post_owner_user=case(
+                (models.Post.owner_id == user_id, renamed_to), else_=models.Post.post_owner_user,
+            ))
+            .execution_options(synchronize_session=False)
+        )
+        await db.execute(
+            sqlalchemy_update(models.PostMember).where(models.PostMember.user_id == user_id)
+            .values(member_user=renamed_to).execution_options(synchronize_session=False)
+        )
     await db.commit()
-    await db.refresh(db_item)
+    principal_cache.invalidate(db_item.user)
+    # No refresh: users has no server-side defaults and the relationships
+    # loaded above are still valid (expire_on_commit=False).
     return db_item
 
     # Alternative using SQLAlchemy update statement (potentially more efficient for many fields)
@@ -103,13 +186,44 @@ async def get_item_by_id(db: AsyncSession, user_id: int) -> models.Item | None:
     return result.scalars().all() # .first() returns one or None
 
 
+# Колонки поста, которые нужны realtime.post_event
+_POST_EVENT_COLUMNS = (
+    models.Post.post_id, models.Post.trip_from, models.Post.trip_to, models.Post.departure_datetime,
+    models.Post.count_of_places, models.Post.already_engaged, models.Post.status,
+)
+
+
 async def delete_user(db: AsyncSession, user_id: int):
     """Deletes an item from the database."""
-    db_user = await get_user_by_id(db, user_id)
+    # The response serializes the deleted user with its relationships,
+    # and the delete cascade needs them anyway.
+    db_user = await get_user_by_id(db, user_id, options=loaders.USER_DETAIL)
     if not db_user:
         return None # Item not found
+    # Записи posts_members пользователя удаляет каскад delete-orphan; занятые ими
+    # места в чужих постах освобождаются в той же транзакции
+    freed = (await db.execute(
+        sqlalchemy_update(models.Post)
+        .where(
+            models.Post.post_id.in_(select(models.PostMember.post_id).where(models.PostMember.user_id == user_id)),
+            models.Post.owner_id != user_id,
+        )
+        .values(already_engaged=models.Post.already_engaged - 1)
+        .returning(*_POST_EVENT_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )).all()
+    # Собственные посты удаляет каскад delete-orphan - без события индекс маршрутов,
+    # /plan и подписчики WebSocket видели бы их до следующей пересборки
+    owned = (await db.execute(
+        select(*_POST_EVENT_COLUMNS).where(models.Post.owner_id == user_id)
+    )).all()
+    await realtime.publish_many(db, [
+        *(realtime.post_event(realtime.POST_MEMBERS_CHANGED, post) for post in freed),
+        *(realtime.post_event(realtime.POST_DELETED, post) for post in owned),
+    ])
     await db.delete(db_user)
     await db.commit()
+    principal_cache.invalidate(db_user.user)
     return db_user # Return the deleted item data (optional)
 
     # Alternative using SQLAlchemy delete statement
@@ -124,6 +238,26 @@ async def delete_user(db: AsyncSession, user_id: int):
 
     # Shoping cart
 
+async def create_shoping_card_items_bulk(id: int, db: AsyncSession, items: list[tuple[int, schemas.ItemBase]]) -> tuple[list[dict], list[dict]]:
+    """Массовое создание товаров пользователя: один INSERT ... RETURNING на пачку."""
+    created: list[dict] = []
+    errors: list[dict] = []
+    for chunk in bulk.chunked(items):
+        stmt = insert(models.Item).values([
+            {"name": item.name, "description": item.description, "price": item.price, "owner_id": id}
+            for _, item in chunk
+        ]).returning(models.Item.name, models.Item.description, models.Item.price, models.Item.owner_id)
+        try:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Непредвиденная ошибка при массовом создании товаров")
+            errors.extend(bulk.row_error(index, "Database error while inserting this chunk.") for index, _ in chunk)
+            continue
+        created.extend(dict(row._mapping) for row in rows)
+    return created, errors
+
 async def create_shoping_card_item(id: int, db: AsyncSession, item: schemas.ItemBase) -> models.Item:
     """Создает нового пользователя в базе данных."""
     # Создаем объект модели SQLAlchemy
@@ -136,18 +270,16 @@ async def create_shoping_card_item(id: int, db: AsyncSession, item: schemas.Item
     db.add(db_item)
     
     try:
-        # Сохраняем изменения в БД
+        # Сохраняем изменения в БД. ID приходит из INSERT ... RETURNING.
         await db.commit()
-        # Обновляем объект, чтобы получить ID из БД
-        await db.refresh(db_item)
-        print(f"Товар '{db_item.name}' успешно создан для пользователя ID {db_item.owner_id} с ID товара {db_item.id}.")
+        logger.info("Товар '%s' успешно создан для пользователя ID %s с ID товара %s.", db_item.name, db_item.owner_id, db_item.id)
         return db_item
     except IntegrityError as e:
         await db.rollback()
-        print(f"Ошибка IntegrityError при создании товара: {e}")
+        logger.warning("Ошибка IntegrityError при создании товара: %s", e)
         # Возможно, такое имя товара уже есть? Зависит от вашей логики.
         raise ValueError(f"Ошибка при создании товара: {e}")
     except Exception as e:
         await db.rollback()
-        print(f"Непредвиденная ошибка при создании товара: {e}")
+        logger.exception("Непредвиденная ошибка при создании товара")
         raise e
\ No newline at end of file
@@ -1,8 +1,14 @@
 # database.py
 import os
+import asyncio
+import logging
 from dotenv import load_dotenv
+from sqlalchemy import Insert, Update, Delete, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+import metrics
+from logging_config import instrument_engine
 
 load_dotenv() # Load environment variables from .env file
 
@@ -11,21 +17,94 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set")
 
+# Необязательная реплика только для чтения. Если не задана - все идет в основную БД.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+
 # Create an asynchronous engine
 # pool_recycle: Reconnect after this many seconds of inactivity. -1 = disable.
 # pool_pre_ping: Test connections for liveness before using them.
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True, # Log SQL queries (good for debugging)
+    echo=False, # SQL логируется через instrument_engine (SQL_LOG_MODE), а не echo
     pool_recycle=3600,
-    pool_pre_ping=True
+    pool_pre_ping=True,
+    poolclass=metrics.TimedAsyncAdaptedQueuePool, # ожидание выдачи соединения - в /metrics
 )
+instrument_engine(engine)
+metrics.instrument_engine(engine, "primary")
+
+replica_engine = None
+if DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        DATABASE_REPLICA_URL,
+        echo=False,
+        pool_recycle=3600,
+        pool_pre_ping=True,
+        poolclass=metrics.TimedAsyncAdaptedQueuePool,
+    )
+    instrument_engine(replica_engine)
+    metrics.instrument_engine(replica_engine, "replica")
+
+logger = logging.getLogger("app.database")
+
+
+class ReplicaState:
+    """Доступность реплики (обновляет replica.py по результатам проверки лага) и счетчики маршрутизации."""
+
+    def __init__(self):
+        self.healthy = replica_engine is not None
+        self.lag_seconds: float | None = None
+        self.replica_reads = 0
+        self.primary_reads = 0
+
+    def stats(self) -> dict:
+        return {
+            "configured": replica_engine is not None,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+        }
+
+
+replica_state = ReplicaState()
+
+
+class RoutingSession(Session):
+    """
+    Выбор движка на каждый запрос к БД.
+    В реплику идут только чтения сессий, помеченных info["read_only"] (depencies.get_read_db).
+    Как только сессия что-то пишет (flush, INSERT/UPDATE/DELETE, несохраненные изменения),
+    она закрепляется за основной БД до конца - чтения после записи видят свою запись.
+    Реплика с большим лагом или недоступная (replica_state.healthy=False) не используется.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            self._flushing
+            or isinstance(clause, (Insert, Update, Delete))
+            or self.new or self.dirty or self.deleted
+        ):
+            self.info["pinned_primary"] = True
+        if (
+            replica_engine is not None
+            and self.info.get("read_only")
+            and not self.info.get("pinned_primary")
+            and replica_state.healthy
+        ):
+            replica_state.replica_reads += 1
+            return replica_engine.sync_engine
+        if clause is not None and not isinstance(clause, (Insert, Update, Delete)):
+            replica_state.primary_reads += 1
+        return engine.sync_engine
+
 
 # Create a session factory bound to the engine
 # expire_on_commit=False prevents detached instance errors in async contexts
 AsyncSessionFactory = sessionmaker(
     bind=engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession,
     expire_on_commit=False,
     autoflush=False, # Recommended for async operations
 )
@@ -40,4 +119,22 @@ async def create_tables():
     async with engine.begin() as conn:
         # await conn.run_sync(Base.metadata.drop_all) # Use with caution! Drops all tables.
         await conn.run_sync(Base.metadata.create_all)
-    print("Database tables created (if they didn't exist).")
\ No newline at end of file
+    logger.info("Database tables created (if they didn't exist).")
+
+
+async def warm_up_pool(target_engine, connections: int) -> None:
+    """Открывает connections соединений пула параллельно, чтобы первые запросы не ждали подключения."""
+    if connections <= 0:
+        return
+
+    async def _open_one(): # соединения держатся одновременно, иначе пул отдаст одно и то же
+        conn = await target_engine.connect()
+        await conn.execute(text("SELECT 1"))
+        return conn
+
+    opened = await asyncio.gather(*(_open_one() for _ in range(connections)), return_exceptions=True)
+    for conn in opened:
+        if isinstance(conn, BaseException):
+            logger.warning("Pool warm-up connection failed: %s", conn)
+        else:
+            await conn.close()
@@ -1,4 +1,5 @@
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Annotated
+from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # Импортируйте вашу фабрику сессий из файла database.py
@@ -18,4 +19,15 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.rollback() # Откат при ошибке
             raise
         finally:
-            await session.close() # async with закроет автоматически
\ No newline at end of file
+            await session.close() # async with закроет автоматически
+
+async def get_read_db(
+    session: Annotated[AsyncSession, Depends(get_db)],
+) -> AsyncSession:
+    """
+    Та же сессия запроса, что и get_db (FastAPI кэширует зависимость), но чтения
+    маршрутизируются в реплику (database.RoutingSession). После первой записи
+    сессия закреплена за основной БД. Без DATABASE_REPLICA_URL - обычная сессия.
+    """
+    session.info["read_only"] = True
+    return session
@@ -20,6 +20,10 @@ class PostStatus(str, enum.Enum):
     ACTIVE = "active"       # Активный
     ARCHIVED = "archived"     # Архивный (после истечения даты отправления)
 
+class PlanOptimize(str, enum.Enum): # порядок вариантов в ответе GET /plan
+    ARRIVAL = "arrival"     # сначала раньше прибывающие
+    LEGS = "legs"           # сначала с меньшим числом пересадок
+
 class UserRole(str, enum.Enum): # Используем строковый Enum для удобства
     USER = "user"
     ADMIN = "admin"
@@ -0,0 +1,96 @@
+# export.py
+# Потоковая выгрузка постов с участниками в NDJSON (GET /posts/export) для отчетности.
+# Память воркера не зависит от размера таблицы:
+# - строки читаются серверным курсором пачками (posts.stream_posts_for_export);
+# - каждая строка сразу сериализуется в байты и уходит клиенту кусками по
+#   EXPORT_CHUNK_BYTES, по желанию сжатыми gzip (потоковый zlib, без буфера всего тела).
+# Сессия своя, а не из Depends(get_db): сессия зависимости закрывается до того,
+# как StreamingResponse начнет отдавать тело.
+import logging
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
+
+import config
+import schemas
+from database import AsyncSessionFactory
+from enums import PostStatus
+from posts import posts
+
+logger = logging.getLogger("app.export")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+_post_adapter = TypeAdapter(schemas.PostExport)
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
+
+
+async def encode_ndjson(rows: AsyncIterator[dict], compress: bool) -> AsyncIterator[bytes]:
+    """Строки -> куски NDJSON по ~EXPORT_CHUNK_BYTES (gzip-поток, если compress)."""
+    # wbits=31: формат gzip (заголовок и CRC), а не голый deflate
+    compressor = zlib.compressobj(config.EXPORT_GZIP_LEVEL, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+    async for row in rows:
+        buffer += _post_adapter.dump_json(_post_adapter.validate_python(row))
+        buffer += b"\n"
+        if len(buffer) >= config.EXPORT_CHUNK_BYTES:
+            chunk = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+            buffer.clear()
+            if chunk: # gzip может копить вход у себя и ничего не вернуть
+                yield chunk
+    tail = bytes(buffer)
+    if compressor:
+        tail = compressor.compress(tail) + compressor.flush()
+    if tail:
+        yield tail
+
+
+async def _export_body(
+    post_status: Optional[PostStatus],
+    departure_from: Optional[datetime],
+    departure_to: Optional[datetime],
+    compress: bool,
+) -> AsyncIterator[bytes]:
+    async with AsyncSessionFactory() as session:
+        session.info["read_only"] = True # выгрузка - только чтение, можно с реплики
+        rows = posts.stream_posts_for_export(
+            session,
+            post_status=post_status,
+            departure_from=departure_from,
+            departure_to=departure_to,
+            batch_size=config.EXPORT_BATCH_SIZE,
+        )
+        try:
+            async for chunk in encode_ndjson(rows, compress):
+                yield chunk
+        except Exception:
+            # Заголовки уже отправлены: статус не поменять, клиент увидит оборванный поток
+            logger.exception("Posts export failed")
+            raise
+
+
+def posts_export_response(
+    post_status: Optional[PostStatus],
+    departure_from: Optional[datetime],
+    departure_to: Optional[datetime],
+    compress: bool,
+) -> StreamingResponse:
+    headers = {
+        "Content-Disposition": 'attachment; filename="posts.ndjson"',
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-store",
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        _export_body(post_status, departure_from, departure_to, compress),
+        media_type=NDJSON_MEDIA_TYPE,
+        headers=headers,
+    )
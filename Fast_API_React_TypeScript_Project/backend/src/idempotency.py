@@ -0,0 +1,303 @@
+# idempotency.py
+# Заголовок Idempotency-Key для POST /posts и POST /{post_id}/members.
+# Мобильные клиенты повторяют запрос по таймауту: без ключа повтор создает второй пост
+# или снова гоняет проверки вступления. С ключом первый ответ (статус и тело)
+# сохраняется, повторы получают его без выполнения эндпоинта (заголовок Idempotent-Replayed).
+#
+# - Ключ - "<users.id>:<Idempotency-Key>", у каждого пользователя свои ключи. Повтор
+#   с тем же ключом, но другим методом/путем/телом - 422.
+# - Первый запрос занимает ключ строкой idempotency_keys без ответа (status_code NULL)
+#   с коротким сроком IDEMPOTENCY_LOCK_SECONDS, по завершении пишет ответ со сроком
+#   IDEMPOTENCY_TTL_SECONDS. Ошибки 5xx не сохраняются - ключ освобождается.
+# - Одновременный дубль ждет выполняющийся запрос: в том же воркере - его future,
+#   в другом - опросом таблицы, не дольше IDEMPOTENCY_WAIT_SECONDS (потом 409).
+# - Перед таблицей - LRU сохраненных ответов в памяти воркера.
+# Ответ сохраняется после commit эндпоинта: если воркер упадет между ними, повтор
+# после IDEMPOTENCY_LOCK_SECONDS выполнится заново.
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Annotated, Any, NamedTuple, Optional
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import DateTime, bindparam, delete, select, text, update
+
+import config
+import models
+from auth import auth
+from database import engine, AsyncSessionFactory
+
+logger = logging.getLogger("app.idempotency")
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+@dataclass(frozen=True)
+class IdempotencyScope:
+    key: str
+    fingerprint: bytes
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: bytes
+    status_code: int
+    body: bytes
+    expires_at: float # unix-время
+
+    def to_response(self, replayed: bool = False) -> Response:
+        headers = {REPLAYED_HEADER: "true"} if replayed else None
+        return Response(content=self.body, status_code=self.status_code, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """LRU ключ -> StoredResponse. Один event loop, без await внутри - блокировки не нужны."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, StoredResponse] = OrderedDict()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        stored = self._entries.get(key)
+        if stored is None:
+            return None
+        if stored.expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return stored
+
+    def put(self, key: str, stored: StoredResponse) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key] = stored
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_TIMESTAMPTZ = DateTime(timezone=True)
+
+# Занимает свободный ключ или ключ, срок которого истек (ответ устарел / выполнявший
+# воркер пропал). RETURNING пуст - ключ занят действующей записью.
+_CLAIM_SQL = text("""
+INSERT INTO idempotency_keys (key, fingerprint, expires_at) VALUES (:key, :fingerprint, :lock_until)
+ON CONFLICT (key) DO UPDATE
+    SET fingerprint = excluded.fingerprint, status_code = NULL, body = NULL, expires_at = excluded.expires_at
+    WHERE idempotency_keys.expires_at < :now
+RETURNING key
+""").bindparams(bindparam("lock_until", type_=_TIMESTAMPTZ), bindparam("now", type_=_TIMESTAMPTZ))
+
+
+class IdempotencyStore:
+    def __init__(self, cache_size: int):
+        self.cache = ResponseCache(cache_size)
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.replayed = 0
+        self.waited = 0
+        self.conflicts = 0
+
+    def _checked(self, scope: IdempotencyScope, fingerprint: bytes) -> None:
+        if fingerprint != scope.fingerprint:
+            self.conflicts += 1
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request.",
+            )
+
+    def _finish(self, key: str, stored: Optional[StoredResponse]) -> None:
+        waiter = self._in_flight.pop(key, None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(stored)
+
+    async def acquire(self, scope: IdempotencyScope) -> Optional[StoredResponse]:
+        """
+        Сохраненный ответ для повтора или None - ключ занят этим запросом, эндпоинт
+        нужно выполнить и вызвать complete/release.
+        """
+        deadline = time.monotonic() + config.IDEMPOTENCY_WAIT_SECONDS
+        waited = False
+        while True:
+            stored = self.cache.get(scope.key)
+            if stored is not None:
+                self._checked(scope, stored.fingerprint)
+                self.replayed += 1
+                self.waited += waited
+                return stored
+            waiter = self._in_flight.get(scope.key)
+            if waiter is not None:
+                # Этот же воркер уже выполняет запрос с таким ключом
+                waited = True
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter), max(0.0, deadline - time.monotonic()))
+                except asyncio.TimeoutError:
+                    raise self._still_running()
+                continue
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._in_flight[scope.key] = waiter # дубли этого воркера ждут его, а не идут в БД
+            try:
+                claimed, record = await self._claim(scope)
+            except BaseException:
+                self._finish(scope.key, None)
+                raise
+            if claimed:
+                self.executed += 1
+                self.waited += waited
+                return None
+            self._finish(scope.key, None)
+            if record is not None:
+                self._checked(scope, record.fingerprint)
+                if record.status_code is not None:
+                    stored = StoredResponse(record.fingerprint, record.status_code, record.body, record.expires_at.timestamp())
+                    self.cache.put(scope.key, stored)
+                    self.replayed += 1
+                    self.waited += waited
+                    return stored
+            # Запрос выполняет другой воркер (или запись только что удалена) - опрос таблицы
+            waited = True
+            if time.monotonic() >= deadline:
+                raise self._still_running()
+            await asyncio.sleep(config.IDEMPOTENCY_POLL_SECONDS)
+
+    def _still_running(self) -> HTTPException:
+        self.conflicts += 1
+        return HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A request with this Idempotency-Key is still in progress.",
+            headers={"Retry-After": "1"},
+        )
+
+    async def _claim(self, scope: IdempotencyScope):
+        now = datetime.now(timezone.utc)
+        async with engine.begin() as conn:
+            claimed = (await conn.execute(_CLAIM_SQL, {
+                "key": scope.key, "fingerprint": scope.fingerprint,
+                "lock_until": now + timedelta(seconds=config.IDEMPOTENCY_LOCK_SECONDS), "now": now,
+            })).first() is not None
+            if claimed:
+                return True, None
+            record = (await conn.execute(
+                select(
+                    models.IdempotencyRecord.fingerprint, models.IdempotencyRecord.status_code,
+                    models.IdempotencyRecord.body, models.IdempotencyRecord.expires_at,
+                ).where(models.IdempotencyRecord.key == scope.key)
+            )).first()
+            return False, record
+
+    async def complete(self, scope: IdempotencyScope, status_code: int, body: bytes) -> StoredResponse:
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=config.IDEMPOTENCY_TTL_SECONDS)
+        stored = StoredResponse(scope.fingerprint, status_code, body, expires_at.timestamp())
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    update(models.IdempotencyRecord)
+                    .where(models.IdempotencyRecord.key == scope.key)
+                    .values(status_code=status_code, body=body, expires_at=expires_at)
+                )
+        except Exception as e:
+            # Работа уже сделана - отвечаем; повтор из другого воркера выполнится заново
+            logger.warning("Could not store idempotent response for %s: %s", scope.key, e)
+        self.cache.put(scope.key, stored)
+        self._finish(scope.key, stored)
+        return stored
+
+    async def release(self, scope: IdempotencyScope) -> None:
+        """Запрос не завершился сохраняемым ответом (5xx, отмена) - ключ снова свободен."""
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    delete(models.IdempotencyRecord).where(
+                        models.IdempotencyRecord.key == scope.key,
+                        models.IdempotencyRecord.status_code.is_(None),
+                    )
+                )
+        except Exception as e:
+            logger.warning("Could not release idempotency key %s: %s", scope.key, e)
+        finally:
+            self._finish(scope.key, None)
+
+    def stats(self) -> dict:
+        return {
+            "cache_size": len(self.cache),
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "waited": self.waited,
+            "conflicts": self.conflicts,
+        }
+
+
+store = IdempotencyStore(cache_size=config.IDEMPOTENCY_CACHE_SIZE)
+
+
+async def cleanup_expired() -> int:
+    """Удаляет из idempotency_keys истекшие ответы и брошенные блокировки. Запускается планировщиком."""
+    async with AsyncSessionFactory() as session:
+        result = await session.execute(
+            delete(models.IdempotencyRecord).where(models.IdempotencyRecord.expires_at < datetime.now(timezone.utc))
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info("Idempotency cleanup: deleted %s expired keys.", result.rowcount)
+    return result.rowcount
+
+
+async def idempotency_scope(
+    request: Request,
+    current_user: Annotated[models.User, Depends(auth.get_current_user)],
+    idempotency_key: Annotated[Optional[str], Header(alias="Idempotency-Key", min_length=1, max_length=255)] = None,
+) -> Optional[IdempotencyScope]:
+    """Зависимость маршрута: ключ пользователя и отпечаток запроса, без заголовка - None."""
+    if idempotency_key is None:
+        return None
+    body = await request.body() # уже прочитано FastAPI для параметров - берется из кэша Request
+    fingerprint = hashlib.sha256(b"%s %s\n%s" % (request.method.encode(), request.url.path.encode(), body)).digest()
+    return IdempotencyScope(key=f"{current_user.id}:{idempotency_key}", fingerprint=fingerprint)
+
+
+def idempotent(response_type: Any, status_code: int = 200):
+    """
+    Декоратор эндпоинта с параметром Depends(idempotency_scope). Без заголовка
+    Idempotency-Key эндпоинт работает как обычно. С ним результат сериализуется
+    TypeAdapter(response_type) (как serializers.fast_json_response), сохраняется вместе
+    с HTTPException 4xx, а повторы получают сохраненный ответ.
+    """
+    adapter = TypeAdapter(response_type)
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            scope = next((value for value in kwargs.values() if isinstance(value, IdempotencyScope)), None)
+            if scope is None:
+                return await endpoint(*args, **kwargs)
+            stored = await store.acquire(scope)
+            if stored is not None:
+                return stored.to_response(replayed=True)
+            try:
+                result = await endpoint(*args, **kwargs)
+                code, body = status_code, adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+            except HTTPException as e:
+                if e.status_code >= 500:
+                    await store.release(scope)
+                    raise
+                code, body = e.status_code, json.dumps({"detail": e.detail}).encode()
+            except BaseException:
+                await store.release(scope)
+                raise
+            stored = await store.complete(scope, code, body)
+            return stored.to_response()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,29 @@
+# loaders.py
+# Профили загрузки связей для запросов.
+# В models.py все relationship объявлены с lazy="raise", поэтому каждый запрос
+# сам решает, какие связи ему нужны. Профиль = ровно то, что сериализует
+# схема ответа соответствующего эндпоинта (см. schemas.py).
+from sqlalchemy.orm import selectinload, load_only
+
+import models
+
+# Аутентифицированный пользователь (auth.get_current_user, /login, /users/me).
+# Схема UserPublic не содержит связей - грузим только строку users.
+AUTH_PRINCIPAL = ()
+
+# Список постов (GET /posts, GET /{post_id}/posts): schemas.Post / PostGetAll
+# выводят только user_id и member_user участников.
+POST_LIST = (
+    selectinload(models.Post.posts_members_posts).load_only(models.PostMember.user_id, models.PostMember.member_user),
+)
+
+# Один пост (GET /{post_id}/post, ответ POST /{post_id}/members): та же схема.
+POST_DETAIL = POST_LIST
+
+# Пользователь со связями (GET /users/, GET/PUT/DELETE /users/{user_id}):
+# schemas.User выводит items, posts_members (post_id) и owned_posts (post_id).
+USER_DETAIL = (
+    selectinload(models.User.items),
+    selectinload(models.User.posts_members).load_only(models.PostMember.post_id),
+    selectinload(models.User.owned_posts).load_only(models.Post.post_id),
+)
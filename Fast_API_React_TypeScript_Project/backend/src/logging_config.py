@@ -0,0 +1,98 @@
+# logging_config.py
+# Неблокирующее логирование.
+# Все логгеры пишут в QueueHandler (только queue.put в вызывающем потоке),
+# а в stdout пишет QueueListener в отдельном фоновом потоке - запись в консоль
+# никогда не блокирует event loop.
+# Уровни задаются из окружения: LOG_LEVEL и LOG_LEVELS (см. config.py).
+# SQL логируется не через echo=True, а через события движка: только медленные
+# запросы и/или выборка (SQL_LOG_MODE).
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Optional
+
+from sqlalchemy import event
+
+import config
+
+LOG_FORMAT = "%(asctime)s %(levelname)-5.5s [%(name)s] %(message)s"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+sql_logger = logging.getLogger("app.sql")
+
+
+def parse_levels(spec: str) -> dict[str, str]:
+    """'app.sql=DEBUG,app.posts=WARNING' -> {'app.sql': 'DEBUG', 'app.posts': 'WARNING'}"""
+    levels = {}
+    for item in spec.split(","):
+        name, sep, level = item.partition("=")
+        if sep and name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """Настраивает корневой логгер на очередь и запускает фоновый поток записи. Идемпотентна."""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(config.LOG_LEVEL)
+    # Шумные логгеры по умолчанию тише; LOG_LEVELS может переопределить
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+    logging.getLogger("sqlalchemy.pool").setLevel(logging.WARNING)
+    for name, level in parse_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Останавливает фоновый поток, дописав все, что осталось в очереди."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def instrument_engine(engine) -> None:
+    """
+    Логирование SQL через события движка вместо echo=True.
+    "slow"   - только запросы дольше SQL_SLOW_QUERY_MS (WARNING);
+    "sample" - медленные + случайная доля SQL_LOG_SAMPLE_RATE остальных (INFO);
+    "all"    - все запросы (INFO); "off" - ничего.
+    Время старта хранится в контексте выполнения, а не в conn.info: упавший запрос
+    не доходит до after_cursor_execute и не должен сбивать замеры следующих.
+    """
+    mode = config.SQL_LOG_MODE
+    if mode == "off":
+        return
+    sync_engine = getattr(engine, "sync_engine", engine) # события вешаются на sync-движок AsyncEngine
+    slow_seconds = config.SQL_SLOW_QUERY_MS / 1000
+    sample_rate = 1.0 if mode == "all" else (config.SQL_LOG_SAMPLE_RATE if mode == "sample" else 0.0)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._sql_log_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._sql_log_started_at
+        if elapsed >= slow_seconds:
+            sql_logger.warning("slow query %.1f ms: %s", elapsed * 1000, statement)
+        elif sample_rate and random.random() < sample_rate:
+            sql_logger.info("query %.1f ms: %s", elapsed * 1000, statement)
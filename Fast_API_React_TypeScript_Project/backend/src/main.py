@@ -1,33 +1,100 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, status, Response, Request, Cookie
+import time
+_IMPORT_STARTED = time.perf_counter() # время импорта приложения - в лог при старте
+import asyncio
+from fastapi import FastAPI, Depends, HTTPException, status, Response, Request, Cookie, Query, WebSocket
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Annotated, Optional # Use standard List typing
+from datetime import datetime, timedelta, timezone
+from typing import List, Annotated, Optional, Any # Use standard List typing
 from pydantic import ValidationError 
 import models
 import crud
 import schemas
-from enums import CountriesCapitals, UserRole, PostStatus
+import loaders
+import pagination
+import bulk
+import conditional
+import export
+import rate_limit
+import exceptrions
+import route_index
+import planner
+import idempotency
+from serializers import fast_json_response
+from enums import CountriesCapitals, UserRole, PostStatus, PlanOptimize
 from auth import auth
-from database import engine, create_tables # Import necessary components
-from depencies import get_db
+from auth.principal_cache import principal_cache
+from auth.token_cache import token_cache
+from auth.hashing import password_hasher
+from auth import denylist
+from database import engine, replica_engine, replica_state, create_tables, warm_up_pool # Import necessary components
+import config
+import schema_check
+import replica
+import metrics
+from depencies import get_db, get_read_db
 from posts import posts
+from realtime import realtime
+from scheduler import scheduler
 from contextlib import asynccontextmanager
+import logging
+import logging_config
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+logging_config.setup_logging() # Логи через очередь, запись в stdout - в фоновом потоке
+logger = logging.getLogger("app.main")
 
 # --- Event Handlers ---
 @asynccontextmanager
 async def app_lifespan(app: FastAPI):
     # --- Логика из вашего @app.on_event("startup") ---
-    print("Lifespan: Starting up...")
-    await create_tables() # Убедитесь, что create_tables - это async функция
-    print("Lifespan: Database tables checked/created.")
+    logging_config.setup_logging() # Повторный вызов - no-op; нужен, если listener остановлен прошлым shutdown
+    logger.info("Lifespan: Starting up...")
+    started = time.perf_counter()
+    if config.DB_AUTO_CREATE:
+        # Только для локальной разработки; схему ведет Alembic, ревизию не проверяем
+        await create_tables()
+        logger.info("Lifespan: Database tables checked/created.")
+    # Проверка ревизии схемы (один SELECT) идет параллельно с прогревом пулов.
+    # При SCHEMA_CHECK_MODE=strict и несовпадении ревизии воркер не стартует.
+    # return_exceptions: при ошибке проверки дожидаемся прогрева и закрываем пулы, а не бросаем соединения
+    schema_ok, *_ = await asyncio.gather(
+        schema_check.verify_schema(engine, "off" if config.DB_AUTO_CREATE else config.SCHEMA_CHECK_MODE),
+        warm_up_pool(engine, config.DB_POOL_WARMUP_CONNECTIONS),
+        warm_up_pool(replica_engine, config.DB_POOL_WARMUP_CONNECTIONS) if replica_engine is not None else asyncio.sleep(0),
+        return_exceptions=True,
+    )
+    if isinstance(schema_ok, BaseException):
+        await engine.dispose()
+        if replica_engine is not None:
+            await replica_engine.dispose()
+        raise schema_ok
+    await asyncio.gather(
+        denylist.start_sync(), # Отозванные токены: загрузка и синхронизация между воркерами
+        replica.start_monitor(), # Проверка лага реплики для чтения (если DATABASE_REPLICA_URL задан)
+        route_index.start(), # Индекс маршрутов для GET /match; до start_listener - подписывается на события
+        realtime.start_listener(), # LISTEN событий постов для WebSocket-подписчиков и индекса маршрутов (Postgres)
+    )
+    scheduler.start() # Фоновые задачи: архивация просроченных постов и др.
+    app.state.startup_timings = {
+        "import_ms": IMPORT_SECONDS * 1000,
+        "startup_ms": (time.perf_counter() - started) * 1000,
+    }
+    logger.info("Lifespan: started (import %.0f ms, startup %.0f ms)",
+                app.state.startup_timings["import_ms"], app.state.startup_timings["startup_ms"])
     # Здесь могут быть и другие действия при старте,
     # например, инициализация других ресурсов, которые вы хотите передать через app.state
 
     yield # Момент, когда приложение готово и работает
 
     # --- Логика из вашего @app.on_event("shutdown") ---
-    print("Lifespan: Shutting down...")
+    logger.info("Lifespan: Shutting down...")
+    scheduler.shutdown()
+    await denylist.stop_sync()
+    await replica.stop_monitor()
+    await realtime.stop_listener()
+    await route_index.stop()
     # Убедитесь, что engine доступен здесь (например, импортирован или из app.state)
     # и что engine.dispose() является асинхронной операцией или может быть вызван так.
     # Если engine.dispose() синхронный, возможно, понадобится run_in_threadpool
@@ -35,7 +102,11 @@ async def app_lifespan(app: FastAPI):
     if hasattr(engine, 'dispose') and callable(engine.dispose):
          # Для SQLAlchemy 2.0+ с асинхронным движком
         await engine.dispose()
-        print("Lifespan: Database engine disposed.")
+        logger.info("Lifespan: Database engine disposed.")
+    if replica_engine is not None:
+        await replica_engine.dispose()
+    password_hasher.shutdown()
+    logging_config.shutdown_logging() # Дописываем очередь логов до выхода
     # Здесь могут быть другие действия по очистке
 # --- FastAPI App Initialization ---
 app = FastAPI(
@@ -44,6 +115,7 @@ app = FastAPI(
     description="Education API",
     version="0.3.5",
 )
+app.add_middleware(metrics.MetricsMiddleware) # Латентность и SQL по маршрутам -> GET /metrics
 
 
 # @app.on_event("startup")
@@ -72,9 +144,16 @@ app = FastAPI(
 @app.post("/logout", summary="Logout and set auth cookie", response_model=schemas.Message, tags=["Login system"])
 async def logout(
     response: Response, # Нужен для установки cookie
-    
+    token: Annotated[Optional[str], Depends(auth.get_token_from_cookie)],
+    db: Annotated[AsyncSession, Depends(get_db)],
 ):
-
+    # Отзываем токен: до истечения exp он больше не будет принят ни одним воркером
+    payload = auth.decode_token_payload(token) if token else None
+    if payload and payload.get("jti"):
+        expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+        await denylist.add_jti_to_db_denylist(db, payload["jti"], expires_at)
+    if token:
+        token_cache.discard(token) # отозванный токен и так отсекает denylist - просто освобождаем место
 
     # Устанавливаем cookie
     response.set_cookie(
@@ -90,7 +169,8 @@ async def logout(
     return {"message": "Logout successful"}
 
 
-@app.post("/login", summary="Login and set auth cookie", response_model=schemas.Message, tags=["Login system"])
+@app.post("/login", summary="Login and set auth cookie", response_model=schemas.Message, tags=["Login system"],
+          dependencies=[Depends(rate_limit.limit_login)]) # 429 до поиска пользователя и bcrypt
 async def login(
     response: Response, # Нужен для установки cookie
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], # Стандартная форма логин/пароль
@@ -101,7 +181,7 @@ async def login(
     и устанавливает его в httpOnly cookie.
     """
     user = await crud.get_user_by_username(db, username=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.password):
+    if not user or not await auth.verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -123,7 +203,8 @@ async def login(
     # print(f"Cookie set for user: {user.username}") # Отладка
     return {"message": "Login successful"}
 
-@app.post("/register", summary="Register a new user", response_model=schemas.UserPublic, status_code=status.HTTP_201_CREATED, tags=["Login system"])
+@app.post("/register", summary="Register a new user", response_model=schemas.UserPublic, status_code=status.HTTP_201_CREATED, tags=["Login system"],
+          dependencies=[Depends(rate_limit.limit_register)])
 async def register(
     user_in: schemas.UserCreate,
     db: Annotated[AsyncSession, Depends(get_db)]
@@ -152,61 +233,279 @@ async def admin_dashboard(
     """Пример эндпоинта, доступного только админам."""
     return {"message": f"Welcome to the Admin Dashboard, {admin_user.user}!"}
 
+@app.get("/admin/principal-cache", response_model=schemas.PrincipalCacheStats, tags=["Admin"])
+async def principal_cache_stats(
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)]
+):
+    """Счетчики кэша аутентифицированных пользователей (hit/miss и др.)."""
+    return principal_cache.stats()
+
+@app.get("/admin/password-hashing", response_model=schemas.PasswordHasherStats, tags=["Admin"])
+async def password_hashing_stats(
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)]
+):
+    """Состояние пула bcrypt: очередь, задачи в работе, среднее ожидание."""
+    return password_hasher.stats()
+
+@app.get("/admin/replica", response_model=schemas.ReplicaStats, tags=["Admin"])
+async def replica_stats(
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)]
+):
+    """Реплика для чтения: доступна ли, последний измеренный лаг, сколько чтений куда ушло."""
+    return replica_state.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Admin"])
+async def metrics_endpoint(
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)]
+):
+    """Метрики воркера в текстовом формате Prometheus: латентность маршрутов, SQL, пул соединений, кэши."""
+    return metrics.render({
+        "principal_cache": principal_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "rate_limit": rate_limit.limiter.stats(),
+        "idempotency": idempotency.store.stats(),
+        "route_index": route_index.route_index.stats(),
+        "password_hashing": password_hasher.stats(),
+        "denylist": denylist.stats(),
+        "replica": replica_state.stats(),
+        "realtime": realtime.hub.stats(),
+    })
+
 # Маршрут для постов
-@app.post("/posts", response_model=schemas.Post, tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@app.post("/posts", response_model=schemas.Post, tags=["Posts"], status_code=status.HTTP_201_CREATED,
+          dependencies=[Depends(rate_limit.limit_writes)])
+@idempotency.idempotent(schemas.Post, status_code=status.HTTP_201_CREATED)
 async def create_new_post(
     post_data: schemas.PostCreate, # Данные поста из тела запроса, валидируются Pydantic
     current_user: Annotated[schemas.UserBase, Depends(auth.get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)], # Получаем текущего пользователя
+    idem: Annotated[Optional[idempotency.IdempotencyScope], Depends(idempotency.idempotency_scope)],
 ):
     try:
          
         """ Создает новый пост.
         Пользователь должен быть аутентифицирован.
         """
-        created_post_db = await posts.create_post(db=db, post=post_data, owner_user=current_user.user)
+        created_post_db = await posts.create_post(db=db, post=post_data, owner=current_user)
         return created_post_db
     except Exception as e:
         # Логирование ошибки
-        print(f"Error in endpoint /users/post: {e}")
+        logger.exception("Error in endpoint /users/post")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An internal error occurred: {str(e)}")
+@app.post("/posts/bulk", response_model=schemas.BulkPostsResult, tags=["Posts"],
+          dependencies=[Depends(rate_limit.limit_writes)])
+async def create_posts_bulk(
+    rows: List[Any],
+    current_user: Annotated[models.User, Depends(auth.get_current_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    """
+    Массовое создание постов текущего пользователя.
+    Каждая строка валидируется как PostCreate отдельно; ошибки возвращаются
+    построчно в errors и не отменяют остальные строки.
+    """
+    bulk.check_batch_size(rows)
+    valid_rows, errors = bulk.validate_rows(rows, schemas.PostCreate)
+    created, insert_errors = await posts.create_posts_bulk(db=db, new_posts=valid_rows, owner=current_user)
+    return {"created": created, "errors": sorted(errors + insert_errors, key=lambda e: e["index"])}
+
 @app.get("/{post_id}/post", response_model=schemas.PostGetAll, tags=["Posts"], status_code=status.HTTP_201_CREATED)
 async def get_post_by_post_id(
     post_id: int, 
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    request: Request,
+    response: Response,
 ):
-    get_post = await posts.get_post_by_id(post_id=post_id, db=db)
+    """
+    Один пост с участниками. Поддерживает If-None-Match / If-Modified-Since:
+    ETag считается по (post_id, updated_at) одним легким запросом, и при
+    совпадении возвращается 304 без загрузки и сериализации поста.
+    """
+    updated_at = await posts.get_post_updated_at(db=db, post_id=post_id)
+    etag = conditional.weak_etag("post", post_id, updated_at)
+    if conditional.is_fresh(request, etag, updated_at):
+        return conditional.not_modified(etag, updated_at)
+    get_post = await posts.get_post_by_id(post_id=post_id, db=db, options=loaders.POST_DETAIL)
+    response.headers.update(conditional.validator_headers(etag, updated_at))
     return get_post
 @app.get("/{post_id}/posts", response_model=List[schemas.Post], tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@fast_json_response(List[schemas.Post], status_code=status.HTTP_201_CREATED)
 async def get_posts_from_owner_endpoint(
     post_user: Annotated[models.User, Depends(auth.get_current_user)],
     db: Annotated[AsyncSession, Depends(get_db)],
-    skip: int = 0, limit: int = 100,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)] = pagination.DEFAULT_PAGE_SIZE,
     
 ):
-    get_posts = await posts.get_posts_from_owner(db=db, post_user=post_user.user, skip=skip, limit=limit)
+    """Посты текущего пользователя. Следующая страница - по курсору из заголовка X-Next-Cursor."""
+    get_posts, next_cursor = await posts.get_posts_from_owner(db=db, owner_id=post_user.id, cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return get_posts
 
 @app.get("/posts", response_model=List[schemas.PostGetAll], tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@fast_json_response(List[schemas.PostGetAll], status_code=status.HTTP_201_CREATED)
 async def get_posts_endpoint(
-    db: Annotated[AsyncSession, Depends(get_db)],
-    skip: int = 0, limit: int = 100,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)] = pagination.DEFAULT_PAGE_SIZE,
 ):
-    get_posts = await posts.get_posts(db=db, skip=skip, limit=limit)
+    """
+    Все посты по дате отправления. Следующая страница - по курсору из заголовка X-Next-Cursor.
+    ETag страницы - от (post_id, updated_at) ее строк: при совпадении с If-None-Match
+    возвращается 304 без сериализации.
+    """
+    get_posts, next_cursor = await posts.get_posts(db=db, cursor=cursor, limit=limit)
+    etag = conditional.weak_etag("posts", cursor, limit, next_cursor, [(p.post_id, p.updated_at) for p in get_posts])
+    last_modified = conditional.latest(p.updated_at for p in get_posts)
+    if conditional.is_fresh(request, etag, last_modified):
+        not_modified = conditional.not_modified(etag, last_modified)
+        if next_cursor:
+            not_modified.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+        return not_modified
+    response.headers.update(conditional.validator_headers(etag, last_modified))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return get_posts
+
+@app.get("/posts/search", response_model=List[schemas.PostGetAll], tags=["Posts"])
+@fast_json_response(List[schemas.PostGetAll])
+async def search_posts_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    response: Response,
+    trip_from: Optional[CountriesCapitals] = None,
+    trip_to: Optional[CountriesCapitals] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    has_free_seats: bool = True,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)] = pagination.DEFAULT_PAGE_SIZE,
+):
+    """
+    Поиск активных поездок: маршрут, окно отправления, наличие свободных мест.
+    Результат отсортирован по времени отправления; следующая страница - по X-Next-Cursor.
+    """
+    found_posts, next_cursor = await posts.search_posts(
+        db=db,
+        trip_from=trip_from,
+        trip_to=trip_to,
+        departure_from=departure_from,
+        departure_to=departure_to,
+        only_free_seats=has_free_seats,
+        cursor=cursor,
+        limit=limit,
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return found_posts
+
+@app.get("/match", response_model=List[schemas.RideMatch], tags=["Posts"])
+@fast_json_response(List[schemas.RideMatch])
+async def match_rides_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    trip_from: CountriesCapitals,
+    trip_to: CountriesCapitals,
+    at: Optional[datetime] = None,
+    seats: Annotated[int, Query(ge=1)] = 1,
+    limit: Annotated[int, Query(ge=1, le=config.MATCH_MAX_RESULTS)] = 10,
+    window_hours: Annotated[float, Query(gt=0, le=config.MATCH_MAX_WINDOW_HOURS)] = config.MATCH_DEFAULT_WINDOW_HOURS,
+):
+    """
+    Лучшие поездки из trip_from в trip_to с не менее чем seats свободными местами:
+    ближайшие по времени отправления к at (по умолчанию - сейчас) в пределах window_hours.
+    Отвечает индекс маршрутов в памяти воркера (route_index.py) без запроса к БД;
+    пока индекс не собран - SQL-запрос с тем же результатом.
+    """
+    if trip_from == trip_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exceptrions.wrong_trip_place))
+    now = datetime.now(timezone.utc)
+    if at is None:
+        at = now
+    elif at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    window = timedelta(hours=window_hours)
+    if route_index.route_index.ready:
+        return route_index.route_index.match(
+            trip_from.value, trip_to.value, at.timestamp(), seats, limit, window.total_seconds(), now.timestamp(),
+        )
+    return await posts.match_posts(db, trip_from, trip_to, at, seats, limit, window)
+
+@app.get("/plan", response_model=List[schemas.Itinerary], tags=["Posts"])
+@fast_json_response(List[schemas.Itinerary])
+async def plan_trip_endpoint(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    trip_from: CountriesCapitals,
+    trip_to: CountriesCapitals,
+    depart_after: Optional[datetime] = None,
+    seats: Annotated[int, Query(ge=1)] = 1,
+    min_connection_minutes: Annotated[int, Query(ge=0, le=24 * 60)] = config.PLAN_MIN_CONNECTION_MINUTES,
+    max_legs: Annotated[int, Query(ge=1, le=config.PLAN_MAX_LEGS)] = config.PLAN_MAX_LEGS,
+    within_hours: Annotated[float, Query(gt=0, le=config.PLAN_MAX_WITHIN_HOURS)] = config.PLAN_DEFAULT_WITHIN_HOURS,
+    optimize: PlanOptimize = PlanOptimize.ARRIVAL,
+):
+    """
+    Поездка из trip_from в trip_to, в том числе с пересадками, по активным постам с не
+    менее чем seats свободными местами. Между отрезками - не меньше min_connection_minutes,
+    все отрезки отправляются в пределах within_hours от depart_after (по умолчанию - сейчас).
+    Ответ - Парето-набор вариантов: optimize=arrival - сначала самый ранний по прибытию,
+    legs - сначала с наименьшим числом отрезков. Считается по индексу маршрутов в памяти
+    (route_index.py, planner.py); пока он не собран - по постам окна, прочитанным из БД.
+    """
+    if trip_from == trip_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exceptrions.wrong_trip_place))
+    now = datetime.now(timezone.utc)
+    if depart_after is None:
+        depart_after = now
+    elif depart_after.tzinfo is None:
+        depart_after = depart_after.replace(tzinfo=timezone.utc)
+    depart_after = max(depart_after, now) # уже ушедшие посты не подходят
+    depart_before = depart_after + timedelta(hours=within_hours)
+    index = route_index.route_index
+    if not index.ready:
+        index = await route_index.load_window(db, depart_after, depart_before)
+    itineraries = planner.plan(
+        index, trip_from.value, trip_to.value, depart_after.timestamp(), depart_before.timestamp(),
+        seats, min_connection_minutes * 60, max_legs,
+    )
+    if optimize == PlanOptimize.ARRIVAL:
+        itineraries.reverse() # plan() отдает от меньшего числа отрезков к более раннему прибытию
+    return [planner.as_response(itinerary) for itinerary in itineraries]
+
+@app.get("/posts/export", response_class=StreamingResponse, tags=["Posts"])
+async def export_posts_endpoint(
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)],
+    request: Request,
+    post_status: Annotated[Optional[PostStatus], Query(alias="status")] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+):
+    """
+    Все посты с участниками для отчетности: NDJSON, одна строка (schemas.PostExport) на пост,
+    в порядке post_id. Фильтры - статус и окно отправления. С Accept-Encoding: gzip
+    ответ сжимается на лету. Таблица любого размера отдается одним потоком без пагинации.
+    """
+    posts.check_departure_range(departure_from, departure_to)
+    return export.posts_export_response(
+        post_status, departure_from, departure_to, compress=export.accepts_gzip(request),
+    )
          
-@app.post("/{post_id}/members", response_model=schemas.Post, tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@app.post("/{post_id}/members", response_model=schemas.Post, tags=["Posts"], status_code=status.HTTP_201_CREATED,
+          dependencies=[Depends(rate_limit.limit_writes)])
+@idempotency.idempotent(schemas.Post, status_code=status.HTTP_201_CREATED)
 async def add_post_member_endpoint(
     member_data: Annotated[models.User, Depends(auth.get_current_user)],
     post_id: int,
     db: Annotated[AsyncSession, Depends(get_db)],
-
+    idem: Annotated[Optional[idempotency.IdempotencyScope], Depends(idempotency.idempotency_scope)],
 ):
     try:
         updated_post = await posts.add_member_to_post( # posts - это ваш модуль с функцией
             db=db,
             post_id=post_id,
-            username_to_add=member_data.user
+            user=member_data
         )
         return updated_post
     except HTTPException as e: # Перехватываем HTTPException, выброшенные из posts
@@ -215,7 +514,8 @@ async def add_post_member_endpoint(
         # Логируем e
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="An unexpected error occurred.")
 # Get enum dictionary 
-@app.delete("/{post_id}/post", response_model=schemas.Message, tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@app.delete("/{post_id}/post", response_model=schemas.Message, tags=["Posts"], status_code=status.HTTP_201_CREATED,
+            dependencies=[Depends(rate_limit.limit_writes)])
 async def delete_post_by_id(
     member_data: Annotated[models.User, Depends(auth.get_current_user)],
     post_id: int,
@@ -224,7 +524,8 @@ async def delete_post_by_id(
     await posts.delete_post_by_id(db=db, post_id=post_id, user=member_data)
     return {"message": "Post deleted succesful"}
 
-@app.put("/{post_id}/post", response_model=schemas.PostCreate, tags=["Posts"], status_code=status.HTTP_201_CREATED)
+@app.put("/{post_id}/post", response_model=schemas.PostCreate, tags=["Posts"], status_code=status.HTTP_201_CREATED,
+         dependencies=[Depends(rate_limit.limit_writes)])
 async def update_post(
     member_data: Annotated[models.User, Depends(auth.get_current_user)],
     post_id: int,
@@ -237,40 +538,59 @@ async def update_post(
     return updated_post
 
 
+@app.websocket("/ws/posts")
+async def posts_updates_ws(
+    websocket: WebSocket,
+    post_id: Annotated[List[int], Query()] = [],
+    trip_from: Optional[CountriesCapitals] = None,
+    trip_to: Optional[CountriesCapitals] = None,
+):
+    """
+    Изменения постов вместо опроса GET /posts: /ws/posts?post_id=1&post_id=2 и/или
+    ?trip_from=london&trip_to=berlin. Сообщение - JSON-событие (post.created,
+    post.members, post.updated, post.deleted) с текущим числом мест; новые посты
+    приходят подписчикам их маршрута. Медленный клиент отключается с кодом 1013
+    и должен перечитать состояние через GET.
+    """
+    keys = {realtime.post_key(pid) for pid in post_id}
+    if trip_from is not None and trip_to is not None:
+        keys.add(realtime.route_key(trip_from.value, trip_to.value))
+    await realtime.serve(websocket, keys)
+
+# Справочники не меняются во время работы процесса: сериализуем их один раз
+# при старте в байты с готовым ETag (conditional.PrecomputedJSON).
+def _select_options(enum_cls) -> conditional.PrecomputedJSON:
+    return conditional.PrecomputedJSON([
+        schemas.SelectOption(value=member.value, label=member.name.title())
+        for member in enum_cls
+    ])
+
+CAPITALS_SELECT_OPTIONS = _select_options(CountriesCapitals)
+PERMISSIONS_SELECT_OPTIONS = _select_options(UserRole)
+POST_STATUS_SELECT_OPTIONS = _select_options(PostStatus)
+
 @app.get("/capitals-for-select", response_model=List[schemas.SelectOption], tags=["Enums"])
-async def get_capitals_for_select_options():
+async def get_capitals_for_select_options(request: Request):
     """
     Возвращает список столиц в формате, подходящем для HTML <select> или аналогичных UI компонентов.
     Каждый элемент списка - это объект с полями 'value' и 'label'.
     """
-    options_list = [
-        schemas.SelectOption(value=member.value, label=member.name.title())
-        for member in CountriesCapitals
-    ]
-    return options_list
+    return CAPITALS_SELECT_OPTIONS.response(request)
 @app.get("/permissions-for-select", response_model=List[schemas.SelectOption], tags=["Enums"])
-async def get_permissions_for_select_options():
+async def get_permissions_for_select_options(request: Request):
     """
-    Возвращает список столиц в формате, подходящем для HTML <select> или аналогичных UI компонентов.
+    Возвращает список ролей в формате, подходящем для HTML <select> или аналогичных UI компонентов.
     Каждый элемент списка - это объект с полями 'value' и 'label'.
     """
-    options_list = [
-        schemas.SelectOption(value=member.value, label=member.name.title())
-        for member in UserRole
-    ]
-    return options_list
+    return PERMISSIONS_SELECT_OPTIONS.response(request)
 
 @app.get("/post_status_for_select", response_model=List[schemas.SelectOption], tags=["Enums"])
-async def get_post_status_for_select_options():
+async def get_post_status_for_select_options(request: Request):
     """
-    Возвращает список столиц в формате, подходящем для HTML <select> или аналогичных UI компонентов.
+    Возвращает список статусов поста в формате, подходящем для HTML <select> или аналогичных UI компонентов.
     Каждый элемент списка - это объект с полями 'value' и 'label'.
     """
-    options_list = [
-        schemas.SelectOption(value=member.value, label=member.name.title())
-        for member in PostStatus
-    ]
-    return options_list
+    return POST_STATUS_SELECT_OPTIONS.response(request)
 
 @app.get("/protected", summary="Example protected endpoint", response_model=schemas.Message, tags=["Login system"])
 async def protected_route(
@@ -285,7 +605,8 @@ async def read_root():
     return {"message": "Welcome to the Cookie Auth API!"}
 
 
-@app.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED, tags=["Users"]) # Указываем модель ответа
+@app.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED, tags=["Users"], # Указываем модель ответа
+          dependencies=[Depends(rate_limit.limit_register)]) # хеширует пароль, как /register
 async def create_api_user(user_data: schemas.UserCreate, # Получаем данные из тела запроса
                            db: Annotated[AsyncSession, Depends(get_db)], # Получаем сессию БД
 ):
@@ -306,15 +627,39 @@ async def create_api_user(user_data: schemas.UserCreate, # Получаем да
          raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Ловим другие возможные ошибки из CRUD
-        print(f"Непредвиденная ошибка в API при создании пользователя: {e}")
+        logger.exception("Непредвиденная ошибка в API при создании пользователя")
         raise HTTPException(status_code=500, detail="Internal server error during user creation")
 
+@app.post("/users/bulk", response_model=schemas.BulkUsersResult, tags=["Users"])
+async def create_api_users_bulk(
+    rows: List[Any],
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    """
+    Массовое создание пользователей (импорт, наполнение). Только для админов.
+    Строки с ошибкой валидации или занятым именем/email возвращаются в errors.
+    """
+    bulk.check_batch_size(rows)
+    valid_rows, errors = bulk.validate_rows(rows, schemas.UserCreate)
+    created, insert_errors = await crud.create_users_bulk(db=db, users=valid_rows)
+    return {"created": created, "errors": sorted(errors + insert_errors, key=lambda e: e["index"])}
+
 @app.get("/users/", response_model=List[schemas.User], tags=["Users"])
-async def read_all_user(db: Annotated[AsyncSession, Depends(get_db)], skip: int = 0, limit: int = 100,):
+@fast_json_response(List[schemas.User])
+async def read_all_user(
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Annotated[int, Query(ge=1, le=pagination.MAX_PAGE_SIZE)] = pagination.DEFAULT_PAGE_SIZE,
+):
     """
-    Retrieve all users with pagination.
+    Retrieve all users with keyset pagination.
+    The cursor for the next page is returned in the X-Next-Cursor header.
     """
-    users = await crud.get_users(db, skip=skip, limit=limit)
+    users, next_cursor = await crud.get_users(db, cursor=cursor, limit=limit)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return users
 
 @app.post("/users/{user_id}", response_model=schemas.Item, status_code=status.HTTP_201_CREATED, tags=["Users"]) # Указываем модель ответа
@@ -333,48 +678,57 @@ async def create_api_user_shopping_cart(user_id: int, user_data: schemas.ItemBas
          raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         # Ловим другие возможные ошибки из CRUD
-        print(f"Непредвиденная ошибка в API при создании пользователя: {e}")
+        logger.exception("Непредвиденная ошибка в API при создании пользователя")
         raise HTTPException(status_code=500, detail="Internal server error during user creation")
 
+@app.post("/users/{user_id}/items/bulk", response_model=schemas.BulkItemsResult, tags=["Users"])
+async def create_api_user_shopping_cart_bulk(
+    user_id: int,
+    rows: List[Any],
+    admin_user: Annotated[models.User, Depends(auth.require_admin_user)],
+    db: Annotated[AsyncSession, Depends(get_db)],
+):
+    """Массовое добавление товаров пользователю. Только для админов."""
+    bulk.check_batch_size(rows)
+    db_user = await crud.get_user_by_id(db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    valid_rows, errors = bulk.validate_rows(rows, schemas.ItemBase)
+    created, insert_errors = await crud.create_shoping_card_items_bulk(id=user_id, db=db, items=valid_rows)
+    return {"created": created, "errors": sorted(errors + insert_errors, key=lambda e: e["index"])}
+
 @app.get("/users/{user_id}", response_model=schemas.User, tags=["Users"])
 async def read_single_user(user_id: Annotated[models.User, Depends(auth.get_current_user)], db: Annotated[AsyncSession, Depends(get_db)],):
     """
     Retrieve a single user by its ID.
     """
  
-    db_user = await crud.get_user_by_id(db, user_id=user_id.id)
-    print(f"DEBUG: CRUD function returned: {db_user!r}") # <--- ДОБАВЬТЕ ЭТО
-    # print(f"DEBUG: Type of returned object: {type(created_item)}") # <--- И ЭТО
+    db_user = await crud.get_user_by_id(db, user_id=user_id.id, options=loaders.USER_DETAIL)
     if db_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     
-    print(f"DEBUG: Returning User object: {db_user!r}")
+    logger.debug("read_single_user: %r", db_user)
     try:
         # --- ПОПЫТКА ЯВНОГО ПРЕОБРАЗОВАНИЯ В PYDANTIC СХЕМУ ---
-        print("DEBUG: Attempting manual Pydantic validation/serialization...")
-
         # Используем model_validate (для Pydantic V2) для создания
         # экземпляра схемы User из объекта SQLAlchemy User.
         # Это должно использовать from_attributes=True рекурсивно.
         pydantic_user = schemas.User.model_validate(db_user)
 
-        print(f"DEBUG: Pydantic model created successfully: {pydantic_user!r}")
         # Если мы дошли сюда, Pydantic смог обработать объект.
         # Возвращаем созданный Pydantic объект, а не ORM объект.
         return pydantic_user
         return db_user
     except ValidationError as e:
         # Если Pydantic сам вызвал ошибку валидации
-        print(f"ERROR: Pydantic ValidationError during manual validation: {e.json()}") # Выводим детали ошибки Pydantic
+        logger.error("Pydantic ValidationError during manual validation: %s", e.json()) # Выводим детали ошибки Pydantic
         raise HTTPException(
             status_code=500,
             detail=f"Pydantic validation failed during response generation: {e}"
         )
     except Exception as e:
         # Другие ошибки при попытке преобразования
-        print(f"ERROR: Unexpected error during manual validation/serialization: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Unexpected error during manual validation/serialization")
         raise HTTPException(
             status_code=500,
             detail=f"Unexpected error during response generation: {e}"
@@ -401,4 +755,7 @@ async def delete_existing_user(user_id: int, db: Annotated[AsyncSession, Depends
     deleted_user = await crud.delete_user(db=db, user_id=user_id)
     if deleted_user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return deleted_user # Or return {"message": "Item deleted successfully"} with status_code=200
\ No newline at end of file
+    return deleted_user # Or return {"message": "Item deleted successfully"} with status_code=200
+
+# Конец импорта модуля: все маршруты зарегистрированы
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
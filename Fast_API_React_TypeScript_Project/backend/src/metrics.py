@@ -0,0 +1,230 @@
+# metrics.py
+# Метрики приложения в текстовом формате Prometheus (GET /metrics, только админ).
+# - MetricsMiddleware: латентность (гистограмма) и статусы по шаблону маршрута;
+# - instrument_engine: число SQL-запросов, ошибки и время в БД на запрос (события движка);
+# - TimedAsyncAdaptedQueuePool: ожидание выдачи соединения из пула.
+# Все счетчики - обычные словари в памяти воркера: event loop однопоточный,
+# блокировки не нужны. Каждый uvicorn-воркер отдает свои значения.
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Маршрут, не совпавший ни с одним эндпоинтом (404) - одна метка, чтобы не плодить ряды
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # последняя корзина - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> Iterable[str]:
+        sep = "," if labels else ""
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            yield f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels}{sep}le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class RequestDbStats:
+    """SQL одного HTTP-запроса: заполняется событиями движка через contextvar."""
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+_current_request: ContextVar[Optional[RequestDbStats]] = ContextVar("metrics_request", default=None)
+
+# (method, route) -> Histogram
+request_latency: dict[tuple[str, str], Histogram] = {}
+# (method, route, status) -> count
+request_status: dict[tuple[str, str, int], int] = {}
+# (method, route) -> [statements, db_seconds]
+request_db: dict[tuple[str, str], list] = {}
+# engine name -> [statements, db_seconds] (включая фоновые задачи вне HTTP-запросов)
+engine_totals: dict[str, list] = {}
+# engine name -> упавшие запросы (они же входят в engine_totals)
+engine_errors: dict[str, int] = {}
+# engine name -> sync engine (пул берется при выводе: dispose() пересоздает пул)
+_engines: dict[str, object] = {}
+# engine name -> Histogram ожидания соединения
+pool_wait: dict[str, Histogram] = {}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsMiddleware:
+    """Чистый ASGI middleware: без BaseHTTPMiddleware, чтобы не добавлять задач и копий тела."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        db_stats = RequestDbStats()
+        token = _current_request.set(db_stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            # Шаблон пути (/{post_id}/post), а не сам путь - ограниченное число рядов
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", UNMATCHED_ROUTE))
+            histogram = request_latency.get(key)
+            if histogram is None:
+                histogram = request_latency[key] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(elapsed)
+            status_key = key + (status_code,)
+            request_status[status_key] = request_status.get(status_key, 0) + 1
+            totals = request_db.setdefault(key, [0, 0.0])
+            totals[0] += db_stats.statements
+            totals[1] += db_stats.db_seconds
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий ожидание выдачи соединения (включая открытие нового соединения)."""
+
+    metrics_name = "primary"
+    # Логгер пула - как у пулов SQLAlchemy (sqlalchemy.pool.*), иначе уровень из
+    # logging_config.setup_logging на него не действует и "Pool disposed" идет в INFO
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.TimedAsyncAdaptedQueuePool"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            histogram = pool_wait.get(self.metrics_name)
+            if histogram is not None:
+                histogram.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Счетчики SQL для движка; пул регистрируется для метрик выдачи соединений."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    totals = engine_totals.setdefault(name, [0, 0.0])
+    _engines[name] = sync_engine
+    if isinstance(sync_engine.pool, TimedAsyncAdaptedQueuePool):
+        sync_engine.pool.metrics_name = name
+        pool_wait.setdefault(name, Histogram(POOL_WAIT_BUCKETS))
+
+    def _observe(context) -> None:
+        elapsed = time.perf_counter() - context._metrics_started_at
+        totals[0] += 1
+        totals[1] += elapsed
+        db_stats = _current_request.get()
+        if db_stats is not None:
+            db_stats.statements += 1
+            db_stats.db_seconds += elapsed
+
+    # Время старта - в контексте выполнения: упавший запрос не доходит до after_cursor_execute
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _observe(context)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        context = exception_context.execution_context
+        if context is None or not hasattr(context, "_metrics_started_at"):
+            return # ошибка до выполнения (подключение, компиляция) - не запрос
+        _observe(context)
+        engine_errors[name] = engine_errors.get(name, 0) + 1
+
+
+def _pool_gauges(name: str, pool) -> Iterable[str]:
+    labels = f'engine="{name}"'
+    for metric, method in (
+        ("db_pool_size", "size"),
+        ("db_pool_checked_out", "checkedout"),
+        ("db_pool_checked_in", "checkedin"),
+        ("db_pool_overflow", "overflow"),
+    ):
+        getter = getattr(pool, method, None)
+        if getter is not None:
+            yield f"{metric}{{{labels}}} {getter()}"
+
+
+def render(gauges: Optional[dict[str, dict]] = None) -> str:
+    """
+    Текст для /metrics. gauges - словари stats() подсистем, например
+    {"principal_cache": principal_cache.stats()}: числовые поля выводятся
+    как app_<подсистема>_<поле>, остальные пропускаются.
+    """
+    lines = [
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, route), histogram in request_latency.items():
+        lines.extend(histogram.render("http_request_duration_seconds", f'method="{method}",route="{_escape(route)}"'))
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route, status_code), n in request_status.items():
+        lines.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status_code}"}} {n}')
+    lines.append("# TYPE http_request_db_statements_total counter")
+    for (method, route), (statements, _) in request_db.items():
+        lines.append(f'http_request_db_statements_total{{method="{method}",route="{_escape(route)}"}} {statements}')
+    lines.append("# TYPE http_request_db_seconds_total counter")
+    for (method, route), (_, seconds) in request_db.items():
+        lines.append(f'http_request_db_seconds_total{{method="{method}",route="{_escape(route)}"}} {seconds}')
+    lines.append("# TYPE db_statements_total counter")
+    for name, (statements, _) in engine_totals.items():
+        lines.append(f'db_statements_total{{engine="{name}"}} {statements}')
+    lines.append("# TYPE db_seconds_total counter")
+    for name, (_, seconds) in engine_totals.items():
+        lines.append(f'db_seconds_total{{engine="{name}"}} {seconds}')
+    lines.append("# TYPE db_statement_errors_total counter")
+    for name, errors in engine_errors.items():
+        lines.append(f'db_statement_errors_total{{engine="{name}"}} {errors}')
+    lines.append("# TYPE db_pool_checkout_wait_seconds histogram")
+    for name, histogram in pool_wait.items():
+        lines.extend(histogram.render("db_pool_checkout_wait_seconds", f'engine="{name}"'))
+    for name, sync_engine in _engines.items():
+        lines.extend(_pool_gauges(name, sync_engine.pool))
+    for subsystem, values in (gauges or {}).items():
+        for field, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                lines.append(f"app_{subsystem}_{field} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,5 +1,5 @@
 # models.py
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Enum, DateTime, Index, LargeBinary, SmallInteger
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from database import Base# Import Base from our database setup
@@ -20,7 +20,7 @@ class Item(Base):
     # ОПРЕДЕЛЕНИЕ СВЯЗИ "МНОГИЕ-КО-ОДНОМУ"
     # 'User' - Имя класса на "одной" стороне.
     # back_populates='items' - Связывает это поле с полем 'items' в модели User.
-    owner = relationship("User", back_populates="items", lazy="selectin")
+    owner = relationship("User", back_populates="items", lazy="raise")
     def __repr__(self):
         return (f"<Item(id={self.id}, name='{self.name}', price={self.price}, "
                 f"owner_id={self.owner_id})>")
@@ -37,11 +37,12 @@ class User(Base):
     # 'Item' - Имя класса на "множественной" стороне.
     # back_populates='owner' - Связывает это поле с полем 'owner' в модели Item.
     #                       Обеспечивает двунаправленную связь.
-    # lazy='selectin' (опционально) - Стратегия загрузки связанных объектов.
-    #                         'selectin' обычно эффективнее для async.
-    items = relationship("Item", back_populates="owner",  cascade="all, delete-orphan", lazy="selectin")
-    owned_posts = relationship("Post", back_populates="owner_user",  cascade="all, delete-orphan", lazy="selectin")
-    posts_members = relationship("PostMember", back_populates="user_member_info",  cascade="all, delete-orphan", lazy="selectin")
+    # lazy='raise' - по умолчанию связи НЕ загружаются. Каждый запрос явно
+    #                указывает, что ему нужно, через профили из loaders.py.
+    #                Случайная ленивая загрузка сразу падает, а не тянет весь граф.
+    items = relationship("Item", back_populates="owner",  cascade="all, delete-orphan", lazy="raise")
+    owned_posts = relationship("Post", back_populates="owner_user",  cascade="all, delete-orphan", lazy="raise")
+    posts_members = relationship("PostMember", back_populates="user_member_info",  cascade="all, delete-orphan", lazy="raise")
     def __repr__(self):
         return f"<User(id={self.id}, user='{self.user}', email='{self.email}, role='{self.role}')>"
     
@@ -49,7 +50,11 @@ class Post(Base):
     __tablename__ = 'posts'
 
     post_id = Column(Integer, primary_key=True)
-    post_owner_user = Column(String, ForeignKey("users.user"), nullable=False)
+    # Владелец - по целочисленному users.id (миграции 4c1e2b7d9a30/5d2f3c8e0b41).
+    # post_owner_user - копия имени для ответов API без JOIN users; пишется вместе
+    # с owner_id, при переименовании обновляется в crud.update_user.
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    post_owner_user = Column(String, nullable=False)
     trip_from = Column(Enum(CountriesCapitals), nullable=False)
     trip_to = Column(Enum(CountriesCapitals), nullable=False)
     count_of_places = Column(Integer, default=1, nullable=False)
@@ -59,17 +64,68 @@ class Post(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     status = Column(Enum(PostStatus), default=PostStatus.ACTIVE, nullable=False, index=True)
-    owner_user = relationship("User", foreign_keys=[post_owner_user], back_populates="owned_posts", lazy="selectin")
+    owner_user = relationship("User", foreign_keys=[owner_id], back_populates="owned_posts", lazy="raise")
     # member_entries = relationship("PostMember", back_populates="post_info", cascade="all, delete-orphan", lazy="selectin")
-    posts_members_posts = relationship("PostMember", back_populates="user_member_info_posts", cascade="all, delete-orphan", lazy="selectin")
+    posts_members_posts = relationship("PostMember", back_populates="user_member_info_posts", cascade="all, delete-orphan", lazy="raise")
+
+    # created_at/updated_at генерирует сервер: забираем их через RETURNING
+    # вместе с INSERT/UPDATE, без отдельного refresh-запроса.
+    __mapper_args__ = {"eager_defaults": True}
+    # Индексы под keyset-пагинацию (см. pagination.py и миграцию 9e56e6f363e8)
+    # и поиск поездок (posts.search_posts, миграция a9c7714ee7c6)
+    __table_args__ = (
+        Index("ix_posts_departure_datetime_post_id", "departure_datetime", "post_id"),
+        Index("ix_posts_owner_id_departure_datetime_post_id", "owner_id", "departure_datetime", "post_id"),
+        Index(
+            "ix_posts_search",
+            "status", "trip_from", "trip_to", "departure_datetime", "post_id",
+            postgresql_include=["count_of_places", "already_engaged"],
+        ),
+    )
     def __repr__(self):
         return f"<Posts(id={self.post_id}, user={self.post_owner_user}, count of places={self.count_of_places}, already engaged={self.already_engaged})>"
     
+class DenylistedToken(Base):
+    """Отозванные JWT (logout). Читается в память воркеров, см. auth/denylist.py."""
+    __tablename__ = 'denylisted_tokens'
+
+    jti = Column(String, primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # exp токена - после него запись можно удалить
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)  # для инкрементальной синхронизации
+
+    def __repr__(self):
+        return f"<DenylistedToken(jti={self.jti}, expires_at={self.expires_at})>"
+
+class RateLimitState(Base):
+    """Общее состояние GCRA для RATE_LIMIT_BACKEND=postgres, см. rate_limit.py."""
+    __tablename__ = 'rate_limits'
+
+    key = Column(String, primary_key=True)  # "<политика>:<ip или пользователь>"
+    tat = Column(Float, nullable=False)  # theoretical arrival time, unix-время; в прошлом - ключ свободен
+
+    def __repr__(self):
+        return f"<RateLimitState(key={self.key}, tat={self.tat})>"
+
+class IdempotencyRecord(Base):
+    """Ответ на запрос с Idempotency-Key для повторов клиента, см. idempotency.py."""
+    __tablename__ = 'idempotency_keys'
+
+    key = Column(String, primary_key=True)  # "<users.id>:<Idempotency-Key>"
+    fingerprint = Column(LargeBinary, nullable=False)  # sha256 метода, пути и тела запроса
+    status_code = Column(SmallInteger, nullable=True)  # NULL - запрос еще выполняется
+    body = Column(LargeBinary, nullable=True)  # JSON ответа
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # незавершенный - срок блокировки
+
+    def __repr__(self):
+        return f"<IdempotencyRecord(key={self.key}, status_code={self.status_code}, expires_at={self.expires_at})>"
+
 class PostMember(Base):
     __tablename__ = 'posts_members'
-    member_user = Column(String, ForeignKey("users.user"), primary_key=True)
+    # Первичный ключ (post_id, user_id): участники поста - по префиксу ключа
     post_id = Column(Integer, ForeignKey("posts.post_id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True, index=True)
+    member_user = Column(String, nullable=False) # копия имени, как Post.post_owner_user
 
-    user_member_info = relationship("User", foreign_keys=[member_user],back_populates="posts_members", lazy="selectin")
-    user_member_info_posts = relationship("Post", back_populates="posts_members_posts", lazy="selectin")
+    user_member_info = relationship("User", foreign_keys=[user_id],back_populates="posts_members", lazy="raise")
+    user_member_info_posts = relationship("Post", back_populates="posts_members_posts", lazy="raise")
     # post_info = relationship("Post", back_populates="member_entries", lazy="selectin")
\ No newline at end of file
@@ -0,0 +1,58 @@
+# pagination.py
+# Keyset (cursor) пагинация.
+# Курсор - непрозрачная строка (base64 от JSON) с ключом сортировки последней
+# строки страницы. Следующая страница начинается с WHERE (ключ) > (курсор),
+# поэтому ее стоимость не зависит от "глубины", в отличие от OFFSET.
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Кодирует значения ключа сортировки в курсор."""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> tuple:
+    """
+    Декодирует курсор в кортеж значений заданных типов (int, datetime).
+    Вызывает HTTPException 400, если курсор поврежден.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise ValueError("cursor arity mismatch")
+        values = []
+        for value, value_type in zip(payload, types):
+            if value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(value_type(value))
+        return tuple(values)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        )
+
+
+def split_page(rows: Sequence[Any], limit: int, key) -> tuple[list, Optional[str]]:
+    """
+    Запрос выбирает limit + 1 строк: лишняя строка означает, что есть еще страница.
+    Возвращает (строки страницы, курсор следующей страницы или None).
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    return page, encode_cursor(key(page[-1]))
@@ -0,0 +1,126 @@
+# planner.py
+# Поездки с пересадками для GET /plan: London -> Berlin -> Kyiv, когда прямого поста нет.
+# Граф "развернут во времени": вершины - отправления активных постов со свободными
+# местами, это массивы индекса маршрутов (route_index.py), которые уже обновляются
+# событиями постов и пересобираются в фоне. Прибытие = отправление + время в пути по
+# маршруту (LEG_HOURS) - в посте его нет.
+#
+# Поиск - раунды в стиле RAPTOR: раунд k улучшает самое раннее прибытие в города,
+# достижимое за k отрезков, только из городов, улучшенных в раунде k-1. У всех постов
+# маршрута одно время в пути, поэтому лучший отрезок из города - первое подходящее
+# отправление (бинарный поиск). Каждый раунд, улучшивший прибытие в пункт назначения,
+# дает вариант: вместе они - Парето-набор "меньше отрезков / раньше прибытие".
+# Городов единицы, так что запрос - десятки бинарных поисков независимо от числа постов.
+from datetime import datetime, timezone
+
+import config
+from enums import CountriesCapitals
+from route_index import RouteIndex
+
+# Время в пути, часов (в обе стороны одинаково); переопределяется PLAN_LEG_HOURS
+LEG_HOURS: dict[frozenset, float] = {
+    frozenset(("london", "paris")): 6,
+    frozenset(("london", "berlin")): 12,
+    frozenset(("london", "kyiv")): 31,
+    frozenset(("paris", "berlin")): 11,
+    frozenset(("paris", "kyiv")): 28,
+    frozenset(("berlin", "kyiv")): 16,
+}
+
+
+def _parse_leg_hours(value: str) -> dict[frozenset, float]:
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, hours = item.partition("=")
+        trip_from, _, trip_to = route.strip().partition("-")
+        overrides[frozenset((CountriesCapitals(trip_from).value, CountriesCapitals(trip_to).value))] = float(hours)
+    return overrides
+
+
+LEG_HOURS.update(_parse_leg_hours(config.PLAN_LEG_HOURS))
+
+
+def leg_seconds(trip_from: str, trip_to: str) -> float:
+    return LEG_HOURS[frozenset((trip_from, trip_to))] * 3600
+
+
+def plan(
+    index: RouteIndex,
+    origin: str,
+    destination: str,
+    depart_after: float,
+    depart_before: float,
+    seats: int,
+    min_connection: float,
+    max_legs: int,
+) -> list[list[dict]]:
+    """
+    Варианты из origin в destination (время - unix-секунды): каждый следующий - с большим
+    числом отрезков и более ранним прибытием. Отрезок - пост с >= seats свободных мест,
+    отправляющийся не позже depart_before и не раньше прибытия предыдущего + min_connection
+    (первый - не раньше depart_after).
+    """
+    best = {origin: depart_after}               # самое раннее прибытие в город за все раунды
+    rounds = [{origin: (depart_after, None)}]   # раунд -> город -> (прибытие, (откуда, отрезок))
+    best_destination = float("inf")
+    itineraries = []
+    for k in range(1, max_legs + 1):
+        improved: dict[str, tuple] = {}
+        for city, (ready_at, _) in rounds[-1].items():
+            if city == destination:
+                continue
+            earliest = ready_at + (min_connection if k > 1 else 0)
+            for trip_to in index.destinations(city):
+                leg = next(index.departures(city, trip_to, earliest, depart_before, seats), None)
+                if leg is None:
+                    continue
+                arrival = leg[0] + leg_seconds(city, trip_to)
+                # Не лучше уже известного прибытия сюда или в пункт назначения - не нужен
+                if arrival < best.get(trip_to, float("inf")) and arrival < best_destination:
+                    best[trip_to] = arrival
+                    improved[trip_to] = (arrival, (city, leg))
+        if not improved:
+            break
+        rounds.append(improved)
+        if destination in improved:
+            best_destination = improved[destination][0]
+            itineraries.append(_itinerary(rounds, destination))
+    return itineraries
+
+
+def _itinerary(rounds: list[dict], destination: str) -> list[dict]:
+    legs = []
+    city = destination
+    for k in range(len(rounds) - 1, 0, -1):
+        arrival, (trip_from, (departure, post_id, places, engaged)) = rounds[k][city]
+        legs.append({
+            "post_id": post_id,
+            "trip_from": trip_from,
+            "trip_to": city,
+            "departure": departure,
+            "arrival": arrival,
+            "count_of_places": places,
+            "already_engaged": engaged,
+            "free_places": places - engaged,
+        })
+        city = trip_from
+    legs.reverse()
+    return legs
+
+
+def as_response(itinerary: list[dict]) -> dict:
+    """Вариант plan() в форме schemas.Itinerary."""
+    legs = [
+        {
+            **leg,
+            "departure_datetime": datetime.fromtimestamp(leg["departure"], timezone.utc),
+            "arrival_datetime": datetime.fromtimestamp(leg["arrival"], timezone.utc),
+        }
+        for leg in itinerary
+    ]
+    return {
+        "departure_datetime": legs[0]["departure_datetime"],
+        "arrival_datetime": legs[-1]["arrival_datetime"],
+        "transfers": len(legs) - 1,
+        "legs": legs,
+    }
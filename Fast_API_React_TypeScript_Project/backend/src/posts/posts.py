@@ -1,134 +1,357 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas
-from sqlalchemy import func as sql_func
+from sqlalchemy import func as sql_func, tuple_
 from fastapi import HTTPException, status
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import update, insert
 from sqlalchemy import delete 
 from fastapi import HTTPException, status
 import crud
+import bulk
+import exceptrions
+import loaders
+import pagination
 from auth import auth
-from sqlalchemy.exc import SQLAlchemyError, NoResultFound
-async def create_post(db: AsyncSession, post: schemas.PostCreate, owner_user: str):
+from realtime import realtime
+from sqlalchemy.exc import SQLAlchemyError, NoResultFound, IntegrityError
+from enums import CountriesCapitals, PostStatus
+
+logger = logging.getLogger("app.posts")
+
+async def create_post(db: AsyncSession, post: schemas.PostCreate, owner: models.User):
     db_post_data = post.model_dump()
     db_post = models.Post(
         **db_post_data, # Распаковываем данные из схемы
-        post_owner_user=owner_user, # Устанавливаем владельца
-        already_engaged=0 #Default value
+        owner_id=owner.id, # Устанавливаем владельца
+        post_owner_user=owner.user,
+        already_engaged=0, #Default value
+        posts_members_posts=[], # У нового поста участников нет - схеме ответа не нужен SELECT
     )
     db.add(db_post) # Добавляем объект в сессию
     try:    
+        if realtime.events_enabled():
+            await db.flush() # post_id для события нужен до commit
+            await realtime.publish(db, realtime.post_event(realtime.POST_CREATED, db_post))
         await db.commit()     # Сохраняем изменения в БД
-        await db.refresh(db_post) # Обновляем объект из БД (чтобы получить сгенерированный post_id и др.)
+        # post_id, created_at, updated_at приходят из INSERT ... RETURNING (eager_defaults),
+        # поэтому refresh не нужен.
         return db_post
     except Exception as e:
         # Другие возможные ошибки
         await db.rollback()
-        print(f"Непредвиденная ошибка при создании поста: {e}")
+        logger.exception("Непредвиденная ошибка при создании поста")
         raise e # Перевыбрасываем ошибку для обработки выше
 
-async def add_member_to_post(db: AsyncSession, post_id: int, username_to_add: str) -> models.Post:
+async def create_posts_bulk(db: AsyncSession, new_posts: list[tuple[int, schemas.PostCreate]], owner: models.User) -> tuple[list[dict], list[dict]]:
     """
-    Добавляет пользователя как участника к посту.
-    Обновляет количество занятых мест (already_engaged) в посте.
-    Проверяет, не превышено ли максимальное количество мест.
+    Массовое создание постов владельца: один многострочный INSERT ... RETURNING
+    на пачку BULK_INSERT_CHUNK_SIZE. Ошибка пачки помечает только ее строки.
+    new_posts - [(индекс строки в запросе, схема)]. Возвращает (созданные, ошибки строк).
     """
-    # 1. Получаем пост из БД
-    db_post = await db.get(models.Post, post_id)
-    if not db_post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-
-    # --- 2. Проверяем, существует ли пользователь, которого добавляем ---
-    # SELECT * FROM users WHERE "user" = :username_to_add
-    user_select_stmt = select(models.User).where(models.User.user == username_to_add)
-    result_user = await db.execute(user_select_stmt)
-    db_user_to_add = result_user.scalar_one_or_none()
-
-    if not db_user_to_add:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User '{username_to_add}' to add not found."
+    created: list[dict] = []
+    errors: list[dict] = []
+    for chunk in bulk.chunked(new_posts):
+        stmt = insert(models.Post).values([
+            {**post.model_dump(), "owner_id": owner.id, "post_owner_user": owner.user, "already_engaged": 0}
+            for _, post in chunk
+        ]).returning(
+            models.Post.post_id, models.Post.trip_from, models.Post.trip_to,
+            models.Post.departure_datetime, models.Post.count_of_places, models.Post.already_engaged,
+            models.Post.created_at, models.Post.updated_at, models.Post.status,
         )
-    
-     # ---  Проверяем, является ли пользователь, которого добавляем владельцев---
-    # --- КОНЕЦ ПРОВЕРКИ 2 ---
-     # --- ПРОВЕРКА: НЕ ЯВЛЯЕТСЯ ЛИ ДОБАВЛЯЕМЫЙ ПОЛЬЗОВАТЕЛЬ ВЛАДЕЛЬЦЕМ ПОСТА ---
-    # Получаем объект владельца поста (если нужно сравнивать объекты или их ID)
-    # Предполагаем, что db_post.post_owner_user_fk хранит имя пользователя владельца
-    owner_username = db_post.post_owner_user
-    if owner_username == db_user_to_add.user: # Сравниваем имена пользователей (если FK это username)
-         # или owner_user_id == user_to_add.id (если FK это ID)
+        try:
+            rows = (await db.execute(stmt)).all()
+            await realtime.publish_many(db, [realtime.post_event(realtime.POST_CREATED, row) for row in rows])
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.exception("Непредвиденная ошибка при массовом создании постов")
+            errors.extend(bulk.row_error(index, "Database error while inserting this chunk.") for index, _ in chunk)
+            continue
+        created.extend(dict(row._mapping) for row in rows)
+    return created, errors
+
+async def _raise_reservation_failure(db: AsyncSession, post_id: int, user_id: int, username_to_add: str) -> None:
+    """
+    Холодный путь: условный UPDATE в add_member_to_post не нашел строку.
+    Выясняем причину, чтобы вернуть клиенту понятную ошибку.
+    """
+    post_row = (await db.execute(
+        select(models.Post.owner_id).where(models.Post.post_id == post_id)
+    )).one_or_none()
+    if post_row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    if post_row.owner_id == user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, # Используем 400 Bad Request
             detail=f"User '{username_to_add}' is the owner of the post and cannot be added as a member."
         )
-   
-    # --- 3. Проверяем, не является ли пользователь уже участником этого поста ---
-    # SELECT * FROM post_members WHERE post_id_fk = :post_id AND member_user_fk = :username_to_add
-    membership_select_stmt = select(models.PostMember).where(
-        models.PostMember.post_id == post_id,
-        models.PostMember.member_user == db_user_to_add.user # или db_user_to_add.user, если хотите быть уверены
-    )
-    result_membership = await db.execute(membership_select_stmt)
-    existing_membership = result_membership.scalar_one_or_none()
-
-    if existing_membership:
+    is_member = (await db.execute(
+        select(models.PostMember.post_id).where(
+            models.PostMember.post_id == post_id,
+            models.PostMember.user_id == user_id,
+        )
+    )).first()
+    if is_member:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, # 400 Bad Request или 409 Conflict
             detail=f"User '{username_to_add}' is already a member of this post."
         )
-    # --- КОНЕЦ ПРОВЕРКИ 3 ---
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="No available places in this post."
+    )
 
-    # 4. Проверяем, есть ли свободные места (ключевая проверка из предыдущего ответа)
-    stmt_count_members = sql_func.count(models.PostMember.post_id) # SQLAlchemy func для COUNT
-    query_count_members = await db.execute(
-        select(stmt_count_members).where(models.PostMember.post_id == post_id)
+async def add_member_to_post(db: AsyncSession, post_id: int, user: models.User) -> models.Post:
+    """
+    Добавляет пользователя как участника к посту.
+    Место резервируется атомарно одной транзакцией:
+      1. UPDATE posts SET already_engaged = already_engaged + 1
+         WHERE post_id = :id AND owner_id <> :user_id AND already_engaged < count_of_places
+         RETURNING post_id
+         - строка поста блокируется, параллельные вступления выстраиваются в очередь,
+           перебронирование невозможно;
+      2. INSERT INTO posts_members - повторное вступление ловится первичным ключом,
+         транзакция откатывается вместе с резервом места.
+    Проверки (пост существует, не владелец, не участник) выполняются только при отказе.
+    """
+    # Значения до rollback: он expire-ит объект пользователя в сессии
+    user_id, username_to_add = user.id, user.user
+    reserve_stmt = (
+        update(models.Post)
+        .where(
+            models.Post.post_id == post_id,
+            models.Post.owner_id != user_id,
+            models.Post.already_engaged < models.Post.count_of_places,
+        )
+        .values(already_engaged=models.Post.already_engaged + 1)
+        .returning(
+            models.Post.post_id, models.Post.trip_from, models.Post.trip_to, models.Post.departure_datetime,
+            models.Post.count_of_places, models.Post.already_engaged, models.Post.status,
+        )
+        .execution_options(synchronize_session=False)
     )
-    current_actual_members_count = query_count_members.scalar_one_or_none() or 0
+    try:
+        reserved = (await db.execute(reserve_stmt)).one_or_none()
+        if reserved is None:
+            await db.rollback()
+            await _raise_reservation_failure(db, post_id, user_id, username_to_add)
+
+        db.add(models.PostMember(post_id=post_id, user_id=user_id, member_user=username_to_add))
+        # Подписчики WebSocket получат новое число мест после commit (NOTIFY транзакционный)
+        await realtime.publish(db, realtime.post_event(realtime.POST_MEMBERS_CHANGED, reserved))
+        await db.commit()
+    except HTTPException:
+        raise
+    except IntegrityError as e:
+        await db.rollback() # Откатывает и резерв места
+        if getattr(e.orig, "pgcode", None) == "23503": # foreign_key_violation
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"User '{username_to_add}' to add not found."
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"User '{username_to_add}' is already a member of this post."
+        )
+    except Exception as e: # Важно ловить конкретные ошибки SQLAlchemy, если возможно
+        await db.rollback()
+        # Логирование ошибки
+        logger.warning("DATABASE ERROR when adding member to post %s for user %s: %s", post_id, username_to_add, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not add member to post: {str(e)}")
+
+    # Пост с участниками - их выводит схема ответа schemas.Post
+    return await get_post_by_id(db, post_id, options=loaders.POST_DETAIL)
+
+def _post_page_key(post: models.Post) -> tuple:
+    return (post.departure_datetime, post.post_id)
+
+async def _get_posts_page(db: AsyncSession, stmt, cursor: Optional[str], limit: int) -> tuple[list[models.Post], Optional[str]]:
+    """
+    Страница постов в порядке (departure_datetime, post_id) - индекс
+    ix_posts_departure_datetime_post_id. Возвращает (посты, курсор следующей страницы).
+    """
+    if cursor is not None:
+        after = pagination.decode_cursor(cursor, (datetime, int))
+        stmt = stmt.where(tuple_(models.Post.departure_datetime, models.Post.post_id) > after)
+    stmt = stmt.order_by(models.Post.departure_datetime, models.Post.post_id).limit(limit + 1)
+    result = await db.execute(stmt.options(*loaders.POST_LIST))
+    return pagination.split_page(result.scalars().all(), limit, _post_page_key)
+
+async def get_posts(db: AsyncSession, cursor: Optional[str] = None, limit: int = pagination.DEFAULT_PAGE_SIZE) -> tuple[list[models.Post], Optional[str]]:
+    return await _get_posts_page(db, select(models.Post), cursor, limit)
+
+async def get_posts_from_owner(db: AsyncSession, owner_id: int, cursor: Optional[str] = None, limit: int = pagination.DEFAULT_PAGE_SIZE) -> tuple[list[models.Post], Optional[str]]:
+    stmt = select(models.Post).where(models.Post.owner_id == owner_id)
+    return await _get_posts_page(db, stmt, cursor, limit)
 
-    if current_actual_members_count >= db_post.count_of_places:
+def check_departure_range(departure_from: Optional[datetime], departure_to: Optional[datetime]) -> None:
+    if departure_from is not None and departure_to is not None and departure_from > departure_to:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No available places in this post."
+            detail="departure_from не может быть позже departure_to.",
         )
 
-    # 5. Если все проверки пройдены, создаем новую запись о членстве
-    new_member_entry = models.PostMember(
-        post_id=post_id,
-        member_user=username_to_add # Используем оригинальное имя пользователя
+async def search_posts(
+    db: AsyncSession,
+    trip_from: Optional[CountriesCapitals] = None,
+    trip_to: Optional[CountriesCapitals] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    only_free_seats: bool = True,
+    cursor: Optional[str] = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+) -> tuple[list[models.Post], Optional[str]]:
+    """
+    Поиск активных поездок по маршруту и окну отправления.
+    Обслуживается индексом ix_posts_search (status, trip_from, trip_to,
+    departure_datetime, post_id): равенство по префиксу + диапазон по времени,
+    проверка свободных мест - по INCLUDE-колонкам индекса.
+    """
+    if trip_from is not None and trip_from == trip_to:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exceptrions.wrong_trip_place))
+    check_departure_range(departure_from, departure_to)
+    stmt = select(models.Post).where(models.Post.status == PostStatus.ACTIVE)
+    if trip_from is not None:
+        stmt = stmt.where(models.Post.trip_from == trip_from)
+    if trip_to is not None:
+        stmt = stmt.where(models.Post.trip_to == trip_to)
+    if departure_from is not None:
+        stmt = stmt.where(models.Post.departure_datetime >= departure_from)
+    if departure_to is not None:
+        stmt = stmt.where(models.Post.departure_datetime <= departure_to)
+    if only_free_seats:
+        stmt = stmt.where(models.Post.already_engaged < models.Post.count_of_places)
+    return await _get_posts_page(db, stmt, cursor, limit)
+
+_MATCH_COLUMNS = (
+    models.Post.post_id,
+    models.Post.trip_from,
+    models.Post.trip_to,
+    models.Post.departure_datetime,
+    models.Post.count_of_places,
+    models.Post.already_engaged,
+    (models.Post.count_of_places - models.Post.already_engaged).label("free_places"),
+)
+
+async def match_posts(
+    db: AsyncSession,
+    trip_from: CountriesCapitals,
+    trip_to: CountriesCapitals,
+    at: datetime,
+    seats: int,
+    limit: int,
+    window: timedelta,
+) -> list[dict]:
+    """
+    То же, что route_index.RouteIndex.match, запросами к БД: до limit активных поездок
+    маршрута с >= seats свободных мест, ближайших к at. Два запроса по ix_posts_search -
+    вперед и назад от at - и слияние по расстоянию; ORDER BY abs(...) индекс не использует.
+    Отвечает GET /match, пока индекс маршрутов не собран.
+    """
+    now = datetime.now(timezone.utc)
+    earliest, latest = max(now, at - window), at + window
+    stmt = select(*_MATCH_COLUMNS).where(
+        models.Post.status == PostStatus.ACTIVE,
+        models.Post.trip_from == trip_from,
+        models.Post.trip_to == trip_to,
+        models.Post.count_of_places - models.Post.already_engaged >= seats,
     )
-    db.add(new_member_entry)
+    after = (await db.execute(
+        stmt.where(models.Post.departure_datetime >= max(at, earliest), models.Post.departure_datetime <= latest)
+        .order_by(models.Post.departure_datetime, models.Post.post_id).limit(limit)
+    )).all()
+    before = (await db.execute(
+        stmt.where(models.Post.departure_datetime >= earliest, models.Post.departure_datetime < at)
+        .order_by(models.Post.departure_datetime.desc(), models.Post.post_id.desc()).limit(limit)
+    )).all() if at > earliest else []
 
-    # 6. Обновляем поле already_engaged в посте
-    db_post.already_engaged = current_actual_members_count + 1
-    # db.add(db_post) # Для обновлений существующих отслеживаемых объектов db.add() не всегда нужен,
-                     # SQLAlchemy отслеживает изменения. Но его наличие не повредит.
+    def distance(row) -> float:
+        departure = row.departure_datetime
+        if departure.tzinfo is None: # SQLite
+            departure = departure.replace(tzinfo=timezone.utc)
+        return abs((departure - at).total_seconds())
 
-    try:
-        await db.commit()
-        await db.refresh(db_post) # Обновить объект поста
-    except Exception as e: # Важно ловить конкретные ошибки SQLAlchemy, если возможно (например, IntegrityError)
-        await db.rollback()
-        # Логирование ошибки
-        print(f"DATABASE ERROR when adding member to post {post_id} for user {username_to_add}: {e}")
-        # Можно проверить тип ошибки, например, если это IntegrityError из-за гонки состояний
-        # if isinstance(e, sqlalchemy.exc.IntegrityError):
-        #     raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Conflict while adding member, possibly due to concurrent update.")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Could not add member to post: {str(e)}")
+    return [dict(row._mapping) for row in sorted(after + before, key=distance)[:limit]]
 
-    return db_post
+# Колонки поста в выгрузке (schemas.PostExport без members)
+_EXPORT_COLUMNS = (
+    models.Post.post_id,
+    models.Post.owner_id,
+    models.Post.post_owner_user,
+    models.Post.trip_from,
+    models.Post.trip_to,
+    models.Post.departure_datetime,
+    models.Post.count_of_places,
+    models.Post.already_engaged,
+    models.Post.status,
+    models.Post.created_at,
+    models.Post.updated_at,
+)
 
-async def get_posts(db: AsyncSession,  skip: int = 0, limit: int = 100) -> models.Post | None:
-    result = await db.execute(select(models.Post).offset(skip).limit(limit))
-    return result.scalars().all()
+async def stream_posts_for_export(
+    db: AsyncSession,
+    post_status: Optional[PostStatus] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    batch_size: int = 1000,
+) -> AsyncIterator[dict]:
+    """
+    Все посты (с фильтрами) вместе с участниками, по одному dict на пост в порядке post_id.
+    Один запрос posts LEFT JOIN posts_members через серверный курсор: в памяти только
+    текущая пачка из batch_size строк, а не вся таблица, как у scalars().all().
+    Участники поста идут подряд (ORDER BY post_id), поэтому собираются без словаря.
+    """
+    stmt = (
+        select(*_EXPORT_COLUMNS, models.PostMember.member_user)
+        .outerjoin(models.PostMember, models.PostMember.post_id == models.Post.post_id)
+        .order_by(models.Post.post_id, models.PostMember.user_id)
+    )
+    if post_status is not None:
+        stmt = stmt.where(models.Post.status == post_status)
+    if departure_from is not None:
+        stmt = stmt.where(models.Post.departure_datetime >= departure_from)
+    if departure_to is not None:
+        stmt = stmt.where(models.Post.departure_datetime <= departure_to)
 
-async def get_posts_from_owner(db: AsyncSession, post_user: str, skip: int = 0, limit: int = 100) -> models.Post | None:
-    stmt = select(models.Post).where(models.Post.post_owner_user == post_user)
-    result = await db.execute(stmt.offset(skip).limit(limit))
-    return result.scalars().all()
+    result = await db.stream(stmt.execution_options(yield_per=batch_size))
+    current = None
+    async for partition in result.partitions():
+        for row in partition:
+            if current is None or current["post_id"] != row.post_id:
+                if current is not None:
+                    yield current
+                current = {column.key: getattr(row, column.key) for column in _EXPORT_COLUMNS}
+                current["members"] = []
+            if row.member_user is not None:
+                current["members"].append(row.member_user)
+    if current is not None:
+        yield current
 
-async def get_post_by_id(db: AsyncSession, post_id: int)-> models.Post | None:
-    stmt = select(models.Post).where(models.Post.post_id == post_id)
+async def get_post_updated_at(db: AsyncSession, post_id: int) -> datetime:
+    """
+    Только updated_at поста - для ETag/Last-Modified (conditional.py) до загрузки
+    поста с участниками. Вызывает HTTPException 404, если поста нет.
+    """
+    updated_at = (await db.execute(
+        select(models.Post.updated_at).where(models.Post.post_id == post_id)
+    )).one_or_none()
+    if updated_at is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Пост с ID {post_id} не найден."
+        )
+    return updated_at[0]
+
+async def get_post_by_id(db: AsyncSession, post_id: int, options=())-> models.Post | None:
+    """`options` - профиль загрузки из loaders.py (по умолчанию только колонки поста)."""
+    stmt = select(models.Post).where(models.Post.post_id == post_id).options(*options)
+    if options:
+        # Пост мог уже лежать в сессии без загруженных связей - перезаписываем его
+        stmt = stmt.execution_options(populate_existing=True)
     try:
         result = await db.execute(stmt)
         post = result.scalar_one() # This will raise NoResultFound if no post
@@ -140,7 +363,7 @@ async def get_post_by_id(db: AsyncSession, post_id: int)-> models.Post | None:
         )
     except SQLAlchemyError as e:
         # Log e
-        print(f"Database error: {e}")
+        logger.exception("Database error")
         raise HTTPException(
             status_code=500,
             detail="An error occurred while fetching the post from the database."
@@ -152,19 +375,20 @@ async def update_post(db: AsyncSession, post_id: int, post_update: schemas.PostC
     db_post = await get_post_by_id(db, post_id)
     if not db_post:
         return None # Item not found
-    is_owner = (post_owner.user == db_post.post_owner_user)
+    is_owner = (post_owner.id == db_post.owner_id)
     is_admin = False
     if not is_owner:
         await auth.require_admin_user(post_owner)
         is_admin=True
     if is_owner or is_admin:
         update_data = post_update.model_dump(exclude_unset=True)
+        previous_route = (db_post.trip_from, db_post.trip_to)
     # Update the SQLAlchemy model instance
         for key, value in update_data.items():
             setattr(db_post, key, value)
         db.add(db_post) # Add the updated object to the session
-        await db.commit()
-        await db.refresh(db_post)
+        await realtime.publish(db, realtime.post_event(realtime.POST_UPDATED, db_post, previous_route))
+        await db.commit() # updated_at приходит из UPDATE ... RETURNING (eager_defaults)
         return db_post
     else:
         # Если ни владелец, ни админ (и проверка на админа не выбросила исключение)
@@ -177,13 +401,14 @@ async def delete_post_by_id(db: AsyncSession, post_id: int, user: models.User)->
     db_post = await get_post_by_id(db, post_id)
     if not db_post:
         return None # Item not found
-    is_owner = (user.user == db_post.post_owner_user)
+    is_owner = (user.id == db_post.owner_id)
     is_admin = False
     if not is_owner:
         await auth.require_admin_user(user)
         is_admin=True
     if is_owner or is_admin:
         await db.delete(db_post)
+        await realtime.publish(db, realtime.post_event(realtime.POST_DELETED, db_post))
         await db.commit()
         return db_post
     else:
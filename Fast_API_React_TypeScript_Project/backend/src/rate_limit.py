@@ -0,0 +1,249 @@
+# rate_limit.py
+# Ограничение частоты запросов (GCRA) для /login, /register и записывающих эндпоинтов.
+# /login и /register стоят bcrypt и поиска пользователя в БД: волна подбора паролей
+# забирала CPU у всех. Зависимости отсюда отвечают 429 с Retry-After до хеширования
+# и до запросов к БД эндпоинта.
+#
+# GCRA: на ключ хранится одно число - TAT (theoretical arrival time). Запрос проходит,
+# если TAT + interval - burst * interval <= now; тогда TAT сдвигается на interval.
+# Запись с TAT в прошлом равна отсутствующей, поэтому истечение ленивое: такие ключи
+# просто перезаписываются или выбрасываются при переполнении.
+#
+# Хранилище (RATE_LIMIT_BACKEND):
+# - "memory" - dict в воркере: без запросов к БД, но лимит на каждый воркер свой;
+# - "postgres" - общая таблица rate_limits (миграция 6a7b8c9d0e12), один атомарный
+#   INSERT ... ON CONFLICT DO UPDATE на ключ; лимит общий для всех воркеров.
+#   Ошибка БД не блокирует вход - запрос пропускается (fail open) с предупреждением в лог.
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Annotated, Iterable
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import delete, text
+
+import config
+import models
+from auth import auth
+from database import engine, AsyncSessionFactory
+
+logger = logging.getLogger("app.rate_limit")
+
+
+@dataclass(frozen=True)
+class Policy:
+    limit: int       # запросов за period
+    period: float    # секунд
+    burst: int       # сколько запросов подряд разрешено сразу
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+    @property
+    def tolerance(self) -> float:
+        return self.burst * self.interval
+
+
+# Политики по умолчанию; переопределяются RATE_LIMITS="login_user=10/60/5,write_user=120/60"
+POLICIES: dict[str, Policy] = {
+    "login_ip": Policy(limit=30, period=60, burst=10),     # перебор по многим именам с одного адреса
+    "login_user": Policy(limit=5, period=60, burst=5),     # перебор паролей одного пользователя
+    "register_ip": Policy(limit=5, period=60, burst=5),
+    "write_user": Policy(limit=60, period=60, burst=30),
+    "write_ip": Policy(limit=120, period=60, burst=60),
+}
+
+
+def _parse_overrides(value: str) -> dict[str, Policy]:
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, spec = item.partition("=")
+        parts = spec.split("/")
+        limit, period = int(parts[0]), float(parts[1])
+        burst = int(parts[2]) if len(parts) > 2 else limit
+        overrides[name.strip()] = Policy(limit=limit, period=period, burst=burst)
+    return overrides
+
+
+POLICIES.update(_parse_overrides(config.RATE_LIMITS))
+
+
+class MemoryStore:
+    """
+    Ключ -> TAT в обычном dict (порядок вставки = давность обновления).
+    Работает в одном event loop, без await внутри - блокировки не нужны.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat: dict[str, float] = {}
+        self.evictions = 0
+
+    async def acquire(self, checks: list[tuple[str, Policy]], now: float) -> float:
+        """0 - запрос пропущен и учтен по всем ключам, иначе секунды до следующей попытки."""
+        retry_after = 0.0
+        updates = []
+        for key, policy in checks:
+            new_tat = max(self._tat.get(key, now), now) + policy.interval
+            allow_at = new_tat - policy.tolerance
+            if allow_at > now:
+                retry_after = max(retry_after, allow_at - now)
+            else:
+                updates.append((key, new_tat))
+        if retry_after:
+            return retry_after # отказ не расходует лимит остальных ключей
+        for key, new_tat in updates:
+            self._tat.pop(key, None)
+            self._tat[key] = new_tat
+        if len(self._tat) > self.max_keys:
+            self._shrink(now)
+        return 0.0
+
+    def _shrink(self, now: float) -> None:
+        # Сначала истекшие (они ничего не ограничивают), затем самые давно обновленные -
+        # до 90% емкости, чтобы не чистить на каждом запросе
+        for key in [key for key, tat in self._tat.items() if tat <= now]:
+            del self._tat[key]
+        target = int(self.max_keys * 0.9)
+        while len(self._tat) > target:
+            del self._tat[next(iter(self._tat))]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+
+# Условие GCRA max(tat, now) + interval - tolerance <= now переписано как
+# tat <= now + tolerance - interval (:max_tat): параметры без арифметики друг с другом,
+# типы выводятся из колонки. CASE вместо GREATEST и имя таблицы вместо псевдонима -
+# тот же запрос работает и на SQLite.
+_ACQUIRE_SQL = text("""
+INSERT INTO rate_limits (key, tat) VALUES (:key, :fresh_tat)
+ON CONFLICT (key) DO UPDATE
+    SET tat = CASE WHEN rate_limits.tat > :now THEN rate_limits.tat ELSE :now END + :interval
+    WHERE rate_limits.tat <= :max_tat
+RETURNING tat
+""")
+_TAT_SQL = text("SELECT tat FROM rate_limits WHERE key = :key")
+
+
+class PostgresStore:
+    """TAT в общей таблице rate_limits: все ключи запроса - одна транзакция."""
+
+    async def acquire(self, checks: list[tuple[str, Policy]], now: float) -> float:
+        async with engine.connect() as conn:
+            retry_after = 0.0
+            for key, policy in checks:
+                params = {
+                    "key": key, "now": now, "interval": policy.interval,
+                    "fresh_tat": now + policy.interval, "max_tat": now + policy.tolerance - policy.interval,
+                }
+                if (await conn.execute(_ACQUIRE_SQL, params)).first() is None:
+                    tat = (await conn.execute(_TAT_SQL, {"key": key})).scalar_one()
+                    retry_after = max(retry_after, max(tat, now) + policy.interval - policy.tolerance - now)
+            if retry_after:
+                await conn.rollback() # как в MemoryStore: отказ не расходует остальные ключи
+            else:
+                await conn.commit()
+            return retry_after
+
+    def __len__(self) -> int:
+        return 0 # ключи в БД, в воркере ничего не хранится
+
+
+class RateLimiter:
+    def __init__(self, store):
+        self.store = store
+        self.allowed = 0
+        self.rejected = 0
+        self.errors = 0
+
+    async def check(self, keys: Iterable[tuple[str, str]]) -> None:
+        """keys - (политика, идентификатор). Вызывает HTTPException 429 с Retry-After."""
+        if not config.RATE_LIMIT_ENABLED:
+            return
+        checks = [(f"{name}:{identity}", POLICIES[name]) for name, identity in keys]
+        try:
+            retry_after = await self.store.acquire(checks, time.time())
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Rate limit check failed, request allowed: %s", e)
+            return
+        if not retry_after:
+            self.allowed += 1
+            return
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Try again later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+    def stats(self) -> dict:
+        return {
+            "backend": config.RATE_LIMIT_BACKEND,
+            "keys": len(self.store),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evictions": getattr(self.store, "evictions", 0),
+            "errors": self.errors,
+        }
+
+
+limiter = RateLimiter(
+    PostgresStore() if config.RATE_LIMIT_BACKEND == "postgres" else MemoryStore(config.RATE_LIMIT_MAX_KEYS)
+)
+
+
+async def cleanup_expired() -> int:
+    """Удаляет из rate_limits ключи с TAT в прошлом. Запускается планировщиком."""
+    async with AsyncSessionFactory() as session:
+        result = await session.execute(
+            delete(models.RateLimitState).where(models.RateLimitState.tat < time.time())
+        )
+        await session.commit()
+    if result.rowcount:
+        logger.info("Rate limit cleanup: deleted %s expired keys.", result.rowcount)
+    return result.rowcount
+
+
+def client_ip(request: Request) -> str:
+    """
+    Адрес клиента. За RATE_LIMIT_TRUSTED_PROXIES прокси - N-й справа адрес из
+    X-Forwarded-For: левее него клиент может дописать что угодно.
+    """
+    proxies = config.RATE_LIMIT_TRUSTED_PROXIES
+    if proxies > 0:
+        forwarded = [part.strip() for part in request.headers.get("x-forwarded-for", "").split(",") if part.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.client.host if request.client else "unknown"
+
+
+# --- Зависимости для маршрутов ---
+
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()], # та же форма, что у /login (кэш зависимостей)
+) -> None:
+    await limiter.check((
+        ("login_ip", client_ip(request)),
+        ("login_user", form_data.username.lower()),
+    ))
+
+
+async def limit_register(request: Request) -> None:
+    await limiter.check((("register_ip", client_ip(request)),))
+
+
+async def limit_writes(
+    request: Request,
+    current_user: Annotated[models.User, Depends(auth.get_current_user)],
+) -> None:
+    await limiter.check((
+        ("write_user", str(current_user.id)),
+        ("write_ip", client_ip(request)),
+    ))
@@ -0,0 +1,288 @@
+# realtime.py
+# Push изменений постов (места, маршрут, удаление) WebSocket-клиентам вместо опроса
+# GET /posts и GET /{post_id}/post.
+# - publish(): posts.* вызывает в своей транзакции; в Postgres это pg_notify, событие
+#   уходит только при commit и получают его все воркеры;
+# - у каждого воркера одно LISTEN-соединение (asyncpg, вне пула), которое раздает
+#   события локальным подписчикам через hub;
+# - у каждого подписчика своя ограниченная очередь: переполнилась - клиент слишком
+#   медленный и отключается (код 1013), остальные не ждут его.
+# Без Postgres (SQLite в разработке) события раздаются локально после commit.
+# Кроме WebSocket-клиентов события читают in-process потребители (hub.add_listener,
+# например индекс маршрутов route_index.py) - события публикуются, пока есть хоть один.
+import asyncio
+import json
+import logging
+from typing import Callable, Hashable, Optional
+
+import anyio
+from fastapi import WebSocket, WebSocketDisconnect, status
+from sqlalchemy import event, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import config
+from database import engine
+
+logger = logging.getLogger("app.realtime")
+
+# Ключ session.info для событий, ожидающих commit (не-Postgres)
+PENDING_EVENTS_KEY = "realtime_pending_events"
+
+POST_CREATED = "post.created"
+POST_MEMBERS_CHANGED = "post.members"
+POST_UPDATED = "post.updated"
+POST_DELETED = "post.deleted"
+
+
+def post_key(post_id: int) -> tuple:
+    return ("post", post_id)
+
+
+def route_key(trip_from: str, trip_to: str) -> tuple:
+    return ("route", trip_from, trip_to)
+
+
+def _value(v):
+    return getattr(v, "value", v) # Enum -> значение
+
+
+def post_event(kind: str, post, previous_route: Optional[tuple[str, str]] = None) -> dict:
+    """Событие по посту (models.Post или строка RETURNING). previous_route - маршрут до изменения."""
+    payload = {
+        "type": kind,
+        "post_id": post.post_id,
+        "trip_from": _value(post.trip_from),
+        "trip_to": _value(post.trip_to),
+        "departure_datetime": post.departure_datetime.isoformat() if post.departure_datetime else None,
+        "count_of_places": post.count_of_places,
+        "already_engaged": post.already_engaged,
+        "status": _value(post.status),
+    }
+    if previous_route is not None and previous_route != (payload["trip_from"], payload["trip_to"]):
+        payload["previous_route"] = [_value(previous_route[0]), _value(previous_route[1])]
+    return payload
+
+
+def event_keys(payload: dict) -> set:
+    keys = {post_key(payload["post_id"]), route_key(payload["trip_from"], payload["trip_to"])}
+    if "previous_route" in payload:
+        keys.add(route_key(*payload["previous_route"]))
+    return keys
+
+
+def events_enabled() -> bool:
+    return config.REALTIME_ENABLED or hub.has_listeners()
+
+
+async def publish(db: AsyncSession, payload: dict) -> None:
+    """Ставит событие в текущую транзакцию; подписчики получат его после commit."""
+    if not events_enabled():
+        return
+    message = json.dumps(payload, separators=(",", ":"))
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(select(func.pg_notify(config.REALTIME_CHANNEL, message)))
+    else:
+        db.sync_session.info.setdefault(PENDING_EVENTS_KEY, []).append(message)
+
+
+# Все события пачки - один запрос, а не pg_notify на каждую строку
+_NOTIFY_MANY_SQL = text("SELECT pg_notify(:channel, message) FROM unnest(CAST(:messages AS text[])) AS message")
+
+
+async def publish_many(db: AsyncSession, payloads: list[dict]) -> None:
+    """publish для пачки событий (массовое создание постов)."""
+    if not payloads or not events_enabled():
+        return
+    messages = [json.dumps(payload, separators=(",", ":")) for payload in payloads]
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(_NOTIFY_MANY_SQL, {"channel": config.REALTIME_CHANNEL, "messages": messages})
+    else:
+        db.sync_session.info.setdefault(PENDING_EVENTS_KEY, []).extend(messages)
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_pending_after_commit(session):
+    for message in session.info.pop(PENDING_EVENTS_KEY, ()):
+        hub.dispatch(message)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_EVENTS_KEY, None)
+
+
+class Subscriber:
+    def __init__(self, keys: set, queue_size: int):
+        self.keys = keys
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.dropped = asyncio.Event()
+
+
+class RealtimeHub:
+    """Подписчики этого воркера по ключам (пост, маршрут)."""
+
+    def __init__(self):
+        self._subscribers: dict[Hashable, set[Subscriber]] = {}
+        self._listeners: list[tuple[Callable[[dict], None], Optional[Callable[[], None]]]] = []
+        self.delivered = 0
+        self.dropped = 0
+
+    def add_listener(self, on_event: Callable[[dict], None], on_resync: Optional[Callable[[], None]] = None) -> None:
+        """
+        In-process потребитель всех событий. on_event вызывается синхронно из dispatch -
+        без await и быстро. on_resync - после переподключения LISTEN: события за время
+        обрыва потеряны, состояние нужно перечитать.
+        """
+        self._listeners.append((on_event, on_resync))
+
+    def has_listeners(self) -> bool:
+        return bool(self._listeners)
+
+    def resync(self) -> None:
+        for _, on_resync in self._listeners:
+            if on_resync is not None:
+                on_resync()
+
+    def subscribe(self, keys: set, queue_size: int) -> Subscriber:
+        subscriber = Subscriber(keys, queue_size)
+        for key in keys:
+            self._subscribers.setdefault(key, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for key in subscriber.keys:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def dispatch(self, message: str) -> None:
+        """Раздает событие без ожидания: put_nowait, переполненные очереди - отключение клиента."""
+        try:
+            payload = json.loads(message)
+            keys = event_keys(payload)
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Bad realtime event: %.200s", message)
+            return
+        for on_event, _ in self._listeners:
+            try:
+                on_event(payload)
+            except Exception:
+                logger.exception("Realtime listener failed on event %.200s", message)
+        targets = set()
+        for key in keys:
+            targets.update(self._subscribers.get(key, ()))
+        for subscriber in targets:
+            try:
+                subscriber.queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self.unsubscribe(subscriber)
+                subscriber.dropped.set()
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len({s for subs in self._subscribers.values() for s in subs}),
+            "keys": len(self._subscribers),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "listening": _listener_task is not None,
+        }
+
+
+hub = RealtimeHub()
+
+
+async def serve(websocket: WebSocket, keys: set) -> None:
+    """Держит WebSocket-подписку: события из очереди подписчика -> клиенту."""
+    if not keys or len(keys) > config.REALTIME_MAX_SUBSCRIPTIONS:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscriber = hub.subscribe(keys, config.REALTIME_QUEUE_SIZE)
+
+    async def send_events():
+        try:
+            while True:
+                await websocket.send_text(await subscriber.queue.get())
+        except (WebSocketDisconnect, RuntimeError): # клиент ушел посреди отправки
+            pass
+
+    async def wait_disconnect(): # входящие сообщения клиента не нужны, ждем только закрытия
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    # Первая завершившаяся задача (клиент ушел / отключен как медленный) отменяет остальные.
+    # anyio, а не asyncio.wait: отмена должна корректно проходить через cancel scope сервера.
+    try:
+        async with anyio.create_task_group() as task_group:
+            async def run_then_stop(fn):
+                await fn()
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(run_then_stop, send_events)
+            task_group.start_soon(run_then_stop, wait_disconnect)
+            task_group.start_soon(run_then_stop, subscriber.dropped.wait)
+    finally:
+        hub.unsubscribe(subscriber)
+    if subscriber.dropped.is_set():
+        # Медленный потребитель: пусть переподключится и перечитает состояние через GET
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+# --- LISTEN-соединение воркера (только Postgres) ---
+
+_listener_task: Optional[asyncio.Task] = None
+
+
+def _on_notify(connection, pid, channel, payload) -> None:
+    hub.dispatch(payload)
+
+
+async def _listen_loop() -> None:
+    import asyncpg # есть только в окружении с Postgres
+
+    dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _conn: lost.set())
+            await connection.add_listener(config.REALTIME_CHANNEL, _on_notify)
+            logger.info("Realtime: listening on channel %s", config.REALTIME_CHANNEL)
+            hub.resync() # события до подключения (старт, обрыв) сюда не придут
+            await lost.wait()
+            logger.warning("Realtime: LISTEN connection lost, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Realtime: LISTEN failed: %s", e)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(config.REALTIME_RECONNECT_SECONDS)
+
+
+async def start_listener() -> None:
+    """Запускает LISTEN воркера (вызывается из lifespan). Без Postgres - no-op."""
+    global _listener_task
+    if not events_enabled() or engine.dialect.name != "postgresql" or _listener_task is not None:
+        return
+    _listener_task = asyncio.create_task(_listen_loop(), name="realtime-listen")
+
+
+async def stop_listener() -> None:
+    global _listener_task
+    if _listener_task is None:
+        return
+    _listener_task.cancel()
+    try:
+        await _listener_task
+    except asyncio.CancelledError:
+        pass
+    _listener_task = None
@@ -0,0 +1,77 @@
+# replica.py
+# Проверка лага реплики для чтения (database.replica_engine).
+# Фоновая задача каждого воркера раз в REPLICA_LAG_CHECK_INTERVAL_SECONDS измеряет
+# лаг и выставляет database.replica_state.healthy. Лаг больше REPLICA_MAX_LAG_SECONDS
+# или ошибка подключения - чтения идут в основную БД до следующей успешной проверки.
+import asyncio
+import logging
+from typing import Optional
+
+from sqlalchemy import text
+
+import config
+import database
+
+logger = logging.getLogger("app.replica")
+
+# 0, если реплика проиграла все полученное WAL (простаивающий primary не дает ложного лага),
+# иначе - время с последней проигранной транзакции.
+PG_REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_monitor_task: Optional[asyncio.Task] = None
+
+
+async def measure_lag() -> float:
+    """Лаг реплики в секундах. Для не-Postgres (локальная подмена реплики) - 0, если база отвечает."""
+    async with database.replica_engine.connect() as conn:
+        if conn.dialect.name != "postgresql":
+            await conn.execute(text("SELECT 1"))
+            return 0.0
+        lag = (await conn.execute(PG_REPLICA_LAG_SQL)).scalar_one()
+        # NULL - это не реплика (например, DATABASE_REPLICA_URL указывает на primary)
+        return float(lag or 0)
+
+
+async def check_replica() -> bool:
+    state = database.replica_state
+    try:
+        state.lag_seconds = await measure_lag()
+        healthy = state.lag_seconds <= config.REPLICA_MAX_LAG_SECONDS
+    except Exception as e:
+        state.lag_seconds = None
+        healthy = False
+        logger.warning("Replica lag check failed: %s", e)
+    if healthy != state.healthy:
+        logger.warning("Replica %s (lag=%s s)", "enabled" if healthy else "disabled, reads go to primary", state.lag_seconds)
+    state.healthy = healthy
+    return healthy
+
+
+async def _monitor_loop() -> None:
+    while True:
+        await asyncio.sleep(config.REPLICA_LAG_CHECK_INTERVAL_SECONDS)
+        await check_replica()
+
+
+async def start_monitor() -> None:
+    """Первая проверка и фоновая задача (вызывается из lifespan). Без реплики - no-op."""
+    global _monitor_task
+    if database.replica_engine is None or _monitor_task is not None:
+        return
+    await check_replica()
+    _monitor_task = asyncio.create_task(_monitor_loop(), name="replica-lag-monitor")
+
+
+async def stop_monitor() -> None:
+    global _monitor_task
+    if _monitor_task is None:
+        return
+    _monitor_task.cancel()
+    try:
+        await _monitor_task
+    except asyncio.CancelledError:
+        pass
+    _monitor_task = None
@@ -0,0 +1,296 @@
+# route_index.py
+# Индекс активных поездок в памяти воркера для GET /match ("N ближайших к времени T
+# поездок из A в B с >= k свободными местами") - без запроса к БД.
+# Городов в CountriesCapitals единицы, маршрутов (trip_from, trip_to) - десятки, поэтому
+# на маршрут хранятся отсортированные по (отправление, post_id) массивы, и ответ -
+# бинарный поиск по T и обход в обе стороны.
+#
+# Индекс собирается из БД при старте и обновляется событиями realtime.py
+# (post.created/members/updated/deleted из posts.*): в Postgres они приходят через
+# LISTEN всем воркерам. После (пере)подключения LISTEN и раз в ROUTE_INDEX_REFRESH_SECONDS
+# индекс пересобирается - архивация и каскадное удаление постов событий не шлют.
+# Пока индекс не собран, GET /match отвечает SQL-запросом (posts.match_posts).
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import config
+import models
+from database import AsyncSessionFactory
+from enums import PostStatus
+from realtime import realtime
+
+logger = logging.getLogger("app.route_index")
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, str): # из JSON события
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None: # SQLite в разработке возвращает naive datetime - считаем его UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _value(v):
+    return getattr(v, "value", v) # Enum -> значение
+
+
+class _Route:
+    """Поездки одного маршрута: параллельные массивы в порядке keys = (отправление, post_id)."""
+    __slots__ = ("keys", "places", "engaged")
+
+    def __init__(self):
+        self.keys: list[tuple[float, int]] = []
+        self.places: list[int] = []
+        self.engaged: list[int] = []
+
+    def insert(self, key: tuple[float, int], places: int, engaged: int) -> None:
+        i = bisect.bisect_left(self.keys, key)
+        self.keys.insert(i, key)
+        self.places.insert(i, places)
+        self.engaged.insert(i, engaged)
+
+    def remove(self, key: tuple[float, int]) -> None:
+        i = bisect.bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            del self.keys[i], self.places[i], self.engaged[i]
+
+
+class RouteIndex:
+    """
+    Маршрут -> _Route и post_id -> (маршрут, ключ) для обновления по событию.
+    Работает в одном event loop, без await внутри изменений - блокировки не нужны.
+    """
+
+    def __init__(self):
+        self._routes: dict[tuple[str, str], _Route] = {}
+        self._where: dict[int, tuple[tuple[str, str], tuple[float, int]]] = {}
+        self._pending: Optional[list[dict]] = None # события, пришедшие во время пересборки
+        self.built_at: Optional[float] = None
+        self.events = 0
+        self.rebuilds = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    def upsert(self, post_id: int, trip_from: str, trip_to: str, departure: float, places: int, engaged: int) -> None:
+        route, key = (trip_from, trip_to), (departure, post_id)
+        if self._where.get(post_id) == (route, key): # изменились только места
+            entries = self._routes[route]
+            i = bisect.bisect_left(entries.keys, key)
+            entries.places[i], entries.engaged[i] = places, engaged
+            return
+        self.discard(post_id)
+        self._routes.setdefault(route, _Route()).insert(key, places, engaged)
+        self._where[post_id] = (route, key)
+
+    def discard(self, post_id: int) -> None:
+        located = self._where.pop(post_id, None)
+        if located is None:
+            return
+        route, key = located
+        entries = self._routes[route]
+        entries.remove(key)
+        if not entries.keys:
+            del self._routes[route]
+
+    def apply(self, payload: dict) -> None:
+        """Событие realtime.post_event -> индекс (hub.add_listener)."""
+        self.events += 1
+        if self._pending is not None:
+            self._pending.append(payload)
+        self._apply(payload)
+
+    def _apply(self, payload: dict) -> None:
+        if payload["type"] == realtime.POST_DELETED or payload.get("status") != PostStatus.ACTIVE.value:
+            self.discard(payload["post_id"])
+            return
+        self.upsert(
+            payload["post_id"], payload["trip_from"], payload["trip_to"], _timestamp(payload["departure_datetime"]),
+            payload["count_of_places"], payload["already_engaged"],
+        )
+
+    def match(self, trip_from: str, trip_to: str, at: float, seats: int, limit: int, window: float, now: float) -> list[dict]:
+        """
+        До limit поездок маршрута с >= seats свободных мест, отправляющихся не раньше now
+        и не дальше window секунд от at, по возрастанию |отправление - at|.
+        """
+        entries = self._routes.get((trip_from, trip_to))
+        if entries is None:
+            return []
+        keys, places, engaged = entries.keys, entries.places, entries.engaged
+        earliest, latest = max(now, at - window), at + window
+        right = bisect.bisect_left(keys, (max(at, earliest),))
+        left = right - 1
+        found = []
+        while len(found) < limit:
+            has_left = left >= 0 and keys[left][0] >= earliest
+            has_right = right < len(keys) and keys[right][0] <= latest
+            if has_left and (not has_right or at - keys[left][0] < keys[right][0] - at):
+                i, left = left, left - 1
+            elif has_right:
+                i, right = right, right + 1
+            else:
+                break
+            if places[i] - engaged[i] >= seats:
+                found.append(i)
+        return [
+            {
+                "post_id": keys[i][1],
+                "trip_from": trip_from,
+                "trip_to": trip_to,
+                "departure_datetime": datetime.fromtimestamp(keys[i][0], timezone.utc),
+                "count_of_places": places[i],
+                "already_engaged": engaged[i],
+                "free_places": places[i] - engaged[i],
+            }
+            for i in found
+        ]
+
+    def departures(self, trip_from: str, trip_to: str, earliest: float, latest: float, seats: int):
+        """
+        Поездки маршрута с отправлением в [earliest, latest] и >= seats свободных мест
+        по возрастанию отправления: (отправление, post_id, мест, занято).
+        """
+        entries = self._routes.get((trip_from, trip_to))
+        if entries is None:
+            return
+        keys, places, engaged = entries.keys, entries.places, entries.engaged
+        for i in range(bisect.bisect_left(keys, (earliest,)), len(keys)):
+            departure, post_id = keys[i]
+            if departure > latest:
+                return
+            if places[i] - engaged[i] >= seats:
+                yield departure, post_id, places[i], engaged[i]
+
+    def destinations(self, trip_from: str) -> list[str]:
+        return [trip_to for (origin, trip_to) in self._routes if origin == trip_from]
+
+    def _load(self, rows) -> None:
+        """Строки _posts_query, уже в порядке ключей маршрута - append вместо вставки."""
+        for row in rows:
+            route = (_value(row.trip_from), _value(row.trip_to))
+            key = (_timestamp(row.departure_datetime), row.post_id)
+            entries = self._routes.setdefault(route, _Route())
+            entries.keys.append(key)
+            entries.places.append(row.count_of_places)
+            entries.engaged.append(row.already_engaged)
+            self._where[row.post_id] = (route, key)
+
+    async def rebuild(self) -> int:
+        """
+        Собирает индекс заново из активных будущих поездок и подменяет текущий.
+        События, пришедшие во время чтения, накатываются поверх снимка.
+        Возвращает число поездок в индексе.
+        """
+        self._pending = []
+        try:
+            async with AsyncSessionFactory() as session:
+                rows = (await session.execute(_posts_query(datetime.now(timezone.utc)))).all()
+            fresh = RouteIndex()
+            fresh._load(rows)
+            for payload in self._pending:
+                fresh._apply(payload)
+        finally:
+            self._pending = None
+        self._routes, self._where = fresh._routes, fresh._where
+        self.built_at = time.time()
+        self.rebuilds += 1
+        return len(self._where)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "routes": len(self._routes),
+            "posts": len(self._where),
+            "events": self.events,
+            "rebuilds": self.rebuilds,
+            "age_seconds": time.time() - self.built_at if self.built_at is not None else None,
+        }
+
+
+def _posts_query(departure_from: datetime, departure_to: Optional[datetime] = None):
+    stmt = select(
+        models.Post.post_id, models.Post.trip_from, models.Post.trip_to, models.Post.departure_datetime,
+        models.Post.count_of_places, models.Post.already_engaged,
+    ).where(
+        models.Post.status == PostStatus.ACTIVE,
+        models.Post.departure_datetime >= departure_from,
+    ).order_by(models.Post.trip_from, models.Post.trip_to, models.Post.departure_datetime, models.Post.post_id)
+    if departure_to is not None:
+        stmt = stmt.where(models.Post.departure_datetime <= departure_to)
+    return stmt
+
+
+async def load_window(db: AsyncSession, departure_from: datetime, departure_to: datetime) -> RouteIndex:
+    """
+    Временный индекс активных поездок с отправлением в окне - для запросов, пока
+    общий индекс не собран (planner.py). Без подписки на события.
+    """
+    index = RouteIndex()
+    index._load((await db.execute(_posts_query(departure_from, departure_to))).all())
+    index.built_at = time.time()
+    return index
+
+
+route_index = RouteIndex()
+
+_refresh_task: Optional[asyncio.Task] = None
+_rebuild_requested = asyncio.Event()
+_listening = False
+
+
+def request_rebuild() -> None:
+    """on_resync для realtime.hub: пересборка в фоновой задаче, не в callback LISTEN."""
+    _rebuild_requested.set()
+
+
+async def _refresh_loop() -> None:
+    while True:
+        try:
+            await asyncio.wait_for(_rebuild_requested.wait(), timeout=config.ROUTE_INDEX_REFRESH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        _rebuild_requested.clear()
+        try:
+            count = await route_index.rebuild()
+            logger.debug("Route index rebuilt: %s posts", count)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Route index rebuild failed: %s", e)
+
+
+async def start() -> None:
+    """
+    Подписка на события и фоновая сборка (вызывается из lifespan). Первая сборка
+    тоже в фоне - старт воркера ее не ждет, до нее GET /match отвечает из БД.
+    """
+    global _refresh_task, _listening
+    if not config.ROUTE_INDEX_ENABLED or _refresh_task is not None:
+        return
+    if not _listening:
+        # Раньше realtime.start_listener в lifespan: он проверяет, есть ли потребители событий
+        realtime.hub.add_listener(route_index.apply, request_rebuild)
+        _listening = True
+    request_rebuild()
+    _refresh_task = asyncio.create_task(_refresh_loop(), name="route-index-refresh")
+
+
+async def stop() -> None:
+    global _refresh_task
+    if _refresh_task is None:
+        return
+    _refresh_task.cancel()
+    try:
+        await _refresh_task
+    except asyncio.CancelledError:
+        pass
+    _refresh_task = None
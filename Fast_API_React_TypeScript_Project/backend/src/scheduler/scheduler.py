@@ -0,0 +1,177 @@
+# scheduler.py
+# Фоновые задачи приложения (APScheduler). Запускается из main.app_lifespan.
+# Каждый uvicorn-воркер поднимает свой планировщик, но сами задачи берут
+# advisory lock в Postgres - одновременно задачу выполняет только один воркер.
+import asyncio
+import logging
+from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from sqlalchemy import select, update, text
+
+import config
+import models
+from database import engine, AsyncSessionFactory
+from enums import PostStatus
+from auth import denylist
+import rate_limit
+import idempotency
+
+logger = logging.getLogger("app.scheduler")
+
+# Ключи pg_advisory_lock (произвольные, но уникальные для каждой задачи)
+ARCHIVE_POSTS_LOCK_KEY = 7_310_001
+DENYLIST_CLEANUP_LOCK_KEY = 7_310_002
+RATE_LIMIT_CLEANUP_LOCK_KEY = 7_310_003
+IDEMPOTENCY_CLEANUP_LOCK_KEY = 7_310_004
+
+job_scheduler = AsyncIOScheduler(timezone=timezone.utc)
+
+
+@asynccontextmanager
+async def advisory_lock(lock_key: int):
+    """
+    Пытается взять сессионный pg_try_advisory_lock на отдельном соединении.
+    Отдает True, если блокировка получена (или БД не Postgres - тогда
+    воркер считается единственным), иначе False.
+    """
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    async with engine.connect() as lock_conn:
+        acquired = (await lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": lock_key}
+        )).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                await lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": lock_key})
+
+
+async def archive_expired_posts_batch(batch_size: int) -> list[int]:
+    """
+    Переводит в ARCHIVED одну пачку активных постов с прошедшей датой отправления.
+    Один оператор: UPDATE posts ... WHERE post_id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED).
+    Возвращает post_id заархивированных постов.
+    """
+    now_utc = datetime.now(timezone.utc)
+    expired_ids = (
+        select(models.Post.post_id)
+        .where(
+            models.Post.status == PostStatus.ACTIVE,
+            models.Post.departure_datetime < now_utc,
+        )
+        .order_by(models.Post.departure_datetime)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(models.Post)
+        .where(models.Post.post_id.in_(expired_ids))
+        .values(status=PostStatus.ARCHIVED)
+        .returning(models.Post.post_id)
+        .execution_options(synchronize_session=False)
+    )
+    async with AsyncSessionFactory() as session:
+        result = await session.execute(stmt)
+        archived_ids = list(result.scalars().all())
+        await session.commit()
+    return archived_ids
+
+
+async def archive_expired_posts() -> int:
+    """
+    Задача планировщика: архивирует все просроченные посты пачками по
+    ARCHIVE_BATCH_SIZE с паузой ARCHIVE_BATCH_SLEEP_SECONDS между ними.
+    Возвращает число заархивированных постов.
+    """
+    async with advisory_lock(ARCHIVE_POSTS_LOCK_KEY) as acquired:
+        if not acquired:
+            return 0 # Задачу уже выполняет другой воркер
+        total = 0
+        while True:
+            archived_ids = await archive_expired_posts_batch(config.ARCHIVE_BATCH_SIZE)
+            total += len(archived_ids)
+            if len(archived_ids) < config.ARCHIVE_BATCH_SIZE:
+                break
+            await asyncio.sleep(config.ARCHIVE_BATCH_SLEEP_SECONDS)
+    if total:
+        logger.info("Scheduler: archived %s expired posts.", total)
+    return total
+
+
+async def cleanup_denylist() -> int:
+    """Задача планировщика: удаляет из denylisted_tokens записи истекших токенов."""
+    async with advisory_lock(DENYLIST_CLEANUP_LOCK_KEY) as acquired:
+        if not acquired:
+            return 0
+        return await denylist.cleanup_expired_denylist_tokens()
+
+
+async def cleanup_rate_limits() -> int:
+    """Задача планировщика: удаляет из rate_limits ключи, лимит которых уже восстановился."""
+    async with advisory_lock(RATE_LIMIT_CLEANUP_LOCK_KEY) as acquired:
+        if not acquired:
+            return 0
+        return await rate_limit.cleanup_expired()
+
+
+async def cleanup_idempotency_keys() -> int:
+    """Задача планировщика: удаляет из idempotency_keys истекшие ответы и блокировки."""
+    async with advisory_lock(IDEMPOTENCY_CLEANUP_LOCK_KEY) as acquired:
+        if not acquired:
+            return 0
+        return await idempotency.cleanup_expired()
+
+
+def start() -> None:
+    """Регистрирует задачи и запускает планировщик (вызывается из lifespan)."""
+    if not config.SCHEDULER_ENABLED or job_scheduler.running:
+        return
+    job_scheduler.add_job(
+        archive_expired_posts,
+        "interval",
+        seconds=config.ARCHIVE_INTERVAL_SECONDS,
+        id="archive_expired_posts",
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now(timezone.utc),
+        replace_existing=True,
+    )
+    job_scheduler.add_job(
+        cleanup_denylist,
+        "interval",
+        seconds=config.DENYLIST_CLEANUP_INTERVAL_SECONDS,
+        id="cleanup_denylist",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    if config.RATE_LIMIT_BACKEND == "postgres":
+        job_scheduler.add_job(
+            cleanup_rate_limits,
+            "interval",
+            seconds=config.RATE_LIMIT_CLEANUP_INTERVAL_SECONDS,
+            id="cleanup_rate_limits",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True,
+        )
+    job_scheduler.add_job(
+        cleanup_idempotency_keys,
+        "interval",
+        seconds=config.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS,
+        id="cleanup_idempotency_keys",
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True,
+    )
+    job_scheduler.start()
+
+
+def shutdown() -> None:
+    if job_scheduler.running:
+        job_scheduler.shutdown(wait=False)
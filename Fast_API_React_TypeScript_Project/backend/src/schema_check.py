@@ -0,0 +1,120 @@
+# schema_check.py
+# Проверка схемы БД при старте воркера вместо metadata.create_all.
+# Head-ревизия берется разбором файлов alembic/versions (без импорта alembic -
+# он заметно удлиняет старт), текущая - одним запросом к alembic_version.
+# Ревизия с post_deploy = True (contract-шаг expand/contract-миграции) применяется
+# после выкатки кода: если до head не хватает только таких ревизий, схема совместима
+# с кодом - воркер стартует и в strict, а в лог пишется, что осталось применить.
+import logging
+import os
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+logger = logging.getLogger("app.schema")
+
+ALEMBIC_VERSIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions"
+)
+
+_revision_re = re.compile(r"^revision\s*(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+_down_revision_re = re.compile(r"^down_revision\s*(?::[^=]*)?=\s*(.+)$", re.MULTILINE)
+_quoted_re = re.compile(r"['\"](\w+)['\"]")
+_post_deploy_re = re.compile(r"^post_deploy\s*(?::[^=]*)?=\s*True\b", re.MULTILINE)
+
+
+class SchemaMismatchError(RuntimeError):
+    """База не на head-ревизии Alembic (SCHEMA_CHECK_MODE=strict)."""
+
+
+def revision_graph(versions_dir: str = ALEMBIC_VERSIONS_DIR) -> dict[str, tuple[set[str], bool]]:
+    """Ревизия -> (ее down_revision, post_deploy) по файлам versions_dir."""
+    graph = {}
+    for filename in os.listdir(versions_dir):
+        if not filename.endswith(".py"):
+            continue
+        with open(os.path.join(versions_dir, filename), encoding="utf-8") as f:
+            source = f.read()
+        revision = _revision_re.search(source)
+        if revision is None:
+            continue
+        down_revision = _down_revision_re.search(source)
+        parents = set(_quoted_re.findall(down_revision.group(1))) if down_revision is not None else set()
+        graph[revision.group(1)] = (parents, _post_deploy_re.search(source) is not None)
+    return graph
+
+
+def alembic_heads(versions_dir: str = ALEMBIC_VERSIONS_DIR) -> set[str]:
+    """Ревизии, на которые не ссылается ни один down_revision (учитывает merge-ревизии)."""
+    return _heads(revision_graph(versions_dir))
+
+
+def _heads(graph: dict[str, tuple[set[str], bool]]) -> set[str]:
+    return set(graph) - {parent for parents, _ in graph.values() for parent in parents}
+
+
+def _with_ancestors(graph: dict[str, tuple[set[str], bool]], revisions: set[str]) -> set[str]:
+    seen, stack = set(), list(revisions)
+    while stack:
+        revision = stack.pop()
+        if revision in seen:
+            continue
+        seen.add(revision)
+        stack.extend(graph.get(revision, (set(), False))[0])
+    return seen
+
+
+def pending_revisions(current: set[str], graph: dict[str, tuple[set[str], bool]]) -> set[str]:
+    """Ревизии до head, которых нет в базе с ревизиями current."""
+    return _with_ancestors(graph, _heads(graph)) - _with_ancestors(graph, current)
+
+
+async def current_revisions(engine) -> Optional[set[str]]:
+    """Ревизии из alembic_version; None, если таблицы нет (миграции не применялись)."""
+    try:
+        async with engine.connect() as conn:
+            rows = await conn.execute(text("SELECT version_num FROM alembic_version"))
+            return {row[0] for row in rows}
+    except (ProgrammingError, OperationalError) as e:
+        if e.connection_invalidated:
+            raise
+        return None
+
+
+async def verify_schema(engine, mode: str, versions_dir: str = ALEMBIC_VERSIONS_DIR) -> Optional[bool]:
+    """
+    Сравнивает ревизию БД с head. mode: "off" - пропустить, "warn" - предупредить,
+    "strict" - SchemaMismatchError. Возвращает True/False (совместима ли) или None при "off".
+    Совместима - на head или до head не хватает только ревизий post_deploy.
+    """
+    if mode == "off":
+        return None
+    graph = revision_graph(versions_dir)
+    expected = _heads(graph)
+    current = await current_revisions(engine)
+    if current == expected:
+        logger.info("Database schema at alembic head %s", ", ".join(sorted(expected)))
+        return True
+    pending = None
+    if current is not None and current <= set(graph):
+        pending = pending_revisions(current, graph)
+        if pending and all(graph[revision][1] for revision in pending):
+            # Идет выкатка expand/contract: код уже работает со схемой, contract - после нее
+            logger.warning(
+                "Database schema at %s; post-deploy migrations %s are pending. "
+                "Run 'alembic upgrade head' once all workers run this code.",
+                ", ".join(sorted(current)), ", ".join(sorted(pending)),
+            )
+            return True
+    message = (
+        f"Database schema revision {sorted(current) if current is not None else 'missing (no alembic_version)'} "
+        f"!= alembic head {sorted(expected)}"
+        + (f", pending {sorted(pending)}" if pending else "")
+        + ". Run 'alembic upgrade head' (or DB_AUTO_CREATE=true for local dev)."
+    )
+    if mode == "strict":
+        raise SchemaMismatchError(message)
+    logger.warning(message)
+    return False
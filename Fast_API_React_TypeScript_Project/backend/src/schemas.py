@@ -4,7 +4,10 @@ from typing import Optional, List, Any
 from enums import CountriesCapitals, UserRole, PostStatus
 from exceptrions import wrong_trip_place
 from datetime import datetime, timezone
+import logging
 import pytz
+
+logger = logging.getLogger("app.schemas")
 # --- Pydantic Schemas ---
 BERLIN_TZ = pytz.timezone('Europe/Berlin')
 # --- Posts Schemas ---
@@ -32,19 +35,13 @@ class PostCreate(BaseModel):
         
         # Сделаем текущее время timezone-aware (UTC) для корректного сравнения
         now_utc = datetime.now(timezone.utc)
-        print(f"--- DEBUG VALIDATOR ---")
-        print(f"Input 'value': {value} (tzinfo: {value.tzinfo})")
-        print(f"Current 'now_utc': {now_utc} (tzinfo: {now_utc.tzinfo})")
         # Если полученное значение не имеет информации о часовом поясе (naive)
         is_naive = value.tzinfo is None or value.tzinfo.utcoffset(value) is None
-        print(f"Is 'value' naive? {is_naive}")
         if is_naive:
             if value.tzinfo is None or value.tzinfo.utcoffset(value) is None:
                 # value = value.replace(tzinfo=timezone.utc) # Assume UTC if naive
                 raise ValueError("departure_datetime MUST be timezone-aware after attempting to set UTC.")
-        comparison_result = value < now_utc
-        print(f"Comparison 'value < now_utc': {comparison_result}")
-        print(f"--- END DEBUG VALIDATOR ---")
+        logger.debug("departure_datetime=%s now_utc=%s naive=%s", value, now_utc, is_naive)
         if value < now_utc:
             error_msg = (
                 f"Дата и время отправления ({value}) не могут быть в прошлом. "
@@ -87,6 +84,7 @@ class PostCreate(BaseModel):
                 # FastAPI хорошо обрабатывает ValueError из валидаторов Pydantic.
         return values # Важно вернуть объект values (или его измененную версию)
 class PostGetAllMemberUserSchema(BaseModel):
+    user_id: int
     member_user: str # Имя пользователя
     model_config = ConfigDict(from_attributes=True) # Для Pydantic V2
 class Post(BaseModel):
@@ -109,9 +107,41 @@ class PostMemberUserSchema(BaseModel):
 
 class PostGetAll(Post):
     
+    owner_id: int
     post_owner_user: str
     posts_members_posts: List[PostGetAllMemberUserSchema] = []
     model_config = ConfigDict(from_attributes=True)
+class PostExport(BaseModel):
+    # Строка NDJSON-выгрузки GET /posts/export: пост и имена участников
+    post_id: int
+    owner_id: int
+    post_owner_user: str
+    trip_from: CountriesCapitals
+    trip_to: CountriesCapitals
+    departure_datetime: datetime
+    count_of_places: int
+    already_engaged: int
+    status: PostStatus
+    created_at: datetime
+    updated_at: datetime
+    members: List[str] = []
+class RideMatch(BaseModel):
+    # Поездка в ответе GET /match (индекс маршрутов route_index.py или posts.match_posts)
+    post_id: int
+    trip_from: CountriesCapitals
+    trip_to: CountriesCapitals
+    departure_datetime: datetime
+    count_of_places: int
+    already_engaged: int
+    free_places: int
+class PlanLeg(RideMatch):
+    # Отрезок поездки с пересадками (GET /plan); прибытие - по времени в пути маршрута (planner.LEG_HOURS)
+    arrival_datetime: datetime
+class Itinerary(BaseModel):
+    departure_datetime: datetime
+    arrival_datetime: datetime
+    transfers: int
+    legs: List[PlanLeg]
 class PostMemberCreate(BaseModel):
     # post_id_fk и member_user_fk будут предоставлены в эндпоинте
     pass # Пустая, так как ключи будут параметрами пути/тела запроса
@@ -155,6 +185,49 @@ class UserPublic(UserBase):
 class Message(BaseModel):
     message: str
     
+class BulkRowError(BaseModel):
+    index: int # Номер строки во входном списке
+    detail: Any
+
+class BulkUsersResult(BaseModel):
+    created: List[UserPublic] = []
+    errors: List[BulkRowError] = []
+
+class BulkPostsResult(BaseModel):
+    created: List[Post] = []
+    errors: List[BulkRowError] = []
+
+class BulkItemsResult(BaseModel):
+    created: List[Item] = []
+    errors: List[BulkRowError] = []
+
+class PrincipalCacheStats(BaseModel):
+    size: int
+    max_size: int
+    ttl_seconds: float
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+class PasswordHasherStats(BaseModel):
+    executor: str
+    workers: int
+    max_concurrency: int
+    queue_depth: int
+    max_queue_depth: int
+    in_flight: int
+    completed: int
+    avg_wait_ms: float
+    avg_run_ms: float
+
+class ReplicaStats(BaseModel):
+    configured: bool
+    healthy: bool
+    lag_seconds: Optional[float]
+    replica_reads: int
+    primary_reads: int
+
 class SelectOption(BaseModel):
     value: str  # Значение, которое будет отправляться на сервер
     label: str  # Текст, который будет видеть пользователь
\ No newline at end of file
@@ -0,0 +1,45 @@
+# serializers.py
+# Быстрый путь сериализации для списочных эндпоинтов.
+# Обычно FastAPI для response_model валидирует ORM-объекты в Pydantic-модели,
+# сериализует их в dict/list и затем json.dumps в JSONResponse.
+# Здесь TypeAdapter строится один раз при импорте, а ответ собирается за один
+# проход pydantic-core: validate_python(from_attributes) -> dump_json -> bytes.
+import functools
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+def fast_json_response(response_type: Any, status_code: int = 200):
+    """
+    Декоратор эндпоинта (opt-in): результат (ORM-объекты, Row, dict) сериализуется
+    готовым TypeAdapter(response_type) прямо в байты JSON.
+    response_model маршрута остается для OpenAPI, но FastAPI его не применяет -
+    эндпоинт возвращает готовый Response.
+    Заголовки, выставленные на внедренном параметре `response: Response`
+    (X-Next-Cursor, ETag), переносятся в итоговый ответ.
+    Если эндпоинт сам вернул Response (например, 304), он отдается как есть.
+    """
+    adapter = TypeAdapter(response_type)
+
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            if isinstance(result, Response):
+                return result
+            body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+            response = Response(content=body, status_code=status_code, media_type="application/json")
+            for value in kwargs.values():
+                if isinstance(value, Response):
+                    for name, header_value in value.headers.raw:
+                        if name not in (b"content-length", b"content-type"):
+                            response.headers.raw.append((name, header_value))
+                    if value.status_code is not None:
+                        response.status_code = value.status_code
+                    break
+            return response
+        return wrapper
+
+    return decorator
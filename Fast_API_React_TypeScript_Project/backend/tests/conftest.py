@@ -0,0 +1,110 @@
+# conftest.py
+# Общие фикстуры тестов.
+#     cd backend && pip install -r src/requirements-dev.txt && python -m pytest
+# База - TEST_DATABASE_URL (например, postgresql+asyncpg://.../airbus_test - только
+# отдельная база, таблицы удаляются) или временный SQLite-файл. Перед каждым тестом
+# схема создается заново, приложение поднимается через main.app_lifespan.
+import os
+import tempfile
+
+# Модули приложения читают окружение при импорте - задаем его до импорта
+_TMP_DIR = tempfile.mkdtemp(prefix="airbus-tests-")
+os.environ["DATABASE_URL"] = os.environ.get("TEST_DATABASE_URL") or f"sqlite+aiosqlite:///{_TMP_DIR}/test.sqlite"
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.update({
+    "DB_AUTO_CREATE": "true",
+    "DB_POOL_WARMUP_CONNECTIONS": "0",
+    "RATE_LIMIT_ENABLED": "false",
+    "SCHEDULER_ENABLED": "false",
+    "ROUTE_INDEX_ENABLED": "false", # без фоновой пересборки: ее SQL не мешает подсчетам
+    "SQL_LOG_MODE": "off",
+    "LOG_LEVEL": "WARNING",
+})
+
+import httpx # noqa: E402
+import pytest # noqa: E402
+from sqlalchemy import insert # noqa: E402
+
+import config # noqa: E402
+import database # noqa: E402
+import idempotency # noqa: E402
+import main # noqa: E402
+import models # noqa: E402
+from auth import auth # noqa: E402
+from auth.hashing import hash_password_sync # noqa: E402
+from auth.principal_cache import principal_cache # noqa: E402
+from auth.token_cache import token_cache # noqa: E402
+from enums import UserRole # noqa: E402
+from statement_budget import StatementRecorder, StatementRecorderMiddleware # noqa: E402
+
+PASSWORD = "Secret123!"
+_PASSWORD_HASH = hash_password_sync(PASSWORD) # один bcrypt на сессию, а не на пользователя
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def app():
+    """main.app на пустой схеме с запущенным lifespan."""
+    async with database.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.drop_all)
+    # Кэши в памяти воркера пережили бы пересоздание таблиц (id пользователей повторяются)
+    principal_cache.clear()
+    token_cache.clear()
+    idempotency.store = idempotency.IdempotencyStore(cache_size=config.IDEMPOTENCY_CACHE_SIZE)
+    async with main.app_lifespan(main.app):
+        yield main.app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as c:
+        yield c
+
+
+@pytest.fixture
+def create_users(app):
+    """create_users(names, role) -> [users.id]: пользователи одним INSERT, пароль PASSWORD."""
+
+    async def _create(names: list[str], role: UserRole = UserRole.USER) -> list[int]:
+        async with database.engine.begin() as conn:
+            result = await conn.execute(
+                insert(models.User).returning(models.User.id),
+                [{"user": name, "email": f"{name}@example.com", "password": _PASSWORD_HASH, "role": role} for name in names],
+            )
+            return list(result.scalars())
+
+    return _create
+
+
+@pytest.fixture
+def auth_cookies():
+    """auth_cookies(username) -> cookie как после POST /login, без bcrypt."""
+
+    def _cookies(username: str) -> dict:
+        return {auth.ACCESS_TOKEN_COOKIE_NAME: auth.create_access_token(data={"sub": username})}
+
+    return _cookies
+
+
+@pytest.fixture
+def sql_budget(request, app):
+    """
+    Записывает SQL каждого HTTP-запроса теста к main.app; в конце теста падает,
+    если какой-то эндпоинт превысил STATEMENT_BUDGETS или выполнил N+1, и печатает отчет.
+    Маркер @pytest.mark.sql_budget_skip отключает проверку для теста.
+    """
+    recorder = StatementRecorder(database.engine).start()
+    original_stack = app.middleware_stack
+    app.middleware_stack = StatementRecorderMiddleware(app.build_middleware_stack(), recorder)
+    try:
+        yield recorder
+    finally:
+        app.middleware_stack = original_stack
+        recorder.stop()
+    problems = recorder.problems()
+    if problems and request.node.get_closest_marker("sql_budget_skip") is None:
+        pytest.fail("SQL statement budget exceeded:\n" + "\n".join(problems) + "\n\n" + recorder.report(), pytrace=False)
@@ -0,0 +1,170 @@
+# statement_budget.py
+# Бюджет SQL-запросов на HTTP-запрос и поиск N+1.
+# Каскады selectin в models.py и последовательные обращения к БД в обработчиках
+# легко незаметно удваивают число запросов. Здесь:
+# - STATEMENT_BUDGETS: сколько запросов разрешено эндпоинту (с учетом промаха
+#   кэша пользователя в auth.get_current_user);
+# - StatementRecorder: записывает SQL движка, разбивая по HTTP-запросам;
+# - find_n_plus_one: одинаковые по форме запросы, повторенные N раз за запрос;
+# - фикстура sql_budget в conftest.py: тест падает при превышении бюджета или N+1
+#   и печатает отчет по запросам.
+# Только для тестов, в приложение не подключается.
+import re
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import event
+
+# (method, шаблон маршрута) -> максимум SQL-запросов
+STATEMENT_BUDGETS: dict[tuple[str, str], int] = {
+    ("POST", "/login"): 1,
+    ("POST", "/logout"): 3,
+    ("POST", "/register"): 2,
+    ("GET", "/users/me"): 1,
+    ("GET", "/protected"): 1,
+    ("POST", "/posts"): 2,
+    ("GET", "/posts"): 2,
+    ("GET", "/posts/search"): 2,
+    ("GET", "/{post_id}/post"): 3,
+    ("GET", "/{post_id}/posts"): 3,
+    ("POST", "/{post_id}/members"): 6,
+    ("DELETE", "/{post_id}/post"): 5,
+    ("POST", "/users/"): 3,
+    ("GET", "/users/"): 4,
+    ("GET", "/users/{user_id}"): 5,
+    ("POST", "/users/{user_id}"): 3,
+    ("PUT", "/users/{user_id}"): 5,
+    ("DELETE", "/users/{user_id}"): 8,
+    ("GET", "/capitals-for-select"): 0,
+    ("GET", "/permissions-for-select"): 0,
+    ("GET", "/post_status_for_select"): 0,
+}
+
+# Сколько одинаковых по форме запросов за один HTTP-запрос считается N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholder = r"(?:\?|\$\?|%\(\w+\)s|:\w+)"
+_in_list_re = re.compile(rf"\(\s*{_placeholder}(?:\s*,\s*{_placeholder})*\s*\)")
+_space_re = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: без литералов, списки IN (...) свернуты, пробелы нормализованы."""
+    shape = _literal_re.sub("?", statement)
+    shape = _in_list_re.sub("(...)", shape)
+    return _space_re.sub(" ", shape).strip()
+
+
+def find_n_plus_one(statements: list[str], threshold: int = N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+    """Формы запросов, повторенные не меньше threshold раз (SELECT по одной строке в цикле)."""
+    counts = Counter(statement_shape(s) for s in statements)
+    return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+
+@dataclass
+class RequestRecord:
+    method: str
+    route: str
+    status: Optional[int] = None
+    statements: list[str] = field(default_factory=list)
+
+    @property
+    def budget(self) -> Optional[int]:
+        return STATEMENT_BUDGETS.get((self.method, self.route))
+
+    def problems(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[str]:
+        found = []
+        if self.budget is not None and len(self.statements) > self.budget:
+            found.append(f"{self.method} {self.route}: {len(self.statements)} statements, budget {self.budget}")
+        for shape, n in find_n_plus_one(self.statements, threshold):
+            found.append(f"{self.method} {self.route}: possible N+1, {n}x {shape[:200]}")
+        return found
+
+
+_current_record: ContextVar[Optional[RequestRecord]] = ContextVar("statement_budget_record", default=None)
+
+
+class StatementRecorder:
+    """
+    Пишет SQL движка с разбивкой по HTTP-запросам. Подключение:
+        recorder = StatementRecorder(database.engine)
+        app.add_middleware(StatementRecorderMiddleware, recorder=recorder)
+    Запросы вне HTTP (фоновые задачи, подготовка данных в тесте) попадают в recorder.outside.
+    """
+
+    def __init__(self, engine):
+        self.sync_engine = getattr(engine, "sync_engine", engine)
+        self.requests: list[RequestRecord] = []
+        self.outside: list[str] = []
+        self._listening = False
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        record = _current_record.get()
+        (record.statements if record is not None else self.outside).append(statement)
+
+    def start(self) -> "StatementRecorder":
+        if not self._listening:
+            event.listen(self.sync_engine, "before_cursor_execute", self._on_execute)
+            self._listening = True
+        return self
+
+    def stop(self) -> None:
+        if self._listening:
+            event.remove(self.sync_engine, "before_cursor_execute", self._on_execute)
+            self._listening = False
+
+    def reset(self) -> None:
+        self.requests.clear()
+        self.outside.clear()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def problems(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> list[str]:
+        return [p for record in self.requests for p in record.problems(threshold)]
+
+    def report(self) -> str:
+        """Отчет: по строке на HTTP-запрос и сами SQL-запросы, первая строка каждого."""
+        lines = []
+        for record in self.requests:
+            budget = "-" if record.budget is None else record.budget
+            lines.append(f"{record.method:6} {record.route:28} {record.status} statements={len(record.statements)} budget={budget}")
+            for statement in record.statements:
+                lines.append(f"    {statement_shape(statement)[:120]}")
+        return "\n".join(lines)
+
+
+class StatementRecorderMiddleware:
+    """ASGI middleware: открывает RequestRecord на время HTTP-запроса."""
+
+    def __init__(self, app, recorder: StatementRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        record = RequestRecord(method=scope["method"], route=scope["path"])
+        token = _current_record.set(record)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                record.status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_record.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                record.route = route.path
+            self.recorder.requests.append(record)
+
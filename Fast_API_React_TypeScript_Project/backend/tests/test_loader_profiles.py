@@ -0,0 +1,75 @@
+# test_loader_profiles.py
+# Число SQL-запросов эндпоинтов с профилями загрузки (loaders.py) вместо глобального
+# lazy="selectin". BEFORE - замеры на дереве до профилей (каждый get_current_user тянул
+# весь граф пользователя), AFTER - сколько запросов эндпоинт делает сейчас; тест
+# сверяет AFTER точно, чтобы и рост, и незамеченное улучшение было видно в diff.
+# Кэш пользователей перед каждым запросом очищается - считается и поиск пользователя.
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+import crud
+import database
+from auth.principal_cache import principal_cache
+
+pytestmark = pytest.mark.anyio
+
+# (method, маршрут) -> (до профилей, сейчас)
+STATEMENTS = {
+    ("POST", "/login"): (4, 1),
+    ("GET", "/users/me"): (4, 1),
+    ("GET", "/protected"): (5, 1),
+    ("POST", "/posts"): (8, 2),
+    ("GET", "/posts"): (5, 2),
+    ("GET", "/{post_id}/post"): (5, 3),
+    ("GET", "/{post_id}/posts"): (10, 3),
+    ("POST", "/{post_id}/members"): (22, 5),
+    ("GET", "/users/{user_id}"): (10, 5),
+    ("PUT", "/users/{user_id}"): (11, 5),
+}
+
+
+async def test_statements_per_endpoint(client, create_users, auth_cookies, sql_budget):
+    owner_id, _ = await create_users(["owner", "rider"])
+    departure = (datetime.now(timezone.utc) + timedelta(hours=5)).isoformat()
+
+    async def call(method: str, url: str, user: str = "owner", **kwargs):
+        principal_cache.clear()
+        client.cookies = auth_cookies(user)
+        response = await client.request(method, url, **kwargs)
+        assert response.status_code < 400, response.text
+        return response
+
+    await call("POST", "/login", data={"username": "owner", "password": "Secret123!"})
+    await call("GET", "/users/me")
+    await call("GET", "/protected")
+    post_id = (await call("POST", "/posts", json={
+        "trip_from": "london", "trip_to": "kyiv", "departure_datetime": departure, "count_of_places": 3,
+    })).json()["post_id"]
+    await call("POST", f"/{post_id}/members", user="rider")
+    await call("GET", "/posts")
+    await call("GET", f"/{post_id}/post")
+    await call("GET", f"/{post_id}/posts")
+    await call("GET", f"/users/{owner_id}")
+    await call("PUT", f"/users/{owner_id}", json={"user": "owner", "email": "owner2@example.com", "role": "user"})
+
+    measured = {(record.method, record.route): len(record.statements) for record in sql_budget.requests}
+    report = "\n".join(
+        f"{method:6} {route:20} before={before:3} after={after:3} now={measured.get((method, route))}"
+        for (method, route), (before, after) in STATEMENTS.items()
+    )
+    print(report)
+    assert measured == {key: after for key, (_, after) in STATEMENTS.items()}, report
+
+
+async def test_principal_lookup_loads_no_relationships(app, create_users):
+    await create_users(["eve"])
+    async with database.AsyncSessionFactory() as session:
+        user = await crud.get_user_by_username(session, "eve")
+    # Профиль AUTH_PRINCIPAL: только колонки users; связи не загружены, а lazy="raise"
+    # не дает случайно догрузить их отдельным запросом
+    assert user.user == "eve"
+    for relationship in ("items", "owned_posts", "posts_members"):
+        with pytest.raises(InvalidRequestError):
+            getattr(user, relationship)
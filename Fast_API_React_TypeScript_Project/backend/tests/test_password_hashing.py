@@ -0,0 +1,24 @@
+# test_password_hashing.py
+# PasswordHasherPool (auth/hashing.py) - объект модуля и переживает event loop:
+# ограничение параллельности должно работать в каждом новом loop.
+import asyncio
+import time
+
+from auth.hashing import PasswordHasherPool
+
+
+def test_pool_works_across_event_loops():
+    pool = PasswordHasherPool(executor_kind="thread", workers=1, max_concurrency=1)
+
+    async def burst() -> int:
+        # Три задачи на один слот: две ждут семафор, то есть привязывают его к loop
+        await asyncio.gather(*(pool._run(time.sleep, 0.01) for _ in range(3)))
+        return pool.max_queue_depth
+
+    try:
+        for _ in range(2): # второй asyncio.run - новый loop, как у следующего теста или lifespan
+            assert asyncio.run(burst()) >= 2
+    finally:
+        pool.shutdown()
+    assert pool.completed == 6
+    assert pool.queue_depth == pool.in_flight == 0
@@ -0,0 +1,120 @@
+# test_posts_export.py
+# GET /posts/export отдает таблицу потоком: пик памяти (tracemalloc) при выгрузке
+# в 10 раз большей таблицы почти не растет. Запрос идет в приложение напрямую по ASGI -
+# httpx.ASGITransport собрал бы в память все тело ответа.
+import asyncio
+import gzip
+import json
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+
+import database
+import models
+from enums import CountriesCapitals, PostStatus, UserRole
+
+pytestmark = pytest.mark.anyio
+
+SMALL, LARGE = 2_000, 20_000
+MEMBER_EVERY = 5 # у каждого пятого поста есть участник
+
+
+async def _add_posts(start: int, count: int, owner_id: int, member_id: int) -> None:
+    departure = datetime.now(timezone.utc) + timedelta(days=1)
+    async with database.engine.begin() as conn:
+        for lo in range(start, start + count, 5000):
+            ids = range(lo, min(lo + 5000, start + count))
+            await conn.execute(insert(models.Post), [{
+                "post_id": post_id, "owner_id": owner_id, "post_owner_user": "admin",
+                "trip_from": CountriesCapitals.LONDON, "trip_to": CountriesCapitals.KYIV,
+                "departure_datetime": departure + timedelta(minutes=post_id),
+                "count_of_places": 3, "already_engaged": int(post_id % MEMBER_EVERY == 0),
+                "status": PostStatus.ACTIVE,
+            } for post_id in ids])
+            await conn.execute(insert(models.PostMember), [
+                {"post_id": post_id, "user_id": member_id, "member_user": "rider"}
+                for post_id in ids if post_id % MEMBER_EVERY == 0
+            ])
+
+
+async def _export(app, cookies: dict, gzip_body: bool = False) -> tuple[int, bytes, int]:
+    """(пик памяти за запрос, последний кусок тела, размер тела) - тело не копится."""
+    headers = [(b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode())]
+    if gzip_body:
+        headers.append((b"accept-encoding", b"gzip"))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "server": ("test", 80), "client": ("127.0.0.1", 1234), "root_path": "",
+        "path": "/posts/export", "raw_path": b"/posts/export", "query_string": b"", "headers": headers,
+    }
+    sent = {"status": None, "size": 0, "body": bytearray()}
+    requested, finished = False, asyncio.Event()
+
+    async def receive():
+        # Сначала тело запроса, потом disconnect - после конца ответа, как у сервера
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            if not message.get("more_body", False):
+                finished.set()
+            sent["size"] += len(message.get("body", b""))
+            if gzip_body:
+                sent["body"] += message.get("body", b"") # сжатое тело маленькое - для проверки
+            else:
+                sent["body"] = bytearray(message.get("body", b"")) or sent["body"]
+
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    await app(scope, receive, send)
+    peak = tracemalloc.get_traced_memory()[1] - before
+    assert sent["status"] == 200
+    return peak, bytes(sent["body"]), sent["size"]
+
+
+async def test_export_memory_is_flat(app, create_users, auth_cookies):
+    (owner_id,) = await create_users(["admin"], role=UserRole.ADMIN)
+    (member_id,) = await create_users(["rider"])
+    cookies = auth_cookies("admin")
+    await _add_posts(1, SMALL, owner_id, member_id)
+
+    tracemalloc.start()
+    try:
+        await _export(app, cookies) # прогрев: кэши компиляции SQL, сериализаторов
+        small_peak, _, small_size = await _export(app, cookies)
+        await _add_posts(SMALL + 1, LARGE - SMALL, owner_id, member_id)
+        large_peak, last_chunk, large_size = await _export(app, cookies)
+    finally:
+        tracemalloc.stop()
+
+    print(f"export peak: {SMALL} posts {small_peak / 1e6:.2f} MB ({small_size / 1e6:.1f} MB body), "
+          f"{LARGE} posts {large_peak / 1e6:.2f} MB ({large_size / 1e6:.1f} MB body)")
+    assert large_size > 9 * small_size
+    # Тело выросло в 10 раз, пик памяти - нет (буферизация всего ответа дала бы > large_size)
+    assert large_peak < small_peak * 1.5 + 512 * 1024
+    assert large_peak < large_size / 2
+    last = json.loads(last_chunk.splitlines()[-1])
+    assert last["post_id"] == LARGE and last["members"] == ["rider"]
+
+
+async def test_export_gzip_roundtrip(app, create_users, auth_cookies):
+    (owner_id,) = await create_users(["admin"], role=UserRole.ADMIN)
+    (member_id,) = await create_users(["rider"])
+    await _add_posts(1, 50, owner_id, member_id)
+    tracemalloc.start()
+    try:
+        _, body, _ = await _export(app, auth_cookies("admin"), gzip_body=True)
+    finally:
+        tracemalloc.stop()
+    lines = [json.loads(line) for line in gzip.decompress(body).splitlines()]
+    assert [line["post_id"] for line in lines] == list(range(1, 51))
+    assert sum(1 for line in lines if line["members"] == ["rider"]) == 50 // MEMBER_EVERY
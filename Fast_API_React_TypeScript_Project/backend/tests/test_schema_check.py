@@ -0,0 +1,75 @@
+# test_schema_check.py
+# schema_check.verify_schema: база на head, на expand-ревизии (до head не хватает
+# только post_deploy) и отставшая база.
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+import schema_check
+
+pytestmark = pytest.mark.anyio
+
+# base -> expand -> contract (post_deploy); отдельно - реальная цепочка alembic/versions
+REVISIONS = {
+    "base": ("None", False),
+    "expand": ("'base'", False),
+    "contract": ("'expand'", True),
+}
+
+
+@pytest.fixture
+def versions_dir(tmp_path):
+    for revision, (down_revision, post_deploy) in REVISIONS.items():
+        source = f"revision: str = '{revision}'\ndown_revision: Union[str, None] = {down_revision}\n"
+        if post_deploy:
+            source += "post_deploy: bool = True\n"
+        (tmp_path / f"{revision}.py").write_text(source, encoding="utf-8")
+    return str(tmp_path)
+
+
+@pytest.fixture
+async def engine_at(tmp_path):
+    engines = []
+
+    async def _engine(revision):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/schema-{len(engines)}.sqlite")
+        engines.append(engine)
+        if revision is not None:
+            async with engine.begin() as conn:
+                await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+                await conn.execute(text("INSERT INTO alembic_version VALUES (:revision)"), {"revision": revision})
+        return engine
+
+    yield _engine
+    for engine in engines:
+        await engine.dispose()
+
+
+async def test_only_post_deploy_revisions_pending_is_compatible(versions_dir, engine_at):
+    assert await schema_check.verify_schema(await engine_at("contract"), "strict", versions_dir) is True
+    assert await schema_check.verify_schema(await engine_at("expand"), "strict", versions_dir) is True
+    with pytest.raises(schema_check.SchemaMismatchError, match=r"pending \['contract', 'expand'\]"):
+        await schema_check.verify_schema(await engine_at("base"), "strict", versions_dir)
+    with pytest.raises(schema_check.SchemaMismatchError, match="missing"):
+        await schema_check.verify_schema(await engine_at(None), "strict", versions_dir)
+    assert await schema_check.verify_schema(await engine_at("base"), "warn", versions_dir) is False
+
+
+def test_alembic_chain_has_one_root_and_one_head():
+    graph = schema_check.revision_graph()
+    assert [revision for revision, (parents, _) in graph.items() if not parents] == ["0b5a3c1d2e4f"]
+    assert len(schema_check.alembic_heads()) == 1
+    assert [revision for revision, (_, post_deploy) in graph.items() if post_deploy] == ["5d2f3c8e0b41"]
+
+
+async def test_real_chain_without_post_deploy_revisions_is_compatible(engine_at):
+    # Выкатка expand/contract: база на всех ревизиях, кроме post_deploy (их родители
+    # вне post_deploy), должна проходить strict - иначе post_deploy-ревизия стоит не в конце
+    graph = schema_check.revision_graph()
+    post_deploy = {revision for revision, (_, flag) in graph.items() if flag}
+    before_rollout = {
+        parent for revision in post_deploy for parent in graph[revision][0] if parent not in post_deploy
+    }
+    assert before_rollout
+    assert schema_check.pending_revisions(before_rollout, graph) == post_deploy
+    assert await schema_check.verify_schema(await engine_at(before_rollout.pop()), "strict") is True
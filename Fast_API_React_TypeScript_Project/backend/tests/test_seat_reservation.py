@@ -0,0 +1,109 @@
+# test_seat_reservation.py
+# Резерв мест в posts.add_member_to_post (один условный UPDATE + INSERT в транзакции):
+# параллельные вступления не перебронируют пост, а удаление пользователя
+# (crud.delete_user) возвращает занятые им места и публикует события по постам.
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+import database
+import models
+from realtime import realtime
+
+pytestmark = pytest.mark.anyio
+
+JOINERS = 500
+PLACES = 10
+
+
+async def _create_post(client, places: int) -> int:
+    r = await client.post("/posts", json={
+        "trip_from": "london",
+        "trip_to": "kyiv",
+        "departure_datetime": (datetime.now(timezone.utc) + timedelta(hours=5)).isoformat(),
+        "count_of_places": places,
+    })
+    assert r.status_code == 201, r.text
+    return r.json()["post_id"]
+
+
+async def _seats(post_id: int) -> tuple[int, int]:
+    """(already_engaged, число записей posts_members) поста."""
+    async with database.AsyncSessionFactory() as session:
+        engaged = await session.scalar(select(models.Post.already_engaged).where(models.Post.post_id == post_id))
+        members = await session.scalar(
+            select(func.count()).select_from(models.PostMember).where(models.PostMember.post_id == post_id)
+        )
+    return engaged, members
+
+
+async def test_parallel_joins_never_overbook(client, create_users, auth_cookies):
+    riders = [f"rider{i}" for i in range(JOINERS)]
+    await create_users(["owner", *riders])
+    client.cookies = auth_cookies("owner")
+    post_id = await _create_post(client, PLACES)
+    client.cookies.clear()
+
+    async def join(rider: str) -> tuple[int, float]:
+        started = time.perf_counter()
+        (cookie,) = auth_cookies(rider).items()
+        r = await client.post(f"/{post_id}/members", headers={"Cookie": "=".join(cookie)})
+        return r.status_code, time.perf_counter() - started
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(join(rider) for rider in riders))
+    elapsed = time.perf_counter() - started
+
+    statuses = [code for code, _ in results]
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    print(
+        f"{JOINERS} parallel joins on a {PLACES}-seat post in {elapsed:.2f}s: "
+        f"p50 {statistics.median(latencies):.1f} ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, "
+        f"max {latencies[-1]:.1f} ms"
+    )
+    assert statuses.count(201) == PLACES
+    assert statuses.count(400) == JOINERS - PLACES # "No available places", а не 500
+    assert await _seats(post_id) == (PLACES, PLACES)
+
+
+async def test_deleting_a_member_frees_the_seat(client, create_users, auth_cookies):
+    _, rider_id, _ = await create_users(["owner", "rider", "late"])
+    client.cookies = auth_cookies("owner")
+    post_id = await _create_post(client, 1)
+
+    client.cookies = auth_cookies("rider")
+    assert (await client.post(f"/{post_id}/members")).status_code == 201
+    client.cookies = auth_cookies("late")
+    assert (await client.post(f"/{post_id}/members")).status_code == 400 # мест нет
+    assert await _seats(post_id) == (1, 1)
+
+    assert (await client.delete(f"/users/{rider_id}")).status_code == 200
+    assert await _seats(post_id) == (0, 0)
+
+    assert (await client.post(f"/{post_id}/members")).status_code == 201
+    assert await _seats(post_id) == (1, 1)
+
+
+async def test_deleting_a_user_publishes_post_events(client, create_users, auth_cookies):
+    _, leaver_id = await create_users(["owner", "leaver"])
+    client.cookies = auth_cookies("owner")
+    joined = await _create_post(client, 2)
+    client.cookies = auth_cookies("leaver")
+    owned = await _create_post(client, 2)
+    assert (await client.post(f"/{joined}/members")).status_code == 201
+
+    events = []
+    listener = (events.append, None)
+    realtime.hub._listeners.append(listener) # как route_index: все события воркера
+    try:
+        assert (await client.delete(f"/users/{leaver_id}")).status_code == 200
+    finally:
+        realtime.hub._listeners.remove(listener)
+    # Собственный пост удален каскадом - индекс маршрутов и подписчики должны его убрать
+    assert sorted((event["type"], event["post_id"]) for event in events) == sorted([
+        (realtime.POST_MEMBERS_CHANGED, joined), (realtime.POST_DELETED, owned),
+    ])
@@ -0,0 +1,95 @@
+# test_statement_budgets.py
+# Бюджеты SQL-запросов горячих эндпоинтов (statement_budget.STATEMENT_BUDGETS):
+# сценарии ниже проходят по ним через фикстуру sql_budget, она валит тест при
+# превышении бюджета или N+1 и печатает отчет по запросам.
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from statement_budget import RequestRecord, StatementRecorder, find_n_plus_one, statement_shape
+
+pytestmark = pytest.mark.anyio
+
+
+def _post_body(hours: float = 5, places: int = 3) -> dict:
+    return {
+        "trip_from": "london",
+        "trip_to": "kyiv",
+        "departure_datetime": (datetime.now(timezone.utc) + timedelta(hours=hours)).isoformat(),
+        "count_of_places": places,
+    }
+
+
+async def test_auth_endpoints_within_budget(client, create_users, sql_budget):
+    await create_users(["alice"])
+    r = await client.post("/login", data={"username": "alice", "password": "Secret123!"})
+    assert r.status_code == 200
+    assert (await client.get("/users/me")).status_code == 200
+    assert (await client.get("/protected")).status_code == 200
+    assert (await client.post("/logout")).status_code == 200
+
+
+async def test_post_endpoints_within_budget(client, create_users, auth_cookies, sql_budget):
+    await create_users(["owner", "rider1", "rider2", "rider3"])
+    client.cookies = auth_cookies("owner")
+    created = [await client.post("/posts", json=_post_body(hours=h)) for h in (3, 4, 5, 6)]
+    assert all(r.status_code == 201 for r in created)
+    post_id = created[0].json()["post_id"]
+
+    for rider in ("rider1", "rider2", "rider3"):
+        client.cookies = auth_cookies(rider)
+        assert (await client.post(f"/{post_id}/members")).status_code == 201
+    client.cookies = auth_cookies("owner")
+
+    # Страница со всеми постами и участниками: N+1 по постам сразу даст повтор формы запроса
+    assert len((await client.get("/posts")).json()) == 4
+    assert len((await client.get("/posts/search", params={"trip_from": "london", "trip_to": "kyiv", "has_free_seats": "false"})).json()) == 4
+    assert len((await client.get(f"/{post_id}/post")).json()["posts_members_posts"]) == 3
+    assert len((await client.get(f"/{post_id}/posts")).json()) == 4
+    assert (await client.delete(f"/{created[-1].json()['post_id']}/post")).status_code == 201
+
+    routes = {(record.method, record.route) for record in sql_budget.requests}
+    assert routes >= {
+        ("POST", "/posts"), ("POST", "/{post_id}/members"), ("GET", "/posts"),
+        ("GET", "/posts/search"), ("GET", "/{post_id}/post"), ("GET", "/{post_id}/posts"),
+        ("DELETE", "/{post_id}/post"),
+    }
+
+
+async def test_user_endpoints_within_budget(client, create_users, auth_cookies, sql_budget):
+    (user_id,) = await create_users(["carol"])
+    client.cookies = auth_cookies("carol")
+    assert (await client.post(f"/users/{user_id}", json={"name": "bag", "price": 10})).status_code == 201
+    assert (await client.get(f"/users/{user_id}")).status_code == 200
+    assert (await client.get("/users/")).status_code == 200
+    r = await client.put(f"/users/{user_id}", json={"user": "carol", "email": "carol2@example.com", "role": "user"})
+    assert r.status_code == 200
+
+
+@pytest.mark.sql_budget_skip
+async def test_budget_overrun_is_reported(client, create_users, auth_cookies, sql_budget):
+    await create_users(["dave"])
+    client.cookies = auth_cookies("dave")
+    await client.get("/users/me")
+    (record,) = [r for r in sql_budget.requests if r.route == "/users/me"]
+    assert record.problems() == []
+    record.statements *= 2 # как если бы эндпоинт начал делать вдвое больше запросов
+    assert record.problems() == [f"GET /users/me: 2 statements, budget {record.budget}"]
+    assert "GET    /users/me" in sql_budget.report()
+
+
+def test_n_plus_one_detected_by_statement_shape():
+    statements = [f"SELECT posts.post_id FROM posts WHERE posts.post_id = {i}" for i in range(5)]
+    statements.append("SELECT users.id FROM users WHERE users.id IN (?, ?, ?)")
+    assert find_n_plus_one(statements) == [("SELECT posts.post_id FROM posts WHERE posts.post_id = ?", 5)]
+    assert statement_shape("SELECT 1 WHERE a IN ($1, $2, $3) AND b = 'x'") == "SELECT ? WHERE a IN (...) AND b = ?"
+
+    record = RequestRecord(method="GET", route="/posts", status=200, statements=statements)
+    assert any("possible N+1, 5x" in problem for problem in record.problems())
+
+
+def test_recorder_separates_statements_outside_requests():
+    recorder = StatementRecorder.__new__(StatementRecorder)
+    recorder.requests, recorder.outside = [], []
+    recorder._on_execute(None, None, "SELECT 1", None, None, False)
+    assert recorder.outside == ["SELECT 1"] and recorder.problems() == []
@@ -0,0 +1,60 @@
+# test_user_rename.py
+# Переименование пользователя (crud.update_user): копии имени в posts и posts_members
+# меняются, а updated_at (ETag) сдвигается у всех постов, где это имя видно.
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select, update
+
+import database
+import models
+
+pytestmark = pytest.mark.anyio
+
+LONG_AGO = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+async def _create_post(client) -> int:
+    r = await client.post("/posts", json={
+        "trip_from": "london",
+        "trip_to": "kyiv",
+        "departure_datetime": (datetime.now(timezone.utc) + timedelta(hours=5)).isoformat(),
+        "count_of_places": 3,
+    })
+    assert r.status_code == 201, r.text
+    return r.json()["post_id"]
+
+
+async def test_rename_updates_name_copies_and_etags(client, create_users, auth_cookies):
+    owner_id, rider_id, _ = await create_users(["owner", "rider", "other"])
+    client.cookies = auth_cookies("owner")
+    owned = await _create_post(client)
+    client.cookies = auth_cookies("other")
+    joined, untouched = await _create_post(client), await _create_post(client)
+    client.cookies = auth_cookies("owner")
+    assert (await client.post(f"/{joined}/members")).status_code == 201
+    client.cookies = auth_cookies("rider")
+    assert (await client.post(f"/{owned}/members")).status_code == 201
+
+    # Время SQLite - с точностью до секунды: сдвигаем updated_at в прошлое, чтобы
+    # изменение было видно и в ту же секунду
+    async with database.engine.begin() as conn:
+        await conn.execute(update(models.Post).values(updated_at=LONG_AGO))
+    etags = {post_id: (await client.get(f"/{post_id}/post")).headers.get("ETag") for post_id in (owned, joined, untouched)}
+
+    client.cookies = auth_cookies("owner")
+    r = await client.put(f"/users/{owner_id}", json={"user": "captain", "email": "owner@example.com", "role": "user"})
+    assert r.status_code == 200, r.text
+
+    async with database.AsyncSessionFactory() as session:
+        owners = dict((await session.execute(select(models.Post.post_id, models.Post.post_owner_user))).all())
+        members = set((await session.execute(select(models.PostMember.user_id, models.PostMember.member_user))).all())
+        updated = dict((await session.execute(select(models.Post.post_id, models.Post.updated_at))).all())
+    assert owners == {owned: "captain", joined: "other", untouched: "other"}
+    assert members == {(owner_id, "captain"), (rider_id, "rider")}
+    assert {post_id for post_id, at in updated.items() if at.replace(tzinfo=timezone.utc) > LONG_AGO} == {owned, joined}
+
+    client.cookies = auth_cookies("captain")
+    for post_id, etag in etags.items():
+        changed = (await client.get(f"/{post_id}/post")).headers.get("ETag") != etag
+        assert changed == (post_id != untouched), post_id